@@ -1,6 +1,6 @@
 from pathlib import Path
 
-from flask import Flask, send_from_directory
+from flask import Flask, json as flask_json, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
@@ -9,9 +9,12 @@ from flask_socketio import SocketIO
 from flask_migrate import Migrate
 
 from backend.app.config import Config
+from backend.app.database import RoutingSession, init_database
+from backend.app.json_provider import get_json_provider_class
+from backend.app.message_queue import make_client_manager
 
-# 创建数据库实例
-db = SQLAlchemy()
+# 创建数据库实例，只读查询可路由到副本
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 # 创建CORS实例
 cors = CORS()
 # 创建Bcrypt实例用于密码哈希
@@ -27,15 +30,28 @@ FRONTEND_DIR = Path(__file__).parent.parent.parent / "frontend"
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # 按配置选择响应的JSON编码器
+    app.json = get_json_provider_class(app.config.get('JSON_PROVIDER', 'orjson'))(app)
 
     # 初始化扩展
+    init_database(app)
     db.init_app(app)
     # 配置CORS以允许所有来源
     cors.init_app(app, resources={"*": {"origins": "*"}})
     bcrypt.init_app(app)
     jwt.init_app(app)
-    # 初始化SocketIO
-    socketio.init_app(app, cors_allowed_origins="*")
+    # 初始化SocketIO，配置了消息队列时emit会分发到所有进程；
+    # 消息与API响应使用同一个JSON提供器，任务中的日期时间同样编码为ISO 8601字符串
+    client_manager = make_client_manager(
+        app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+        channel=app.config.get('SOCKETIO_CHANNEL', 'flask-socketio'),
+        flush_interval=app.config.get('SOCKETIO_EMIT_FLUSH_INTERVAL', 0.05),
+        max_batch=app.config.get('SOCKETIO_EMIT_BATCH_SIZE', 500)
+    )
+    # Socket.IO事件处理函数须在init_app之前注册，才会挂到每个应用新建的服务器上
+    import backend.app.services.reminder_service  # noqa: F401
+    socketio.init_app(app, cors_allowed_origins="*", async_mode=app.config.get('SOCKETIO_ASYNC_MODE'),
+                      client_manager=client_manager, json=flask_json)
     # 初始化Migrate
     migrate.init_app(app, db)
     
@@ -60,12 +76,26 @@ def create_app(config_class=Config):
         return send_from_directory(FRONTEND_DIR, filename)
 
 
+    # 初始化已吊销令牌列表
+    from backend.app.services.token_service import init_token_blocklist
+    init_token_blocklist(app)
+
+    # 初始化任务和标签变更事件的推送
+    from backend.app.services.event_service import init_change_events
+    init_change_events(app)
+
     # 注册蓝图
     from backend.app.api.routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
     # 导入并初始化提醒服务
     from backend.app.services.reminder_service import init_reminder_service
-    init_reminder_service(app)
+    if app.config.get('REMINDER_SERVICE_ENABLED', True):
+        init_reminder_service(app)
+    
+    # 导入并初始化已完成任务的后台清理服务
+    from backend.app.services.maintenance_service import init_purge_service
+    if app.config.get('PURGE_SERVICE_ENABLED', True):
+        init_purge_service(app)
     
     return app
\ No newline at end of file
@@ -1,13 +1,22 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-from backend.app.services.user_service import get_user_by_id, create_user, authenticate_user
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+
+from backend.app.services.user_service import create_user, authenticate_user, update_user_timezone
+from backend.app.services.identity_service import get_current_identity, get_current_user_id
 from backend.app.services.todo_service import (
     get_todos, get_today_todos, get_todos_preview, create_todo, update_todo, delete_todo,
-    get_week_todos, get_upcoming_todos, get_overdue_todos, toggle_todo_completion
+    get_week_todos, get_upcoming_todos, get_overdue_todos, toggle_todo_completion, batch_todos
 )
 from backend.app.services.tag_service import get_tags, create_tag, update_tag, delete_tag, get_tag_todos
+from backend.app.services.cache_service import cached_response
+from backend.app.services.change_service import get_changes
+from backend.app.services.password_service import PasswordHasherBusy
+from backend.app.services.transfer_service import export_user_data, import_user_data
+from backend.app.services.token_service import issue_tokens, revoke_token, rotate_refresh_token
 
 # 创建蓝图
 api_bp = Blueprint('api', __name__)
@@ -18,10 +27,13 @@ def register():
     data = request.get_json()
     
     try:
-        create_user(data['username'], data['password'])
+        create_user(data['username'], data['password'], data.get('timezone'))
         return jsonify({'message': 'User created successfully'}), 201
     except ValueError as e:
         return jsonify({'message': str(e)}), 400
+    except (PasswordHasherBusy, FutureTimeoutError):
+        # 工作池已满或等待哈希计算超时
+        return jsonify({'message': 'Server busy, please retry later'}), 503, {'Retry-After': '1'}
 
 # 登录路由
 @api_bp.route('/login', methods=['POST'])
@@ -29,42 +41,75 @@ def login():
     data = request.get_json()
     
     # 验证用户身份
-    user = authenticate_user(data['username'], data['password'])
+    try:
+        user = authenticate_user(data['username'], data['password'])
+    except (PasswordHasherBusy, FutureTimeoutError):
+        # 工作池已满或等待哈希计算超时
+        return jsonify({'message': 'Server busy, please retry later'}), 503, {'Retry-After': '1'}
     
     if not user:
         return jsonify({'message': 'Invalid username or password'}), 401
     
-    # 创建访问令牌
-    access_token = create_access_token(identity=str(user.id), expires_delta=datetime.timedelta(hours=1))
+    # 创建访问令牌和刷新令牌，之后续期只需调用/token/refresh，不再重复校验密码
+    return jsonify(issue_tokens(user.id)), 200
+
+# 刷新令牌路由：旧的刷新令牌换一对新令牌（轮换），旧令牌随即作废
+@api_bp.route('/token/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh_token():
+    try:
+        return jsonify(rotate_refresh_token(get_jwt())), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 401
+
+# 退出登录路由：吊销当前令牌，请求体中带有refresh_token时一并吊销
+@api_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    payload = get_jwt()
+    revoke_token(payload)
+    
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        try:
+            refresh_payload = decode_token(data['refresh_token'])
+        except (JWTExtendedException, PyJWTError):
+            return jsonify({'message': 'Invalid refresh token'}), 400
+        if refresh_payload['type'] != 'refresh' or refresh_payload['sub'] != payload['sub']:
+            return jsonify({'message': 'Invalid refresh token'}), 400
+        revoke_token(refresh_payload)
     
-    return jsonify({'access_token': access_token, 'user_id': user.id}), 200
+    return jsonify({'message': 'Logged out successfully'}), 200
 
 # 获取当前用户信息
 @api_bp.route('/user', methods=['GET'])
 @jwt_required()
 def get_current_user():
+    # 身份快照来自进程内缓存，不需要查询用户表
+    identity = get_current_identity()
+    return jsonify({'id': identity.id, 'username': identity.username, 'timezone': identity.timezone}), 200
+
+# 修改当前用户的设置（目前只有时区）
+@api_bp.route('/user', methods=['PATCH'])
+@jwt_required()
+def api_update_current_user():
+    user_id = get_current_user_id()
+    data = request.get_json() or {}
+    
     try:
-        user_id = get_jwt_identity()
-        print(f"User ID from JWT: {user_id}")
-        user = get_user_by_id(int(user_id))
-        
-        if not user:
-            print(f"User not found for ID: {user_id}")
-            return jsonify({'message': 'User not found'}), 404
-        
-        print(f"User found: {user.username}")
-        return jsonify({'id': user.id, 'username': user.username}), 200
-    except Exception as e:
-        print(f"Error in get_current_user: {e}")
-        return jsonify({'message': 'Internal server error'}), 500
+        user = update_user_timezone(user_id, data.get('timezone'))
+        return jsonify({'id': user.id, 'username': user.username, 'timezone': user.timezone}), 200
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
 # Todo相关API
 
 # 获取所有Todo (支持过滤、搜索和排序)
 @api_bp.route('/todos', methods=['GET'])
 @jwt_required()
+@cached_response
 def api_get_todos():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     # 获取查询参数
     completed = request.args.get('completed')
@@ -74,16 +119,23 @@ def api_get_todos():
     search = request.args.get('search')
     sort_by = request.args.get('sort_by')
     sort_order = request.args.get('sort_order', 'asc')
+    # 分页参数：不传limit时返回全部结果
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor')
     
-    todos = get_todos(user_id, completed, tag_id, priority, due_date, search, sort_by, sort_order)
+    try:
+        result = get_todos(user_id, completed, tag_id, priority, due_date, search, sort_by, sort_order, limit, cursor)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
     
-    return jsonify({'todos': todos}), 200
+    return jsonify(result), 200
 
 # 获取今日待办事项
 @api_bp.route('/todos/today', methods=['GET'])
 @jwt_required()
+@cached_response
 def api_get_today_todos():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     todos = get_today_todos(user_id)
     
@@ -92,8 +144,9 @@ def api_get_today_todos():
 # 获取任务预览统计数据
 @api_bp.route('/todos/preview', methods=['GET'])
 @jwt_required()
+@cached_response
 def api_get_todos_preview():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     preview_data = get_todos_preview(user_id)
     
@@ -102,8 +155,9 @@ def api_get_todos_preview():
 # 获取指定起始日期的七天任务
 @api_bp.route('/todos/week', methods=['GET'])
 @jwt_required()
+@cached_response
 def api_get_week_todos():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     # 获取查询参数，默认使用今天
     start_date_param = request.args.get('start_date')
@@ -112,11 +166,22 @@ def api_get_week_todos():
     
     return jsonify(preview_data), 200
 
+# 获取游标之后变化的任务和标签（增量同步）
+@api_bp.route('/todos/changes', methods=['GET'])
+@jwt_required()
+def api_get_todo_changes():
+    user_id = get_current_user_id()
+    
+    # 不传since或游标无效时返回reset和当前游标，客户端随后全量加载
+    since = request.args.get('since', type=int)
+    
+    return jsonify(get_changes(user_id, since)), 200
+
 # 创建新Todo
 @api_bp.route('/todos', methods=['POST'])
 @jwt_required()
 def api_create_todo():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     data = request.get_json()
     
     try:
@@ -137,7 +202,7 @@ def api_create_todo():
 @api_bp.route('/todos/<int:todo_id>', methods=['PUT'])
 @jwt_required()
 def api_update_todo(todo_id):
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     data = request.get_json()
     
     try:
@@ -159,7 +224,7 @@ def api_update_todo(todo_id):
 @api_bp.route('/todos/<int:todo_id>', methods=['DELETE'])
 @jwt_required()
 def api_delete_todo(todo_id):
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     try:
         result = delete_todo(user_id, todo_id)
@@ -171,7 +236,7 @@ def api_delete_todo(todo_id):
 @api_bp.route('/todos/<int:todo_id>/toggle', methods=['PUT'])
 @jwt_required()
 def api_toggle_todo(todo_id):
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     try:
         result = toggle_todo_completion(user_id, todo_id)
@@ -179,13 +244,55 @@ def api_toggle_todo(todo_id):
     except ValueError as e:
         return jsonify({'message': str(e)}), 404
 
+# 批量创建/更新/删除/切换Todo
+@api_bp.route('/todos/batch', methods=['POST'])
+@jwt_required()
+def api_batch_todos():
+    user_id = get_current_user_id()
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Request body must be a JSON object'}), 400
+    
+    try:
+        success, results = batch_todos(user_id, data.get('operations'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({'results': results}), 200 if success else 400
+
+# 以NDJSON流的形式导出当前用户的全部标签和任务
+@api_bp.route('/export', methods=['GET'])
+@jwt_required()
+def api_export():
+    user_id = get_current_user_id()
+    
+    return Response(
+        stream_with_context(export_user_data(user_id)),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': 'attachment; filename=todos.ndjson'}
+    )
+
+# 从NDJSON上传流中分批导入标签和任务
+@api_bp.route('/import', methods=['POST'])
+@jwt_required()
+def api_import():
+    user_id = get_current_user_id()
+    
+    try:
+        counts = import_user_data(user_id, request.stream)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    return jsonify({'imported_tags': counts['tags'], 'imported_todos': counts['todos']}), 200
+
 # 标签相关API
 
 # 获取所有标签
 @api_bp.route('/tags', methods=['GET'])
 @jwt_required()
+@cached_response
 def api_get_tags():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     tags = get_tags(user_id)
     return jsonify({'tags': tags}), 200
 
@@ -193,7 +300,7 @@ def api_get_tags():
 @api_bp.route('/tags', methods=['POST'])
 @jwt_required()
 def api_create_tag():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     data = request.get_json()
     
     new_tag = create_tag(user_id, data['name'], data.get('color'))
@@ -203,7 +310,7 @@ def api_create_tag():
 @api_bp.route('/tags/<int:tag_id>', methods=['PUT'])
 @jwt_required()
 def api_update_tag(tag_id):
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     data = request.get_json()
     
     try:
@@ -216,7 +323,7 @@ def api_update_tag(tag_id):
 @api_bp.route('/tags/<int:tag_id>', methods=['DELETE'])
 @jwt_required()
 def api_delete_tag(tag_id):
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     
     try:
         result = delete_tag(user_id, tag_id)
@@ -228,7 +335,7 @@ def api_delete_tag(tag_id):
 @api_bp.route('/todos/upcoming', methods=['GET'])
 @jwt_required()
 def api_get_upcoming_todos():
-    user_id = get_jwt_identity()
+    user_id = get_current_user_id()
     minutes = request.args.get('minutes', 60, type=int)
     
     todos = get_upcoming_todos(user_id, minutes)
@@ -0,0 +1,151 @@
+from functools import wraps
+import inspect
+import random
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+
+# 只读副本在SQLALCHEMY_BINDS中的键名前缀
+REPLICA_BIND_PREFIX = 'replica_'
+# read_only选择主库时记录的标记，嵌套调用据此沿用主库而不是重新选择副本
+PRIMARY = ''
+# 只适用于连接池（QueuePool）的引擎参数，SQLite内存库使用StaticPool，不接受这些参数
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class RoutingSession(Session):
+    """
+    在read_only函数内把查询语句路由到选中的只读副本，其余语句（包括flush写入）走主库
+
+    同一事务中主库和副本各自使用一个连接，互不影响
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replica = g.get('_db_replica')
+            if replica and getattr(clause, 'is_select', False):
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RecentWrites:
+    """
+    记录每个用户最近一次写入的时刻，用于读己之写：写入后window秒内该用户的读查询仍走主库
+
+    记录只在进程内，多进程部署时依赖反向代理按客户端粘滞把同一用户的请求发到同一进程
+    """
+    def __init__(self, window=5.0, max_users=100000):
+        self.window = window
+        self.max_users = max_users
+        self._writes = {}  # 用户ID -> 最近写入时刻
+        self._lock = threading.Lock()
+
+    def mark(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._writes[user_id] = now
+            if len(self._writes) > self.max_users:
+                deadline = now - self.window
+                self._writes = {uid: at for uid, at in self._writes.items() if at > deadline}
+
+    def is_recent(self, user_id):
+        with self._lock:
+            written_at = self._writes.get(user_id)
+        return written_at is not None and time.monotonic() - written_at < self.window
+
+
+def _engine_options(uri, options, connect_timeout=None):
+    """
+    按数据库类型调整引擎参数：SQLite内存库去掉连接池参数，MySQL补充建立连接的超时
+    """
+    options = dict(options)
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            for name in QUEUE_POOL_OPTIONS:
+                options.pop(name, None)
+    elif url.get_backend_name() == 'mysql' and connect_timeout:
+        options['connect_args'] = {'connect_timeout': connect_timeout, **options.get('connect_args', {})}
+    return options
+
+
+def init_database(app):
+    """
+    在db.init_app之前调用：按主库类型整理引擎参数，并把SQLALCHEMY_REPLICA_URIS注册为只读副本bind
+    """
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    connect_timeout = app.config.get('DB_CONNECT_TIMEOUT')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], options, connect_timeout
+    )
+
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    replicas = []
+    for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or ()):
+        key = f'{REPLICA_BIND_PREFIX}{index}'
+        binds[key] = {'url': uri, **_engine_options(uri, options, connect_timeout)}
+        replicas.append(key)
+    app.config['SQLALCHEMY_BINDS'] = binds
+    app.extensions['db_replicas'] = replicas
+    app.extensions['db_recent_writes'] = RecentWrites(window=app.config.get('DB_READ_YOUR_WRITES_SECONDS', 5))
+
+
+def mark_user_write(user_id):
+    """
+    用户数据写入提交后调用，开始该用户的读己之写窗口
+    """
+    recent_writes = current_app.extensions.get('db_recent_writes')
+    if recent_writes is not None:
+        recent_writes.mark(int(user_id))
+
+
+def _choose_replica(user_id):
+    """
+    为只读调用选择副本；未配置副本或用户刚写入过数据时返回None（使用主库）
+    """
+    replicas = current_app.extensions.get('db_replicas')
+    if not replicas:
+        return None
+    if user_id is not None and current_app.extensions['db_recent_writes'].is_recent(int(user_id)):
+        return None
+    return random.choice(replicas)
+
+
+def read_only(fn):
+    """
+    将只读服务函数的查询路由到只读副本，函数的第一个参数（或user_id关键字参数）为用户ID
+
+    嵌套调用沿用外层的选择；生成器函数在整个迭代期间使用同一个副本
+    """
+    def _user_id(args, kwargs):
+        return kwargs['user_id'] if 'user_id' in kwargs else (args[0] if args else None)
+
+    def _enter(args, kwargs):
+        previous = g.get('_db_replica')
+        if previous is None:
+            g._db_replica = _choose_replica(_user_id(args, kwargs)) or PRIMARY
+        return previous
+
+    def _exit(previous):
+        g._db_replica = previous
+
+    if inspect.isgeneratorfunction(fn):
+        @wraps(fn)
+        def generator_wrapper(*args, **kwargs):
+            previous = _enter(args, kwargs)
+            try:
+                yield from fn(*args, **kwargs)
+            finally:
+                _exit(previous)
+        return generator_wrapper
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        previous = _enter(args, kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _exit(previous)
+    return wrapper
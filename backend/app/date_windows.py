@@ -0,0 +1,86 @@
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# 用户未设置时区时使用的时区，与早期版本固定使用的北京时间一致
+DEFAULT_TIMEZONE = 'Asia/Shanghai'
+
+
+@lru_cache(maxsize=512)
+def get_zone(name):
+    """
+    按IANA名称获取时区，名称无效时返回默认时区
+    """
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def is_valid_timezone(name):
+    """
+    判断是否为有效的IANA时区名称
+    """
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+def local_today(tz_name, now=None):
+    """
+    用户所在时区的今天
+    """
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(get_zone(tz_name)).date()
+
+
+def local_date(value, tz_name):
+    """
+    数据库中的naive UTC时间在用户时区中的日期
+    """
+    return value.replace(tzinfo=timezone.utc).astimezone(get_zone(tz_name)).date()
+
+
+def _utc_start_of(day, zone):
+    return datetime.combine(day, time.min, tzinfo=zone).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def days_window(first_day, days, tz_name):
+    """
+    用户时区中从first_day起连续days天对应的UTC半开区间[start, end)，与数据库中的naive UTC时间比较：
+    due_date >= start AND due_date < end，可以直接使用due_date上的索引做范围扫描。
+    起止时刻分别按各自日期换算，夏令时切换的那天不是24小时也能得到正确的边界
+    """
+    zone = get_zone(tz_name)
+    return _utc_start_of(first_day, zone), _utc_start_of(first_day + timedelta(days=days), zone)
+
+
+def day_window(day, tz_name):
+    """
+    用户时区中某一天对应的UTC半开区间
+    """
+    return days_window(day, 1, tz_name)
+
+
+def start_of_week(day):
+    """
+    day所在周的周一
+    """
+    return day - timedelta(days=day.weekday())
+
+
+def week_window(day, tz_name):
+    """
+    用户时区中day所在的周（周一至周日）对应的UTC半开区间
+    """
+    return days_window(start_of_week(day), 7, tz_name)
+
+
+def in_window(column, window):
+    """
+    生成列落在半开区间内的过滤条件
+    """
+    start, end = window
+    return (column >= start) & (column < end)
@@ -0,0 +1,62 @@
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖
+    orjson = None
+
+
+class TodoJSONProvider(DefaultJSONProvider):
+    """
+    基于标准库json的提供器，日期时间编码为ISO 8601字符串（Flask默认是HTTP日期格式），
+    与OrjsonProvider的输出一致
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(TodoJSONProvider):
+    """
+    基于orjson的提供器，原生编码datetime/date，直接生成响应字节
+    dumps/loads的参数与标准库不同，带额外参数的调用交给父类处理
+    """
+    OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.OPTIONS),
+            mimetype=self.mimetype
+        )
+
+
+JSON_PROVIDERS = {
+    'json': TodoJSONProvider,
+    'orjson': OrjsonProvider,
+}
+
+
+def get_json_provider_class(name):
+    """
+    按名称选择JSON提供器，orjson未安装时回退到标准库实现
+    """
+    if name not in JSON_PROVIDERS:
+        raise ValueError(f'Unknown JSON provider: {name}')
+    if name == 'orjson' and orjson is None:
+        return TodoJSONProvider
+    return JSON_PROVIDERS[name]
@@ -0,0 +1,135 @@
+from collections import defaultdict
+import queue
+import threading
+
+import socketio
+
+
+class EmitBatchingMixin:
+    """
+    把一个刷新周期内的普通emit合并成一条消息发布到消息队列，减少每条提醒/事件一次的往返
+
+    本进程的客户端仍然立即收到消息，只有发往其他进程的副本被延迟最多flush_interval秒。
+    带回调的emit和房间、断开等控制消息立即发布，发布前先刷新已缓冲的emit以保持顺序。
+    接收端把批量消息拆开后交给PubSubManager原有的处理流程
+    """
+    BATCH_METHOD = 'emit_batch'
+
+    def __init__(self, *args, flush_interval=0.05, max_batch=500, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flusher_started = False
+
+    def _start_flusher(self):
+        """
+        第一次缓冲emit时启动刷新任务；没有客户端连接的进程（如提醒进程）不会初始化管理器，因此不能放在initialize中
+        """
+        with self._pending_lock:
+            if self._flusher_started:
+                return
+            self._flusher_started = True
+        self.server.start_background_task(self._flush_loop)
+
+    def _flush_loop(self):
+        while True:
+            self.server.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                self._get_logger().exception('刷新Socket.IO消息批次时出错')
+
+    def flush(self):
+        """
+        发布缓冲中的emit，进程退出前也应调用一次
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if len(pending) == 1:
+            super()._publish(pending[0])
+        elif pending:
+            super()._publish({'method': self.BATCH_METHOD, 'host_id': self.host_id, 'messages': pending})
+
+    def _publish(self, data):
+        if (not self.flush_interval or self.server is None
+                or data.get('method') != 'emit' or data.get('callback') is not None):
+            self.flush()
+            return super()._publish(data)
+        if not self._flusher_started:
+            self._start_flusher()
+        with self._pending_lock:
+            self._pending.append(data)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self.flush()
+
+    def _listen(self):
+        for message in super()._listen():
+            data = message
+            if not isinstance(data, dict):
+                try:
+                    data = self.json.loads(message)
+                except ValueError:
+                    yield message
+                    continue
+            if isinstance(data, dict) and data.get('method') == self.BATCH_METHOD:
+                yield from data.get('messages', ())
+            else:
+                yield data
+
+
+class LocalManager(socketio.PubSubManager):
+    """
+    进程内的消息队列替身：同一进程中订阅同一channel的Server互相转发消息
+
+    用于测试和单进程部署时验证跨进程分发的行为，不能跨进程使用
+    """
+    name = 'local'
+
+    _subscribers = defaultdict(list)  # channel -> 各订阅者的消息队列
+    _lock = threading.Lock()
+
+    def __init__(self, url='local://', channel='socketio', write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.url = url
+
+    def _publish(self, data):
+        with self._lock:
+            subscribers = list(self._subscribers[self.channel])
+        for inbox in subscribers:
+            inbox.put(data)
+
+    def _listen(self):
+        inbox = queue.Queue()
+        with self._lock:
+            self._subscribers[self.channel].append(inbox)
+        try:
+            while True:
+                yield inbox.get()
+        finally:
+            with self._lock:
+                self._subscribers[self.channel].remove(inbox)
+
+
+# 消息队列URL前缀 -> 客户端管理器类
+MANAGER_CLASSES = {
+    'local://': LocalManager,
+    'redis://': socketio.RedisManager,
+    'rediss://': socketio.RedisManager,
+    'kafka://': socketio.KafkaManager,
+    'zmq': socketio.ZmqManager,
+}
+
+
+def make_client_manager(url, channel='flask-socketio', flush_interval=0.05, max_batch=500):
+    """
+    按消息队列URL创建Socket.IO客户端管理器，其他进程（Web工作进程、提醒进程）通过同一队列收到emit；
+    URL为空时返回None（只在进程内分发）。未识别的前缀按Kombu处理（如amqp://）
+    """
+    if not url:
+        return None
+    base = next((cls for prefix, cls in MANAGER_CLASSES.items() if url.startswith(prefix)), socketio.KombuManager)
+    manager_class = type(f'Batching{base.__name__}', (EmitBatchingMixin, base), {})
+    return manager_class(url, channel=channel, flush_interval=flush_interval, max_batch=max_batch)
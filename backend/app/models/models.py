@@ -1,8 +1,8 @@
 
 from datetime import datetime
-import json
 
 from backend.app import db
+from backend.app.date_windows import DEFAULT_TIMEZONE
 
 
 class User(db.Model):
@@ -10,6 +10,12 @@ class User(db.Model):
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(100), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # IANA时区名称，用于按用户的本地日期计算今日、本周等时间窗口
+    timezone = db.Column(db.String(64), nullable=False, default=DEFAULT_TIMEZONE, server_default=DEFAULT_TIMEZONE)
+    # 用户数据的变更序号：每个修改任务或标签的事务加一，写入被修改行的revision，用作增量同步的游标
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    # 已清理的删除记录中最大的序号，早于它的游标无法增量同步，客户端需要全量刷新
+    change_floor = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
     todos = db.relationship('Todo', backref='user', lazy=True)
     tags = db.relationship('Tag', backref='user', lazy=True)
 
@@ -17,11 +23,17 @@ class User(db.Model):
         return f"User('{self.username}')"
 
 class Tag(db.Model):
+    __table_args__ = (
+        db.Index('ix_tag_user_id_revision', 'user_id', 'revision'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
     color = db.Column(db.String(20), default='#3498db')
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    todos = db.relationship('Todo', secondary='todo_tags', backref='tags', lazy='dynamic')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    revision = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # 最后一次修改时用户的change_seq
+    # 任务的标签统一使用selectin批量加载，列表查询只额外产生一条SELECT，避免N+1查询
+    todos = db.relationship('Todo', secondary='todo_tags', backref=db.backref('tags', lazy='selectin'), lazy='dynamic')
 
     def __repr__(self):
         return f"Tag('{self.name}')"
@@ -29,10 +41,25 @@ class Tag(db.Model):
 # 任务和标签的关联表
 todo_tags = db.Table('todo_tags',
     db.Column('todo_id', db.Integer, db.ForeignKey('todo.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    # 主键(todo_id, tag_id)只能按任务查找，按标签查找任务和删除标签需要反向索引
+    db.Index('ix_todo_tags_tag_id_todo_id', 'tag_id', 'todo_id')
 )
 
 class Todo(db.Model):
+    # 服务层的查询都先按user_id过滤，再按完成状态/截止时间过滤或按各排序字段排序
+    __table_args__ = (
+        db.Index('ix_todo_user_id_completed_due_date', 'user_id', 'completed', 'due_date'),
+        db.Index('ix_todo_user_id_due_date', 'user_id', 'due_date'),
+        db.Index('ix_todo_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_todo_user_id_priority', 'user_id', 'priority'),
+        db.Index('ix_todo_user_id_title', 'user_id', 'title'),
+        # 后台清理任务跨用户查找已完成的旧任务
+        db.Index('ix_todo_completed_created_at', 'completed', 'created_at'),
+        # 增量同步按revision读取用户变更过的任务
+        db.Index('ix_todo_user_id_revision', 'user_id', 'revision'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -42,7 +69,88 @@ class Todo(db.Model):
     due_date = db.Column(db.DateTime, nullable=True)
     priority = db.Column(db.Integer, default=1)  # 1: 低, 2: 中, 3: 高
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    reminders_sent = db.Column(db.Text, default=json.dumps([]))  # 存储已发送的提醒时间点，如["1h", "15m", "5m"]
+    next_reminder_at = db.Column(db.DateTime, nullable=True, index=True)  # 下一个待发送提醒的时刻，已完成或无提醒时为空
+    reminder_mask = db.Column(db.SmallInteger, nullable=False, default=0, server_default='0')  # 已发送提醒时间点的位掩码：1h=1, 15m=2, 5m=4
+    updated_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
+    revision = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # 最后一次修改时用户的change_seq
+
+    def __repr__(self):
+        return f"Todo('{self.title}', '{self.completed}')"
+
+class RevokedToken(db.Model):
+    """
+    已吊销的JWT（退出登录的访问令牌，以及不属于任何刷新令牌链的旧刷新令牌），过期后由令牌服务清理
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)  # access 或 refresh
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"RevokedToken('{self.jti}', '{self.token_type}')"
+
+class RefreshTokenFamily(db.Model):
+    """
+    一次登录签发的刷新令牌链：令牌中带有链ID和代数，每次轮换代数加一，只有当前代的令牌可以续期；
+    退出登录时整条链作废。过期后由令牌服务清理
+    """
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    generation = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"RefreshTokenFamily('{self.id}', {self.generation})"
+
+class ReminderWorker(db.Model):
+    """
+    存活的提醒工作进程，按心跳时间判断存活，用于计算每个进程应持有的分片数
+    """
+    worker_id = db.Column(db.String(64), primary_key=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"ReminderWorker('{self.worker_id}')"
+
+class ReminderLease(db.Model):
+    """
+    提醒分片的租约：用户按user_id取模分到各分片，同一时刻每个分片最多由一个工作进程扫描和发送提醒
+    """
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    owner = db.Column(db.String(64), nullable=True)  # 持有租约的工作进程，为空表示空闲
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"ReminderLease({self.shard}, '{self.owner}')"
+
+class DeletedRecord(db.Model):
+    """
+    已删除任务和标签的墓碑记录，增量同步据此通知客户端删除本地副本，超过保留期后清理
+    """
+    __table_args__ = (
+        db.Index('ix_deleted_record_user_id_revision', 'user_id', 'revision'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # todo 或 tag
+    record_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.BigInteger, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"DeletedRecord('{self.kind}', {self.record_id})"
+
+class TodoStats(db.Model):
+    """
+    每个用户的任务计数，随任务的增删改在同一事务中增量维护，预览统计按主键读取一行
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
-        return f"Todo('{self.title}', '{self.completed}')"
\ No newline at end of file
+        return f"TodoStats({self.user_id}, {self.total_tasks}, {self.completed_tasks})"
@@ -1,6 +1,6 @@
 # 从各个schema文件导入所有验证类
 from .user_schema import UserSchema, UserLoginSchema, UserResponseSchema
-from .todo_schema import TodoSchema, TodoResponseSchema, TodoUpdateSchema, TodoFilterSchema
+from .todo_schema import TodoSchema, TodoResponseSchema, TodoUpdateSchema, TodoFilterSchema, TodoImportSchema
 from .tag_schema import TagSchema, TagResponseSchema, TagUpdateSchema
 
 # 导出所有验证类，方便在其他地方导入
@@ -14,6 +14,7 @@ __all__ = [
     'TodoResponseSchema',
     'TodoUpdateSchema',
     'TodoFilterSchema',
+    'TodoImportSchema',
     # 标签相关schema
     'TagSchema',
     'TagResponseSchema',
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, ValidationError, EXCLUDE
 from datetime import datetime, timezone
 
 class TodoSchema(Schema):
@@ -69,6 +69,33 @@ class TodoUpdateSchema(Schema):
     )
     tags = fields.List(fields.Int(), validate=validate.Length(max=5, error="最多只能添加5个标签"))
 
+class TodoImportSchema(Schema):
+    """
+    导入的待办事项数据验证模式，允许过去的日期，标签按名称引用
+    """
+    class Meta:
+        unknown = EXCLUDE
+
+    title = fields.Str(
+        required=True,
+        validate=[
+            validate.Length(min=1, max=200, error="标题长度必须在1到200个字符之间")
+        ]
+    )
+    description = fields.Str(
+        allow_none=True,
+        validate=validate.Length(max=1000, error="描述长度不能超过1000个字符")
+    )
+    completed = fields.Boolean(load_default=False)
+    completed_at = fields.DateTime(allow_none=True)
+    created_at = fields.DateTime(allow_none=True)
+    due_date = fields.DateTime(allow_none=True)
+    priority = fields.Int(
+        load_default=1,
+        validate=validate.OneOf([1, 2, 3], error="优先级必须是1（低）、2（中）或3（高）")
+    )
+    tags = fields.List(fields.Str(), load_default=list, validate=validate.Length(max=5, error="最多只能添加5个标签"))
+
 class TodoFilterSchema(Schema):
     """
     待办事项过滤和排序参数验证模式
@@ -0,0 +1,32 @@
+from operator import attrgetter
+
+# 任务和标签在API响应中的字段布局，所有接口共用同一份
+TAG_FIELDS = ('id', 'name', 'color')
+TODO_FIELDS = ('id', 'title', 'description', 'completed', 'created_at', 'due_date', 'priority')
+
+# 预先编译好的取值器，一次调用按布局顺序取出全部字段
+_tag_values = attrgetter(*TAG_FIELDS)
+_todo_values = attrgetter(*TODO_FIELDS)
+
+
+def serialize_tag(tag):
+    """
+    标签 -> 响应字典
+    """
+    return dict(zip(TAG_FIELDS, _tag_values(tag)))
+
+
+def serialize_todo(todo):
+    """
+    任务 -> 响应字典，日期时间保持为datetime对象，由JSON提供器统一编码为ISO 8601字符串
+    """
+    data = dict(zip(TODO_FIELDS, _todo_values(todo)))
+    data['tags'] = [dict(zip(TAG_FIELDS, _tag_values(tag))) for tag in todo.tags]
+    return data
+
+
+def serialize_todos(todos):
+    """
+    任务列表 -> 响应字典列表
+    """
+    return [serialize_todo(todo) for todo in todos]
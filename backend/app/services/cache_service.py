@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from functools import wraps
+import threading
+import time
+
+from flask import current_app, make_response, request
+from sqlalchemy import select
+
+from backend.app import db
+from backend.app.database import mark_user_write, read_only
+from backend.app.models.models import User
+from backend.app.services.identity_service import get_current_user_id
+
+
+class ResponseCache:
+    """
+    读接口的响应缓存，保存序列化好的响应字节
+
+    缓存键为(用户ID, 接口, 规范化后的查询参数, 用户数据版本)，数据版本取自数据库中的
+    User.change_seq和时区，任何进程提交写操作后旧版本的条目都不会再被命中，随后按LRU淘汰；
+    另外每个条目有TTL，用于兜底与当前时间相关的接口（今日任务、周预览），总字节数受max_bytes限制
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # 键 -> (过期时刻, 响应字节)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        # 过大的响应不缓存，避免一次挤掉大量条目
+        if len(body) > self.max_bytes // 8:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
+
+
+def get_response_cache():
+    """
+    获取当前应用的响应缓存，未启用时返回None
+    """
+    if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+        return None
+    cache = current_app.extensions.get('response_cache')
+    if cache is None:
+        cache = ResponseCache(
+            max_bytes=current_app.config.get('RESPONSE_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            ttl=current_app.config.get('RESPONSE_CACHE_TTL', 60)
+        )
+        current_app.extensions['response_cache'] = cache
+    return cache
+
+
+def bump_user_version(user_id):
+    """
+    用户数据提交后调用，在读己之写窗口内让其读查询走主库
+
+    缓存键中的数据版本随提交一起写入数据库，不需要在这里逐个进程清除缓存
+    """
+    mark_user_write(user_id)
+
+
+@read_only
+def _serve_cached(user_id, cache, view, args, kwargs):
+    """
+    在同一个read_only范围内读取数据版本并执行视图，使键中的版本与响应数据来自同一个库，
+    副本落后时不会把旧数据存到新版本的键下
+    """
+    version = db.session.execute(
+        select(User.change_seq, User.timezone).where(User.id == user_id)
+    ).one_or_none()
+    params = tuple(sorted(request.args.items(multi=True)))
+    key = (user_id, request.endpoint, params, tuple(sorted(kwargs.items())), tuple(version or ()))
+
+    body = cache.get(key)
+    if body is not None:
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+        response.headers['X-Cache'] = 'HIT'
+        return response
+
+    response = make_response(view(*args, **kwargs))
+    if response.status_code == 200:
+        cache.set(key, response.get_data())
+    response.headers['X-Cache'] = 'MISS'
+    return response
+
+
+def cached_response(view):
+    """
+    缓存读接口成功（200）的JSON响应，需放在@jwt_required()之下
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_response_cache()
+        if cache is None:
+            return view(*args, **kwargs)
+
+        return _serve_cached(get_current_user_id(), cache, view, args, kwargs)
+
+    return wrapper
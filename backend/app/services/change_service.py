@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from backend.app import db
+from backend.app.database import read_only
+from backend.app.models.models import DeletedRecord, Tag, Todo, User, todo_tags
+from backend.app.serializers import serialize_tag, serialize_todos
+
+# 一次增量同步最多返回的变更数，超过时让客户端全量刷新
+MAX_CHANGES = 1000
+# 删除记录的保留时长，更早的游标无法增量同步
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+def next_revision(user_id):
+    """
+    为当前事务分配用户的下一个变更序号，需在提交前调用，同一事务中修改的行共用一个序号
+
+    自增语句会锁住用户行直到事务结束，同一用户的写事务按序号顺序提交，
+    因此客户端读到序号N时，序号不大于N的变更都已可见
+    """
+    db.session.execute(
+        update(User).where(User.id == user_id).values(change_seq=User.change_seq + 1),
+        execution_options={'synchronize_session': False}
+    )
+    return db.session.scalar(select(User.change_seq).where(User.id == user_id))
+
+
+def record_deletions(user_id, kind, record_ids, revision):
+    """
+    为删除的任务或标签写入墓碑记录
+    """
+    if record_ids:
+        now = datetime.utcnow()
+        db.session.execute(insert(DeletedRecord), [
+            {'user_id': user_id, 'kind': kind, 'record_id': record_id, 'revision': revision, 'deleted_at': now}
+            for record_id in record_ids
+        ])
+
+
+def touch_tag_todos(tag_id, revision):
+    """
+    标签改名、换色或删除后，带有该标签的任务在下次同步时重新下发
+    """
+    db.session.execute(
+        update(Todo).where(
+            Todo.id.in_(select(todo_tags.c.todo_id).where(todo_tags.c.tag_id == tag_id))
+        ).values(revision=revision, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _snapshot(user_id, cursor):
+    """
+    全量结果：用户的全部任务和标签，与游标在同一次调用中读取
+    """
+    todos = Todo.query.filter_by(user_id=user_id).order_by(Todo.id).all()
+    tags = Tag.query.filter_by(user_id=user_id).order_by(Tag.id).all()
+    return {
+        'cursor': cursor,
+        'reset': True,
+        'todos': serialize_todos(todos),
+        'tags': [serialize_tag(tag) for tag in tags],
+    }
+
+
+@read_only
+def get_changes(user_id, since=None):
+    """
+    返回序号since之后变化的任务、标签和删除记录，以及新的游标
+
+    代价与变化的行数成正比（都沿(user_id, revision)索引读取）。没有since、since已早于
+    保留的删除记录或变更超过MAX_CHANGES条时返回reset和全部任务、标签，客户端用它们替换本地数据。
+    游标与全量数据在同一个read_only调用中读取（同一个库、同一个事务），先读游标，
+    数据只会比游标新，之后再次下发的变更可以重复应用，客户端不会漏掉变更
+    """
+    cursor, floor = db.session.execute(
+        select(User.change_seq, User.change_floor).where(User.id == user_id)
+    ).one()
+    if since is None or since < floor or since > cursor:
+        return _snapshot(user_id, cursor)
+
+    window = (since, cursor)
+    todos = Todo.query.filter(
+        Todo.user_id == user_id, Todo.revision > window[0], Todo.revision <= window[1]
+    ).order_by(Todo.revision, Todo.id).limit(MAX_CHANGES + 1).all()
+    tags = Tag.query.filter(
+        Tag.user_id == user_id, Tag.revision > window[0], Tag.revision <= window[1]
+    ).order_by(Tag.revision, Tag.id).limit(MAX_CHANGES + 1).all()
+    deleted = db.session.execute(select(DeletedRecord.kind, DeletedRecord.record_id).where(
+        DeletedRecord.user_id == user_id, DeletedRecord.revision > window[0], DeletedRecord.revision <= window[1]
+    ).order_by(DeletedRecord.revision).limit(MAX_CHANGES + 1)).all()
+    if len(todos) + len(tags) + len(deleted) > MAX_CHANGES:
+        return _snapshot(user_id, cursor)
+
+    return {
+        'cursor': cursor,
+        'reset': False,
+        'todos': serialize_todos(todos),
+        'tags': [serialize_tag(tag) for tag in tags],
+        'deleted': {
+            'todos': [record_id for kind, record_id in deleted if kind == 'todo'],
+            'tags': [record_id for kind, record_id in deleted if kind == 'tag'],
+        }
+    }
+
+
+def purge_tombstones(retention=TOMBSTONE_RETENTION, batch_size=500):
+    """
+    清理一批超过保留期的删除记录，并把各用户的change_floor推进到被清理的最大序号，返回清理的条数
+    """
+    cutoff = datetime.utcnow() - retention
+    rows = db.session.execute(select(DeletedRecord.id, DeletedRecord.user_id, DeletedRecord.revision).where(
+        DeletedRecord.deleted_at < cutoff
+    ).limit(batch_size)).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    floors = {}
+    for _, user_id, revision in rows:
+        floors[user_id] = max(floors.get(user_id, 0), revision)
+    for user_id, revision in floors.items():
+        db.session.execute(
+            update(User).where(User.id == user_id, User.change_floor < revision).values(change_floor=revision),
+            execution_options={'synchronize_session': False}
+        )
+    db.session.execute(delete(DeletedRecord).where(DeletedRecord.id.in_([row_id for row_id, _, _ in rows])))
+    db.session.commit()
+    return len(rows)
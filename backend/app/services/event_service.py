@@ -0,0 +1,146 @@
+import atexit
+import threading
+
+from flask import Flask, current_app
+
+from backend.app import socketio
+
+# 一条合并消息最多携带的事件数，超过时只通知客户端增量同步
+MAX_EVENTS_PER_MESSAGE = 200
+
+
+class ChangeEventPublisher:
+    """
+    把任务和标签的变更事件推送到用户的Socket.IO房间，打开的页面据此修补本地状态而不必轮询
+
+    事务提交后调用publish，window秒内同一用户的事件合并为一条'changes'消息：
+    {'since': 起始序号, 'cursor': 结束序号, 'events': [{'type': 'todo.updated', 'data': {...}}, ...]}。
+    同一记录在窗口内的多次变更只保留最终状态，先创建后删除的记录两条事件都不发送。
+    序号不连续（中间的变更由其他进程提交）时拆成多条消息，客户端的游标等于since时直接应用，
+    否则用增量同步接口补齐；events为None表示变更过多或未逐条描述，客户端同样走增量同步
+    """
+    def __init__(self, window=0.1):
+        self.window = window  # 合并窗口，单位：秒；为0时提交后立即推送
+        self.is_running = False
+        self.thread = None
+        self._pending = {}  # user_id -> 待推送的消息列表
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def publish(self, user_id, revision, events):
+        """
+        登记一个事务产生的变更事件，events为None表示不逐条描述
+        """
+        with self._lock:
+            batches = self._pending.setdefault(user_id, [])
+            batch = batches[-1] if batches else None
+            # 同一批量操作共用一个序号，相邻序号接在上一条消息后面
+            if batch is None or revision not in (batch['cursor'], batch['cursor'] + 1):
+                batch = {'since': revision - 1, 'cursor': revision, 'events': {}}
+                batches.append(batch)
+            batch['cursor'] = revision
+            if events is None or batch['events'] is None:
+                batch['events'] = None
+            else:
+                for event in events:
+                    _merge(batch['events'], event)
+                if len(batch['events']) > MAX_EVENTS_PER_MESSAGE:
+                    batch['events'] = None
+        if not self.window:
+            self.flush()
+
+    def flush(self):
+        """
+        推送所有待发送的消息
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for user_id, batches in pending.items():
+            for batch in batches:
+                events = batch['events']
+                socketio.emit('changes', {
+                    'since': batch['since'],
+                    'cursor': batch['cursor'],
+                    'events': None if events is None else list(events.values())
+                }, room=str(user_id))
+
+    def start(self):
+        """
+        启动定期推送线程
+        """
+        if not self.is_running:
+            self.is_running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        停止推送线程，并推送剩余的消息
+        """
+        if self.is_running:
+            self.is_running = False
+            self._stop_event.set()
+            if self.thread:
+                self.thread.join()
+        self.flush()
+
+    def _run(self):
+        """
+        线程运行的主循环
+        """
+        while not self._stop_event.wait(self.window):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"推送变更事件时出错: {e}")
+
+
+def _merge(events, event):
+    """
+    按记录合并事件：创建后更新仍是创建，创建后删除两者抵消，其余保留最后一次
+    """
+    kind, action = event['type'].split('.')
+    key = (kind, event['data']['id'])
+    previous = events.pop(key, None)
+    if previous is not None and previous['type'].endswith('.created'):
+        if action == 'deleted':
+            return
+        event = {'type': previous['type'], 'data': event['data']}
+    events[key] = event
+
+
+def todo_event(action, todo):
+    """
+    任务事件，todo为序列化后的任务；删除事件只带ID
+    """
+    return {'type': f'todo.{action}', 'data': todo}
+
+
+def tag_event(action, tag):
+    """
+    标签事件，tag为序列化后的标签；删除事件只带ID
+    """
+    return {'type': f'tag.{action}', 'data': tag}
+
+
+def init_change_events(app: Flask):
+    """
+    初始化变更事件推送，window为0时不启动后台线程（提交后立即推送）
+    """
+    publisher = ChangeEventPublisher(window=app.config.get('CHANGE_EVENT_WINDOW', 0.1))
+    app.extensions['change_events'] = publisher
+    if publisher.window:
+        publisher.start()
+    return publisher
+
+
+def publish_changes(user_id, revision, events):
+    """
+    事务提交后推送变更事件，未初始化或revision为空时不做任何事
+    """
+    publisher = current_app.extensions.get('change_events')
+    if publisher is not None and revision is not None:
+        publisher.publish(user_id, revision, events)
@@ -0,0 +1,117 @@
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+from flask import current_app, jsonify
+from flask_jwt_extended import current_user
+
+from backend.app import db, jwt
+from backend.app.date_windows import DEFAULT_TIMEZONE
+from backend.app.models.models import User
+
+# 已认证用户的只读快照，请求处理中只需要这些字段，不持有ORM对象
+UserIdentity = namedtuple('UserIdentity', ['id', 'username', 'timezone'])
+
+
+class IdentityCache:
+    """
+    进程内的用户身份缓存，按LRU淘汰，每个条目有TTL
+
+    用户信息变化时调用invalidate；多进程部署时其他进程最迟在TTL后读到新值
+    """
+    def __init__(self, max_users=10000, ttl=300):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()  # 用户ID -> (过期时刻, UserIdentity)
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, identity = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def set(self, identity):
+        with self._lock:
+            self._entries.pop(identity.id, None)
+            self._entries[identity.id] = (time.monotonic() + self.ttl, identity)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def get_identity_cache():
+    """
+    获取当前应用的身份缓存
+    """
+    cache = current_app.extensions.get('identity_cache')
+    if cache is None:
+        cache = IdentityCache(
+            max_users=current_app.config.get('IDENTITY_CACHE_MAX_USERS', 10000),
+            ttl=current_app.config.get('IDENTITY_CACHE_TTL', 300)
+        )
+        current_app.extensions['identity_cache'] = cache
+    return cache
+
+
+def load_identity(user_id):
+    """
+    获取用户身份快照，缓存未命中时查询一次用户表，用户不存在时返回None
+    """
+    cache = get_identity_cache()
+    identity = cache.get(user_id)
+    if identity is None:
+        row = db.session.query(User.id, User.username, User.timezone).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        identity = UserIdentity(*row)
+        cache.set(identity)
+    return identity
+
+
+def invalidate_identity(user_id):
+    """
+    用户信息变化后调用，使缓存的身份快照失效
+    """
+    get_identity_cache().invalidate(int(user_id))
+
+
+def get_user_timezone(user_id):
+    """
+    用户的时区名称，从身份缓存中读取，用户不存在时返回默认时区
+    """
+    identity = load_identity(int(user_id))
+    return identity.timezone if identity is not None else DEFAULT_TIMEZONE
+
+
+@jwt.user_lookup_loader
+def user_lookup_callback(jwt_header, jwt_data):
+    return load_identity(int(jwt_data['sub']))
+
+
+@jwt.user_lookup_error_loader
+def user_lookup_error_callback(jwt_header, jwt_data):
+    return jsonify({'message': 'User not found'}), 401
+
+
+def get_current_identity():
+    """
+    当前请求已认证用户的身份快照，只能在@jwt_required()保护的视图中使用
+    """
+    return current_user._get_current_object()
+
+
+def get_current_user_id():
+    """
+    当前请求已认证用户的ID
+    """
+    return current_user.id
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+import math
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from backend.app import db
+from backend.app.models.models import ReminderLease, ReminderWorker
+
+
+def make_worker_id():
+    """
+    生成工作进程标识：主机名、进程号和随机后缀，进程重启后是新的工作进程
+    """
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def shard_of(user_id, shard_count):
+    """
+    用户所属的提醒分片
+    """
+    return user_id % shard_count
+
+
+class ShardLeases:
+    """
+    基于数据库的分片租约
+
+    每个工作进程定期调用renew：写入心跳、续期自己持有的租约，并按存活进程数计算应持有的分片数
+    ceil(shard_count / 存活进程数)，多出的分片释放给其他进程，不足时抢占空闲或已过期的分片。
+    抢占用带条件的UPDATE完成（只有owner为空或租约已过期时才会成功），同一时刻每个分片最多有一个持有者。
+    进程退出时调用release立即释放分片；进程崩溃时其他进程在ttl秒后接管
+
+    持有者只在本地的有效期内处理分片：有效期从开始续期时算起为ttl的2/3，
+    比数据库中的租约早ttl/3到期，用来容忍错过一次续期和进程间的时钟偏差
+    """
+    def __init__(self, worker_id=None, shard_count=16, ttl=30):
+        self.worker_id = worker_id or make_worker_id()
+        self.shard_count = shard_count
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self._owned = frozenset()
+        self._valid_until = 0.0  # 本地有效期（time.monotonic）
+        self._renewed_at = None  # 上次续期的时刻（time.monotonic）
+
+    def owned_shards(self):
+        """
+        当前可以处理的分片；本地有效期已过（例如续期连续失败）时返回空集合
+        """
+        if time.monotonic() >= self._valid_until:
+            return frozenset()
+        return self._owned
+
+    def renew_due(self):
+        return self._renewed_at is None or time.monotonic() - self._renewed_at >= self.renew_interval
+
+    def _ensure_shards(self, now):
+        """
+        首次运行或调大shard_count时补齐分片行，多个进程并发插入时只有一个会成功
+        """
+        existing = set(db.session.scalars(select(ReminderLease.shard)))
+        missing = [shard for shard in range(self.shard_count) if shard not in existing]
+        if not missing:
+            return
+        try:
+            db.session.execute(insert(ReminderLease), [
+                {'shard': shard, 'owner': None, 'expires_at': now} for shard in missing
+            ])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
+    def renew(self):
+        """
+        写心跳、续期并重新平衡分片，返回当前持有的分片
+        """
+        started = time.monotonic()
+        self._renewed_at = started
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        self._ensure_shards(now)
+        try:
+            heartbeat = db.session.execute(
+                update(ReminderWorker).where(ReminderWorker.worker_id == self.worker_id).values(heartbeat_at=now)
+            )
+            if heartbeat.rowcount == 0:
+                db.session.execute(insert(ReminderWorker).values(worker_id=self.worker_id, heartbeat_at=now))
+            db.session.execute(
+                delete(ReminderWorker).where(ReminderWorker.heartbeat_at < now - timedelta(seconds=self.ttl))
+            )
+            alive = db.session.scalar(select(func.count()).select_from(ReminderWorker))
+            target = math.ceil(self.shard_count / max(alive, 1))
+
+            # 续期仍然有效的租约，租约已过期的分片可能已被其他进程接管
+            owned = sorted(db.session.scalars(select(ReminderLease.shard).where(
+                ReminderLease.owner == self.worker_id,
+                ReminderLease.expires_at > now,
+                ReminderLease.shard < self.shard_count
+            )))
+            keep, release = owned[:target], owned[target:]
+            if keep:
+                db.session.execute(update(ReminderLease).where(
+                    ReminderLease.owner == self.worker_id, ReminderLease.shard.in_(keep)
+                ).values(expires_at=expires_at))
+            if release:
+                db.session.execute(update(ReminderLease).where(
+                    ReminderLease.owner == self.worker_id, ReminderLease.shard.in_(release)
+                ).values(owner=None, expires_at=now))
+
+            owned = set(keep)
+            if len(owned) < target:
+                claimable = or_(ReminderLease.owner.is_(None), ReminderLease.expires_at <= now)
+                candidates = db.session.scalars(select(ReminderLease.shard).where(
+                    claimable, ReminderLease.shard < self.shard_count
+                ).order_by(ReminderLease.shard)).all()
+                for shard in candidates:
+                    if len(owned) >= target:
+                        break
+                    result = db.session.execute(update(ReminderLease).where(
+                        ReminderLease.shard == shard, claimable
+                    ).values(owner=self.worker_id, expires_at=expires_at))
+                    if result.rowcount == 1:
+                        owned.add(shard)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        self._owned = frozenset(owned)
+        self._valid_until = started + self.ttl * 2 / 3
+        return self._owned
+
+    def release(self):
+        """
+        释放持有的全部分片并注销心跳，其他进程下次续期时即可接管
+        """
+        self._owned = frozenset()
+        self._valid_until = 0.0
+        try:
+            db.session.execute(update(ReminderLease).where(
+                ReminderLease.owner == self.worker_id
+            ).values(owner=None, expires_at=datetime.utcnow()))
+            db.session.execute(delete(ReminderWorker).where(ReminderWorker.worker_id == self.worker_id))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+import threading
+import time
+
+from flask import Flask
+
+from backend.app.services.change_service import TOMBSTONE_RETENTION, purge_tombstones
+from backend.app.services.todo_service import purge_completed_tasks
+
+
+class PurgeService:
+    """
+    后台清理服务，定期分批删除所有用户24小时前已完成的任务，以及超过保留期的删除记录
+
+    每批删除batch_size条并立即提交，批与批之间暂停pause秒，
+    避免长事务和长时间持有锁影响在线请求
+    """
+    def __init__(self, app: Flask, interval=600, batch_size=500, pause=0.05, tombstone_retention=TOMBSTONE_RETENTION):
+        self.app = app
+        self.is_running = False
+        self.thread = None
+        self.interval = interval  # 两次清理之间的间隔，单位：秒
+        self.batch_size = batch_size
+        self.pause = pause
+        self.tombstone_retention = tombstone_retention
+        self._stop_event = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            'runs': 0,
+            'batches': 0,
+            'rows_purged': 0,
+            'tombstones_purged': 0,
+            'seconds_spent': 0.0,
+            'last_run_at': None,
+            'last_run_rows': 0,
+            'last_run_seconds': 0.0,
+        }
+
+    def start(self):
+        """
+        启动清理服务
+        """
+        if not self.is_running:
+            self.is_running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+            print("清理服务已启动")
+
+    def stop(self):
+        """
+        停止清理服务，当前批次提交后退出
+        """
+        if self.is_running:
+            self.is_running = False
+            self._stop_event.set()
+            if self.thread:
+                self.thread.join()
+            print("清理服务已停止")
+
+    def get_metrics(self):
+        """
+        返回累计的清理指标
+        """
+        with self._metrics_lock:
+            return dict(self.metrics)
+
+    def _run(self):
+        """
+        服务运行的主循环
+        """
+        while self.is_running:
+            try:
+                self.purge_once()
+            except Exception as e:
+                print(f"清理服务删除任务时出错: {e}")
+            self._stop_event.wait(self.interval)
+
+    def purge_once(self):
+        """
+        执行一轮清理，直到没有可删除的任务或服务停止，返回本轮删除的任务条数
+        """
+        started = time.perf_counter()
+        purged = 0
+        tombstones = 0
+        batches = 0
+        with self.app.app_context():
+            while True:
+                deleted = purge_completed_tasks(self.batch_size)
+                purged += deleted
+                if deleted:
+                    batches += 1
+                if deleted < self.batch_size:
+                    break
+                # 批与批之间让出数据库和CPU，服务停止时立即退出
+                if self._stop_event.wait(self.pause):
+                    break
+            while not self._stop_event.is_set():
+                deleted = purge_tombstones(self.tombstone_retention, self.batch_size)
+                tombstones += deleted
+                if deleted < self.batch_size or self._stop_event.wait(self.pause):
+                    break
+        elapsed = time.perf_counter() - started
+
+        with self._metrics_lock:
+            self.metrics['runs'] += 1
+            self.metrics['batches'] += batches
+            self.metrics['rows_purged'] += purged
+            self.metrics['tombstones_purged'] += tombstones
+            self.metrics['seconds_spent'] += elapsed
+            self.metrics['last_run_at'] = datetime.utcnow().isoformat()
+            self.metrics['last_run_rows'] = purged
+            self.metrics['last_run_seconds'] = elapsed
+        if purged:
+            print(f"清理服务删除了{purged}个已完成的任务，共{batches}批，耗时{elapsed:.2f}秒")
+        return purged
+
+
+# 创建清理服务实例
+purge_service = None
+
+def init_purge_service(app: Flask):
+    """
+    初始化并启动清理服务
+    """
+    global purge_service
+    purge_service = PurgeService(
+        app,
+        interval=app.config.get('PURGE_INTERVAL', 600),
+        batch_size=app.config.get('PURGE_BATCH_SIZE', 500),
+        pause=app.config.get('PURGE_BATCH_PAUSE', 0.05),
+        tombstone_retention=timedelta(days=app.config.get('CHANGE_TOMBSTONE_RETENTION_DAYS', 30))
+    )
+    purge_service.start()
+
+    return purge_service
@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import threading
+
+import bcrypt
+from flask import current_app
+
+
+class PasswordHasherBusy(Exception):
+    """
+    等待哈希计算的请求过多，调用方应返回503让客户端稍后重试
+    """
+
+
+def _hash_password(password, rounds):
+    """
+    在工作进程/线程中计算bcrypt哈希，格式与Flask-Bcrypt生成的一致
+    """
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check_password(pw_hash, password):
+    """
+    在工作进程/线程中校验密码
+    """
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # 哈希格式无效或密码超过bcrypt的72字节上限
+        return False
+
+
+class PasswordHasher:
+    """
+    在有界的工作池中执行bcrypt计算，避免阻塞处理请求的线程
+
+    executor默认为thread，使用线程池：bcrypt计算会释放GIL，线程同样能利用多核；
+    为process时使用spawn进程池，子进程会重新导入启动脚本，启动脚本必须把create_app()放在
+    if __name__ == '__main__'之下，否则每个子进程都会创建应用并启动后台服务。
+    同时在途的计算数超过max_pending时直接拒绝，而不是无限排队
+    """
+    def __init__(self, rounds=12, executor='thread', workers=None, max_pending=64, timeout=30):
+        self.rounds = rounds
+        self.timeout = timeout
+        workers = workers or multiprocessing.cpu_count()
+        if executor == 'process':
+            # spawn在各平台上行为一致，也不会复制父进程中的线程和数据库连接
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy('Too many pending password operations')
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def verify(self, pw_hash, password):
+        return self._run(_check_password, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """
+        哈希的工作因子与当前配置不一致时需要重新计算，格式为 $2b$<cost>$<salt+hash>
+        """
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def get_password_hasher():
+    """
+    获取当前应用的密码哈希器，工作因子沿用Flask-Bcrypt的BCRYPT_LOG_ROUNDS配置
+    """
+    hasher = current_app.extensions.get('password_hasher')
+    if hasher is None:
+        config = current_app.config
+        hasher = PasswordHasher(
+            rounds=config.get('BCRYPT_LOG_ROUNDS', 12),
+            executor=config.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+            workers=config.get('PASSWORD_HASH_WORKERS'),
+            max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 64),
+            timeout=config.get('PASSWORD_HASH_TIMEOUT', 30)
+        )
+        current_app.extensions['password_hasher'] = hasher
+    return hasher
+
+
+def hash_password(password):
+    """
+    计算密码哈希
+    """
+    return get_password_hasher().hash(password)
+
+
+def verify_password(pw_hash, password):
+    """
+    校验密码是否与哈希匹配
+    """
+    return get_password_hasher().verify(pw_hash, password)
+
+
+def password_needs_rehash(pw_hash):
+    """
+    判断已保存的哈希是否需要按当前工作因子重新计算
+    """
+    return get_password_hasher().needs_rehash(pw_hash)
@@ -1,21 +1,85 @@
 from datetime import datetime, timedelta, timezone
+import heapq
 import threading
-import time
-from flask import Flask, request
+from flask import Flask, request, session
 from flask_socketio import SocketIO, emit, join_room
+from sqlalchemy import bindparam, func, update
 from backend.app.models.models import Todo, User
 from backend.app import db, socketio
+from backend.app.services.lease_service import ShardLeases
+from backend.app.services.token_service import authenticate_access_token
+
+
+# 提醒时间点：(名称, 截止时间前的提前量, 在reminder_mask中对应的位)
+REMINDER_TIMEPOINTS = [
+    ('1h', timedelta(hours=1), 1),
+    ('15m', timedelta(minutes=15), 2),
+    ('5m', timedelta(minutes=5), 4)
+]
+# 提醒时间点过后仍允许补发提醒的时长
+REMINDER_GRACE = timedelta(minutes=1)
+
+
+def _as_utc_naive(value):
+    """
+    将日期时间统一转换为naive UTC时间，与数据库中的时间保持一致
+    """
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def next_reminder_time(due_date, reminder_mask, now=None):
+    """
+    计算下一个尚未发送且未过期的提醒时刻，没有则返回None
+    """
+    if due_date is None:
+        return None
+    due_date = _as_utc_naive(due_date)
+    now = now or datetime.utcnow()
+    for _, time_delta, bit in REMINDER_TIMEPOINTS:
+        reminder_time = due_date - time_delta
+        if not reminder_mask & bit and now < reminder_time + REMINDER_GRACE:
+            return reminder_time
+    return None
+
+
+def refresh_next_reminder(todo, now=None):
+    """
+    根据任务的完成状态、截止时间和已发送的提醒更新next_reminder_at，需在提交前调用
+    """
+    if todo.completed:
+        todo.next_reminder_at = None
+    else:
+        todo.next_reminder_at = next_reminder_time(todo.due_date, todo.reminder_mask or 0, now)
 
 
 class ReminderService:
     """
-    提醒服务类，用于定期检查即将到期的任务并发送提醒
+    提醒服务类，用小顶堆维护即将到来的提醒时刻，并在提醒时刻准时发送提醒
+    
+    提醒状态保存在任务的next_reminder_at（带索引）和reminder_mask中；
+    堆中只保存预加载窗口（lookahead）内的提醒时刻，用于决定何时唤醒，
+    窗口随时间推进从数据库增量加载，任务的增删改通过schedule/unschedule同步到堆中
+
+    多个进程运行提醒服务时，用户按user_id取模分成若干分片，各进程通过数据库租约（ShardLeases）
+    分摊分片，只扫描和发送自己持有的分片中的提醒；进程增减时分片自动重新分配。
+    其他进程中的任务变化不会同步到本进程的堆中，因此每次续期租约时也会检查一次到期的提醒
     """
-    def __init__(self, app: Flask):
+    def __init__(self, app: Flask, leases: ShardLeases = None):
         self.app = app
+        self.leases = leases or ShardLeases(
+            shard_count=app.config.get('REMINDER_SHARDS', 16),
+            ttl=app.config.get('REMINDER_LEASE_TTL', 30)
+        )
+        self._shards = frozenset()  # 当前加载窗口对应的分片
         self.is_running = False
         self.thread = None
-        self.check_interval = 60  # 检查间隔，单位：秒
+        self.lookahead = timedelta(hours=2)  # 预加载窗口长度
+        self._heap = []  # 元素为(提醒时刻, 任务ID)
+        self._scheduled = {}  # 任务ID -> 当前有效的提醒时刻，提醒时刻变化后旧的堆元素自动失效
+        self._window_end = None  # 已加载到堆中的提醒时刻上界
+        self._condition = threading.Condition()
     
     def start(self):
         """
@@ -34,13 +98,124 @@ class ReminderService:
         """
         if self.is_running:
             self.is_running = False
+            with self._condition:
+                self._condition.notify_all()
             if self.thread:
                 self.thread.join()
+            # 立即释放分片，其他进程不必等租约过期
+            try:
+                with self.app.app_context():
+                    self.leases.release()
+            except Exception as e:
+                print(f"释放提醒分片时出错: {e}")
             print("提醒服务已停止")
     
+    def schedule(self, todo_id, next_reminder_at):
+        """
+        任务创建或修改后更新其提醒时刻
+        """
+        with self._condition:
+            self._push(todo_id, next_reminder_at)
+            self._condition.notify_all()
+    
+    def unschedule(self, todo_id):
+        """
+        任务删除后取消其提醒，堆中的元素在弹出时被丢弃
+        """
+        with self._condition:
+            self._scheduled.pop(todo_id, None)
+    
+    def _push(self, todo_id, reminder_time):
+        """
+        记录任务的提醒时刻，落在已加载窗口内时加入堆，调用方需持有锁
+        窗口外的任务不在内存中保留，窗口推进时会从数据库重新读取
+        """
+        if reminder_time is None or self._window_end is None or reminder_time >= self._window_end:
+            self._scheduled.pop(todo_id, None)
+            return
+        if self._scheduled.get(todo_id) == reminder_time:
+            return
+        self._scheduled[todo_id] = reminder_time
+        heapq.heappush(self._heap, (reminder_time, todo_id))
+    
+    def _load_window(self, now):
+        """
+        从数据库增量加载下一段窗口内的提醒时刻
+        next_reminder_at上的索引范围查询，代价与窗口内的提醒数量成正比
+        """
+        window_start = self._window_end if self._window_end is not None else now - REMINDER_GRACE
+        window_end = now + self.lookahead
+        if window_end <= window_start:
+            return
+        
+        rows = db.session.query(Todo.id, Todo.next_reminder_at).filter(
+            Todo.next_reminder_at >= window_start,
+            Todo.next_reminder_at < window_end,
+            *self._shard_filter()
+        ).all()
+        
+        with self._condition:
+            self._window_end = window_end
+            for todo_id, reminder_time in rows:
+                # 服务内已记录的提醒时刻比数据库查询结果更新
+                if todo_id not in self._scheduled:
+                    self._push(todo_id, reminder_time)
+    
+    def _shard_filter(self):
+        """
+        只查询本进程持有的分片；持有全部分片时不加条件
+        """
+        if len(self._shards) >= self.leases.shard_count:
+            return ()
+        return ((Todo.user_id % self.leases.shard_count).in_(sorted(self._shards)),)
+
+    def _refresh_shards(self):
+        """
+        按需续期租约；持有的分片变化后清空堆，按新的分片重新加载窗口
+        """
+        if self.leases.renew_due():
+            try:
+                self.leases.renew()
+            except Exception as e:
+                print(f"续期提醒分片租约时出错: {e}")
+        shards = self.leases.owned_shards()
+        if shards != self._shards:
+            with self._condition:
+                self._shards = shards
+                self._heap = []
+                self._scheduled = {}
+                self._window_end = None
+        return shards
+
+    def _pop_due_reminders(self, now):
+        """
+        弹出所有已到提醒时刻的有效堆元素，返回是否有提醒到期
+        """
+        has_due = False
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                reminder_time, todo_id = heapq.heappop(self._heap)
+                if self._scheduled.get(todo_id) == reminder_time:
+                    del self._scheduled[todo_id]
+                    has_due = True
+        return has_due
+    
+    def _seconds_until_next(self):
+        """
+        计算距离下一个提醒时刻或下一次窗口加载的秒数
+        """
+        now = datetime.utcnow()
+        if self._window_end is None:
+            # 未持有分片时也要定期续期，以便接管其他进程释放的分片
+            return self.leases.renew_interval
+        next_wakeup = min(self._window_end - self.lookahead / 2, now + timedelta(seconds=self.leases.renew_interval))
+        if self._heap:
+            next_wakeup = min(next_wakeup, self._heap[0][0])
+        return max((next_wakeup - now).total_seconds(), 0)
+    
     def _run(self):
         """
-        服务运行的主循环
+        服务运行的主循环：睡眠到下一个提醒时刻，被唤醒后发送到期的提醒
         """
         while self.is_running:
             try:
@@ -48,50 +223,46 @@ class ReminderService:
             except Exception as e:
                 print(f"提醒服务检查任务时出错: {e}")
             
-            # 等待下一次检查
-            for _ in range(self.check_interval):
-                if not self.is_running:
-                    break
-                time.sleep(1)
+            # 等待下一个提醒时刻，任务变化时会被提前唤醒
+            with self._condition:
+                if self.is_running:
+                    self._condition.wait(self._seconds_until_next())
     
     def _check_upcoming_tasks(self):
         """
-        检查所有用户的即将到期任务，在截止时间前1小时、15分钟和5分钟发送提醒
+        发送所有已到提醒时刻的提醒：按next_reminder_at做一次范围查询，再以读到的值为条件批量UPDATE记录发送状态
         """
-        import json
         now = datetime.utcnow()  # 使用UTC时间（naive datetime），与数据库中的时间保持一致
         
-        # 定义需要检查的时间点
-        reminder_timepoints = [
-            ('1h', timedelta(hours=1)),  # 1小时前
-            ('15m', timedelta(minutes=15)),  # 15分钟前
-            ('5m', timedelta(minutes=5))  # 5分钟前
-        ]
-        
         # 使用应用上下文查询数据库
         with self.app.app_context():
-            # 查询所有未完成且有截止日期的任务
-            tasks_with_due_date = Todo.query.filter(
-                Todo.completed.is_(False),
-                Todo.due_date.isnot(None)
-            ).all()
+            if not self._refresh_shards():
+                return
+            if self._window_end is None or now >= self._window_end - self.lookahead / 2:
+                self._load_window(now)
+            self._pop_due_reminders(now)
+            
+            tasks = db.session.query(
+                Todo.id, Todo.user_id, Todo.title, Todo.description, Todo.due_date, Todo.priority,
+                Todo.reminder_mask, Todo.next_reminder_at
+            ).filter(Todo.next_reminder_at <= now, *self._shard_filter()).all()
+            if not tasks:
+                return
             
             # 按用户分组需要发送的提醒
             user_reminders = {}
+            updates = []
             
-            for task in tasks_with_due_date:
-                # 获取已发送的提醒列表
-                reminders_sent = json.loads(task.reminders_sent) if task.reminders_sent else []
-                
-                for timepoint_name, time_delta in reminder_timepoints:
+            for task in tasks:
+                reminder_mask = task.reminder_mask or 0
+                for timepoint_name, time_delta, bit in REMINDER_TIMEPOINTS:
                     # 计算提醒时间点
                     reminder_time = task.due_date - time_delta
                     
                     # 检查是否到达提醒时间点，且该时间点的提醒尚未发送
-                    if now >= reminder_time and now < reminder_time + timedelta(minutes=1) and timepoint_name not in reminders_sent:
+                    if reminder_time <= now < reminder_time + REMINDER_GRACE and not reminder_mask & bit:
                         # 记录已发送的提醒
-                        reminders_sent.append(timepoint_name)
-                        task.reminders_sent = json.dumps(reminders_sent)
+                        reminder_mask |= bit
                         
                         # 将任务添加到用户提醒列表
                         if task.user_id not in user_reminders:
@@ -105,13 +276,47 @@ class ReminderService:
                             'priority': task.priority,
                             'reminder_time': timepoint_name
                         })
+                
+                updates.append({
+                    'b_id': task.id,
+                    'b_mask': task.reminder_mask or 0,
+                    'b_next': task.next_reminder_at,
+                    'new_mask': reminder_mask,
+                    'new_next': next_reminder_time(task.due_date, reminder_mask, now)
+                })
             
-            # 保存所有更新
+            claimed = self._claim_reminders(updates)
             db.session.commit()
             
-            # 向每个有即将到期任务的用户发送提醒
+            with self._condition:
+                for item in updates:
+                    if item['b_id'] in claimed:
+                        self._push(item['b_id'], item['new_next'])
+            
+            # 只向更新成功的任务发送提醒，读取之后被其他进程或请求改动过的任务留给下一次检查
             for user_id, tasks in user_reminders.items():
-                self._send_reminder(user_id, tasks)
+                tasks = [task for task in tasks if task['id'] in claimed]
+                if tasks:
+                    self._send_reminder(user_id, tasks)
+    
+    def _claim_reminders(self, updates):
+        """
+        以读取时的reminder_mask和next_reminder_at为条件保存发送状态，返回实际更新成功的任务ID
+
+        先用一条批量UPDATE；全部命中时即完成，否则回滚后逐条执行，找出未被改动的任务
+        """
+        statement = update(Todo.__table__).where(
+            Todo.id == bindparam('b_id'),
+            func.coalesce(Todo.reminder_mask, 0) == bindparam('b_mask'),
+            Todo.next_reminder_at == bindparam('b_next')
+        ).values(reminder_mask=bindparam('new_mask'), next_reminder_at=bindparam('new_next'))
+
+        dialect = db.session.get_bind(Todo).dialect
+        if dialect.supports_sane_multi_rowcount:
+            if db.session.execute(statement, updates).rowcount == len(updates):
+                return {item['b_id'] for item in updates}
+            db.session.rollback()
+        return {item['b_id'] for item in updates if db.session.execute(statement, item).rowcount == 1}
     
     def _send_reminder(self, user_id: int, tasks: list):
         """
@@ -147,11 +352,20 @@ reminder_service = None
 
 # WebSocket事件处理
 @socketio.on('connect')
-def handle_connect():
+def handle_connect(auth=None):
     """
-    处理客户端连接事件
+    处理客户端连接事件：连接时须在auth中携带访问令牌 {'token': ...}，
+    校验通过后只加入令牌所属用户的房间，否则拒绝连接
     """
-    print('客户端已连接:', request.sid)
+    token = auth.get('token') if isinstance(auth, dict) else None
+    try:
+        user_id = authenticate_access_token(token)
+    except ValueError:
+        print('拒绝未认证的客户端连接:', request.sid)
+        return False
+    session['user_id'] = user_id
+    join_room(str(user_id))
+    print(f'用户 {user_id} 已连接:', request.sid)
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -161,12 +375,25 @@ def handle_disconnect():
     print('客户端已断开连接:', request.sid)
 
 @socketio.on('join_room')
-def handle_join_room(user_id):
+def handle_join_room(user_id=None):
     """
-    处理用户加入房间事件
+    处理用户加入房间事件（兼容旧客户端）：忽略传入的用户ID，只加入连接时认证的用户的房间
     """
-    join_room(str(user_id))
-    print(f'用户 {user_id} 已加入房间')
+    join_room(str(session['user_id']))
+
+def schedule_todo_reminders(todo):
+    """
+    任务创建或修改后同步提醒时刻，提醒服务未启动时不做任何事
+    """
+    if reminder_service is not None:
+        reminder_service.schedule(todo.id, todo.next_reminder_at)
+
+def unschedule_todo_reminders(todo_id):
+    """
+    任务删除后取消提醒，提醒服务未启动时不做任何事
+    """
+    if reminder_service is not None:
+        reminder_service.unschedule(todo_id)
 
 def init_reminder_service(app: Flask):
     """
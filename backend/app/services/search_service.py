@@ -0,0 +1,299 @@
+from collections import OrderedDict, defaultdict
+import threading
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from backend.app import db
+from backend.app.models.models import DeletedRecord, Todo, User
+
+
+class SearchBackend:
+    """
+    搜索后端接口：根据搜索词过滤get_todos的查询，并可选地给出相关度排序
+    """
+    def filter_query(self, query, user_id, term):
+        """
+        返回(过滤后的查询, 相关度排序表达式或None)，排序表达式的值越小越相关
+        """
+        raise NotImplementedError
+
+    def index_todo(self, todo):
+        """
+        任务创建或修改后同步索引
+        """
+
+    def remove_todos(self, user_id, todo_ids):
+        """
+        任务删除后同步索引
+        """
+
+
+def _escape_like(term):
+    """
+    转义搜索词中的LIKE通配符，使%、_和反斜杠按字面匹配
+    """
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _matches(term):
+    """
+    标题或描述包含搜索词（不区分大小写）的过滤条件
+    """
+    search_term = f"%{_escape_like(term)}%"
+    return db.or_(
+        Todo.title.ilike(search_term, escape='\\'),
+        Todo.description.ilike(search_term, escape='\\')
+    )
+
+
+def _relevance(term):
+    """
+    相关度排序表达式，值越小越相关：标题每命中一次记3分，描述每命中一次记1分，标题以搜索词开头再加2分
+
+    所有后端使用同一个表达式，切换后端或回退为ILIKE时排序键不变，已发出的游标仍然有效
+    """
+    term = term.lower()
+
+    def hits(column):
+        text = func.lower(func.coalesce(column, ''))
+        return (func.length(text) - func.length(func.replace(text, term, ''))) // func.length(term)
+
+    starts = db.case((Todo.title.ilike(f"{_escape_like(term)}%", escape='\\'), 2), else_=0)
+    return -(3 * hits(Todo.title) + hits(Todo.description) + starts)
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    基于 ILIKE '%词%' 的搜索，无需维护索引，但每次搜索都会扫描用户的全部任务
+    """
+    def filter_query(self, query, user_id, term):
+        return query.filter(_matches(term)), _relevance(term)
+
+
+def _grams(text, n):
+    """
+    切分文本的n元组；按字符切分，对中文等不以空格分词的文字同样适用
+    """
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+# 估算索引内存时每个倒排表条目和每个文档的字节数（含集合、字典和字符串对象的开销）
+POSTING_BYTES = 64
+DOCUMENT_BYTES = 200
+
+
+class _UserIndex:
+    """
+    单个用户的倒排索引：一元组和二元组 -> 任务ID集合
+
+    revision为索引已包含的用户变更序号，每个文档也记下自己的序号，
+    并发的追赶或写入同步不会用旧版本覆盖新版本；size为估算的内存字节数
+    """
+    def __init__(self, rows, revision):
+        self.revision = revision
+        self.size = 0
+        self.documents = {}  # 任务ID -> (标题, 描述, 变更序号)
+        self.postings = defaultdict(set)
+        for todo_id, title, description, todo_revision in rows:
+            self.add(todo_id, title, description, todo_revision)
+
+    def add(self, todo_id, title, description, revision):
+        document = self.documents.get(todo_id)
+        if document is not None and document[2] > revision:
+            return
+        self.remove(todo_id)
+        document = ((title or '').lower(), (description or '').lower(), revision)
+        self.documents[todo_id] = document
+        grams = self._document_grams(document)
+        for gram in grams:
+            self.postings[gram].add(todo_id)
+        self.size += DOCUMENT_BYTES + 2 * (len(document[0]) + len(document[1])) + POSTING_BYTES * len(grams)
+
+    def remove(self, todo_id):
+        document = self.documents.pop(todo_id, None)
+        if document is None:
+            return
+        grams = self._document_grams(document)
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(todo_id)
+                if not ids:
+                    del self.postings[gram]
+        self.size -= DOCUMENT_BYTES + 2 * (len(document[0]) + len(document[1])) + POSTING_BYTES * len(grams)
+
+    @staticmethod
+    def _document_grams(document):
+        title, description, _ = document
+        return _grams(title, 1) | _grams(title, 2) | _grams(description, 1) | _grams(description, 2)
+
+    def search(self, term):
+        """
+        返回包含整个搜索词的任务ID列表
+        先用搜索词的n元组求倒排表交集得到候选集，再逐个确认包含整个搜索词
+        """
+        term = term.lower()
+        grams = _grams(term, 2) or _grams(term, 1)
+        if not grams:
+            return []
+        # 从最短的倒排表开始求交集
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for ids in postings[1:]:
+            candidates &= ids
+            if not candidates:
+                return []
+        return [
+            todo_id for todo_id in candidates
+            if term in self.documents[todo_id][0] or term in self.documents[todo_id][1]
+        ]
+
+
+class NgramSearchBackend(SearchBackend):
+    """
+    进程内n元组倒排索引搜索
+
+    每个用户的索引在第一次搜索时从数据库构建，之后由本进程的增删改同步；每次搜索先读取用户的
+    change_seq，有其他进程写入的变更时沿(user_id, revision)索引只补读变化的任务和删除记录，
+    删除记录已被清理时才整体重建。索引只用于缩小候选集，查询中仍带有ILIKE条件，
+    结果与ILIKE扫描一致。索引按LRU淘汰，总量受max_users和估算的max_bytes限制，
+    单个用户的索引超过max_bytes时该用户直接使用ILIKE扫描
+    """
+    def __init__(self, max_users=1000, max_bytes=64 * 1024 * 1024, max_candidates=5000):
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        # 命中任务过多时搜索词区分度很低，直接回退为ILIKE扫描
+        self.max_candidates = max_candidates
+        self._indexes = OrderedDict()  # 用户ID -> _UserIndex，索引过大的用户为None
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _get_index(self, user_id):
+        """
+        返回追赶到最新变更序号的索引，用户的索引过大时返回None
+        """
+        revision, floor = db.session.execute(
+            select(User.change_seq, User.change_floor).where(User.id == user_id)
+        ).one()
+        with self._lock:
+            cached = user_id in self._indexes
+            index = self._indexes.get(user_id)
+            if cached:
+                self._indexes.move_to_end(user_id)
+        if cached and index is None:
+            return None
+        if index is not None and index.revision >= floor:
+            if index.revision < revision:
+                self._catch_up(user_id, index, revision)
+            return index
+
+        rows = db.session.query(Todo.id, Todo.title, Todo.description, Todo.revision).filter_by(user_id=user_id).all()
+        index = _UserIndex(rows, revision)
+        with self._lock:
+            self._remove(user_id)
+            self._indexes[user_id] = index if index.size <= self.max_bytes else None
+            self._size += self._indexes[user_id].size if self._indexes[user_id] else 0
+            self._evict()
+        return index
+
+    def _catch_up(self, user_id, index, revision):
+        """
+        补读index.revision之后变化的任务和删除的任务
+        """
+        rows = db.session.query(Todo.id, Todo.title, Todo.description, Todo.revision).filter(
+            Todo.user_id == user_id, Todo.revision > index.revision
+        ).all()
+        deleted_ids = db.session.scalars(select(DeletedRecord.record_id).where(
+            DeletedRecord.user_id == user_id, DeletedRecord.kind == 'todo', DeletedRecord.revision > index.revision
+        )).all()
+        with self._lock:
+            before = index.size
+            for row in rows:
+                index.add(*row)
+            for todo_id in deleted_ids:
+                index.remove(todo_id)
+            index.revision = max(index.revision, revision)
+            if self._indexes.get(user_id) is index:
+                self._size += index.size - before
+                self._evict()
+
+    def _remove(self, user_id):
+        index = self._indexes.pop(user_id, None)
+        if index is not None:
+            self._size -= index.size
+
+    def _evict(self):
+        while self._indexes and (len(self._indexes) > self.max_users or self._size > self.max_bytes):
+            self._remove(next(iter(self._indexes)))
+
+    def filter_query(self, query, user_id, term):
+        user_id = int(user_id)
+        query = query.filter(_matches(term))
+        index = self._get_index(user_id)
+        if index is None:
+            return query, _relevance(term)
+        with self._lock:
+            candidate_ids = index.search(term)
+        if not candidate_ids:
+            return query.filter(db.false()), _relevance(term)
+        if len(candidate_ids) <= self.max_candidates:
+            query = query.filter(Todo.id.in_(candidate_ids))
+        return query, _relevance(term)
+
+    def index_todo(self, todo):
+        with self._lock:
+            index = self._indexes.get(todo.user_id)
+            if index is not None:
+                before = index.size
+                index.add(todo.id, todo.title, todo.description, todo.revision)
+                self._size += index.size - before
+                self._evict()
+
+    def remove_todos(self, user_id, todo_ids):
+        with self._lock:
+            index = self._indexes.get(int(user_id))
+            if index is not None:
+                before = index.size
+                for todo_id in todo_ids:
+                    index.remove(todo_id)
+                self._size += index.size - before
+
+
+# 可通过 SEARCH_BACKEND 配置选择的搜索后端
+SEARCH_BACKENDS = {
+    'like': LikeSearchBackend,
+    'ngram': NgramSearchBackend,
+}
+
+
+def get_search_backend():
+    """
+    获取当前应用的搜索后端实例
+    """
+    backend = current_app.extensions.get('search_backend')
+    if backend is None:
+        name = current_app.config.get('SEARCH_BACKEND', 'ngram')
+        if name == 'ngram':
+            backend = NgramSearchBackend(
+                max_users=current_app.config.get('SEARCH_INDEX_MAX_USERS', 1000),
+                max_bytes=current_app.config.get('SEARCH_INDEX_MAX_BYTES', 64 * 1024 * 1024)
+            )
+        else:
+            backend = SEARCH_BACKENDS[name]()
+        current_app.extensions['search_backend'] = backend
+    return backend
+
+
+def index_todo(todo):
+    """
+    任务创建或修改后同步搜索索引
+    """
+    get_search_backend().index_todo(todo)
+
+
+def remove_todos(user_id, todo_ids):
+    """
+    任务删除后同步搜索索引
+    """
+    get_search_backend().remove_todos(user_id, todo_ids)
@@ -0,0 +1,63 @@
+from sqlalchemy import case, delete, func, insert, select, update
+
+from backend.app import db
+from backend.app.models.models import TodoStats, Todo, User
+
+
+def _stats_query():
+    """
+    按用户重新统计任务数和已完成数（没有任务的用户计数为0）
+    """
+    return select(
+        User.id,
+        func.count(Todo.id),
+        func.coalesce(func.sum(case((Todo.completed.is_(True), 1), else_=0)), 0),
+    ).select_from(User).outerjoin(Todo, Todo.user_id == User.id).group_by(User.id)
+
+
+def adjust_todo_stats(user_id, total=0, completed=0):
+    """
+    在当前事务中调整用户的任务计数，需在修改任务之后、提交之前调用
+
+    计数行用UPDATE原子地加减，并发的写事务不会互相覆盖；
+    用户还没有计数行时按当前数据（包括本事务中的修改）统计后插入
+    """
+    if not total and not completed:
+        return
+    result = db.session.execute(
+        update(TodoStats).where(TodoStats.user_id == user_id).values(
+            total_tasks=TodoStats.total_tasks + total,
+            completed_tasks=TodoStats.completed_tasks + completed
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount == 0:
+        db.session.flush()
+        db.session.execute(insert(TodoStats).from_select(
+            ['user_id', 'total_tasks', 'completed_tasks'], _stats_query().where(User.id == user_id)
+        ))
+
+
+def get_todo_stats(user_id):
+    """
+    返回用户的(任务总数, 已完成数)，按主键读取一行；缺少计数行时退回聚合查询
+    """
+    row = db.session.execute(
+        select(TodoStats.total_tasks, TodoStats.completed_tasks).where(TodoStats.user_id == user_id)
+    ).first()
+    if row is None:
+        row = db.session.execute(_stats_query().where(User.id == user_id)).first()
+        return (row[1], row[2]) if row else (0, 0)
+    return tuple(row)
+
+
+def rebuild_todo_stats():
+    """
+    从任务表重新生成所有用户的计数，在一个事务中完成，返回计数行数
+    """
+    db.session.execute(delete(TodoStats))
+    db.session.execute(insert(TodoStats).from_select(
+        ['user_id', 'total_tasks', 'completed_tasks'], _stats_query()
+    ))
+    db.session.commit()
+    return db.session.scalar(select(func.count()).select_from(TodoStats))
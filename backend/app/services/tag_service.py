@@ -1,8 +1,14 @@
 from backend.app import db
+from backend.app.database import read_only
 from backend.app.models.models import Tag, Todo, todo_tags
 from backend.app.schems import TagSchema, TagUpdateSchema
+from backend.app.serializers import serialize_tag, serialize_todos
+from backend.app.services.cache_service import bump_user_version
+from backend.app.services.change_service import next_revision, record_deletions, touch_tag_todos
+from backend.app.services.event_service import publish_changes, tag_event
 from marshmallow import ValidationError
 
+@read_only
 def get_tags(user_id):
     """
     获取用户的所有标签
@@ -10,15 +16,7 @@ def get_tags(user_id):
     tags = Tag.query.filter_by(user_id=user_id).all()
     
     # 转换为响应格式
-    output = []
-    for tag in tags:
-        output.append({
-            'id': tag.id,
-            'name': tag.name,
-            'color': tag.color
-        })
-    
-    return output
+    return [serialize_tag(tag) for tag in tags]
 
 def create_tag(user_id, name, color=None):
     """
@@ -39,20 +37,21 @@ def create_tag(user_id, name, color=None):
     name = tag_data['name']
     color = tag_data.get('color', '#3498db')  # 默认颜色
     
+    revision = next_revision(user_id)
     new_tag = Tag(
         name=name,
         color=color,
-        user_id=user_id
+        user_id=user_id,
+        revision=revision
     )
     
     db.session.add(new_tag)
     db.session.commit()
+    bump_user_version(user_id)
     
-    return {
-        'id': new_tag.id,
-        'name': new_tag.name,
-        'color': new_tag.color
-    }
+    result = serialize_tag(new_tag)
+    publish_changes(user_id, revision, [tag_event('created', result)])
+    return result
 
 def update_tag(user_id, tag_id, name=None, color=None):
     """
@@ -78,19 +77,21 @@ def update_tag(user_id, tag_id, name=None, color=None):
     except ValidationError as err:
         raise ValueError(err.messages)
     
-    # 应用更新
+    # 应用更新，带有该标签的任务也随之重新下发
+    revision = tag.revision = next_revision(user_id)
+    touch_tag_todos(tag_id, revision)
     if 'name' in validated_data:
         tag.name = validated_data['name']
     if 'color' in validated_data:
         tag.color = validated_data['color']
     
     db.session.commit()
+    bump_user_version(user_id)
     
-    return {
-        'id': tag.id,
-        'name': tag.name,
-        'color': tag.color
-    }
+    # 客户端按标签ID修补任务中的标签，不逐个推送受影响的任务
+    result = serialize_tag(tag)
+    publish_changes(user_id, revision, [tag_event('updated', result)])
+    return result
 
 def delete_tag(user_id, tag_id):
     """
@@ -101,15 +102,21 @@ def delete_tag(user_id, tag_id):
     if not tag:
         raise ValueError('Tag not found')
     
-    # 先删除标签与任务的关联
+    # 记录删除并让带有该标签的任务重新下发，然后删除标签与任务的关联
+    revision = next_revision(user_id)
+    record_deletions(user_id, 'tag', [tag_id], revision)
+    touch_tag_todos(tag_id, revision)
     db.session.execute(todo_tags.delete().where(todo_tags.c.tag_id == tag_id))
     
     # 删除标签
     db.session.delete(tag)
     db.session.commit()
+    bump_user_version(user_id)
+    publish_changes(user_id, revision, [tag_event('deleted', {'id': tag_id})])
     
     return {'message': 'Tag deleted successfully'}
 
+@read_only
 def get_tag_todos(user_id, tag_id):
     """
     获取特定标签的所有任务
@@ -122,20 +129,4 @@ def get_tag_todos(user_id, tag_id):
     todos = tag.todos.all()
     
     # 转换为响应格式
-    output = []
-    for todo in todos:
-        tags = [{'id': t.id, 'name': t.name, 'color': t.color} for t in todo.tags]
-        
-        todo_data = {
-            'id': todo.id,
-            'title': todo.title,
-            'description': todo.description,
-            'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
-            'priority': todo.priority,
-            'tags': tags
-        }
-        output.append(todo_data)
-    
-    return output
\ No newline at end of file
+    return serialize_todos(todos)
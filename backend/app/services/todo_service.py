@@ -1,13 +1,118 @@
 from datetime import datetime, timedelta, timezone
+import base64
+import json
 from backend.app import db
-from backend.app.models.models import Todo, Tag
+from backend.app.database import read_only
+from backend.app.date_windows import day_window, days_window, in_window, local_date, local_today, week_window
+from backend.app.models.models import Todo, Tag, todo_tags
 from backend.app.schems import TodoSchema, TodoUpdateSchema
+from backend.app.serializers import serialize_todo, serialize_todos
+from backend.app.services.cache_service import bump_user_version
+from backend.app.services.change_service import next_revision, record_deletions
+from backend.app.services.event_service import publish_changes, todo_event
+from backend.app.services.identity_service import get_user_timezone
+from backend.app.services.stats_service import adjust_todo_stats, get_todo_stats
+from backend.app.services.search_service import get_search_backend, index_todo, remove_todos
+from backend.app.services.reminder_service import (
+    next_reminder_time, refresh_next_reminder, schedule_todo_reminders, unschedule_todo_reminders
+)
 from marshmallow import ValidationError
-from sqlalchemy import func
+from sqlalchemy import delete, func, tuple_, update
+from sqlalchemy.orm import contains_eager
 
-def get_todos(user_id, completed=None, tag_id=None, priority=None, due_date=None, search=None, sort_by=None, sort_order=None):
+# 分页时每页允许的最大条数
+MAX_PAGE_SIZE = 100
+
+# 可排序字段与对应的列
+SORT_COLUMNS = {
+    'due_date': Todo.due_date,
+    'priority': Todo.priority,
+    'created_at': Todo.created_at,
+    'title': Todo.title,
+}
+
+# 日期时间类型的排序字段，游标中以ISO格式保存
+DATETIME_SORT_FIELDS = ('due_date', 'created_at')
+
+def _first_tag_name():
+    """
+    按标签排序时使用的排序键：任务按名称排序后的第一个标签名，没有标签时为空字符串
+    """
+    return (
+        db.select(func.coalesce(func.min(Tag.name), ''))
+        .join(todo_tags, todo_tags.c.tag_id == Tag.id)
+        .where(todo_tags.c.todo_id == Todo.id)
+        .correlate(Todo)
+        .scalar_subquery()
+    )
+
+def _sort_key(sort_by):
+    """
+    获取排序字段对应的SQL表达式，未指定排序时返回None（按id排序）
+    """
+    if sort_by == 'tags':
+        return _first_tag_name()
+    return SORT_COLUMNS.get(sort_by)
+
+def encode_cursor(sort_by, sort_order, value, todo_id):
+    """
+    将排序键和id编码为不透明的游标字符串
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_by, sort_order, value, todo_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort_by, sort_order):
+    """
+    解析游标，返回(排序键的值, id)；游标无效或与当前排序方式不一致时抛出ValueError
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort_by, cursor_sort_order, value, todo_id = json.loads(base64.urlsafe_b64decode(padded))
+        if value is not None and cursor_sort_by in DATETIME_SORT_FIELDS:
+            value = datetime.fromisoformat(value)
+        todo_id = int(todo_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if cursor_sort_by != sort_by or cursor_sort_order != sort_order:
+        raise ValueError('Cursor does not match the current sort order')
+    return value, todo_id
+
+def _keyset_filter(sort_key, descending, value, last_id):
+    """
+    构建"位于游标之后"的过滤条件
+    MySQL和SQLite在升序时都将NULL排在最前，降序时排在最后
+    """
+    if sort_key is None:
+        return Todo.id < last_id if descending else Todo.id > last_id
+    if not descending:
+        if value is None:
+            return db.or_(sort_key.isnot(None), db.and_(sort_key.is_(None), Todo.id > last_id))
+        return db.or_(sort_key > value, db.and_(sort_key == value, Todo.id > last_id))
+    if value is None:
+        return db.and_(sort_key.is_(None), Todo.id < last_id)
+    return db.or_(sort_key < value, db.and_(sort_key == value, Todo.id < last_id), sort_key.is_(None))
+
+def _after_commit(user_id, saved=(), deleted_ids=()):
+    """
+    任务写入提交后同步提醒调度、搜索索引，并使用户的响应缓存失效
+    """
+    for todo in saved:
+        schedule_todo_reminders(todo)
+        index_todo(todo)
+    if deleted_ids:
+        for todo_id in deleted_ids:
+            unschedule_todo_reminders(todo_id)
+        remove_todos(user_id, deleted_ids)
+    bump_user_version(user_id)
+
+@read_only
+def get_todos(user_id, completed=None, tag_id=None, priority=None, due_date=None, search=None, sort_by=None, sort_order=None,
+              limit=None, cursor=None):
     """
     获取用户的待办事项列表，支持过滤和搜索
+    指定limit时使用基于游标（排序键 + id）的分页，翻到任意深度的代价都与第一页相同
     """
     # 构建查询
     query = Todo.query.filter_by(user_id=user_id)
@@ -20,135 +125,77 @@ def get_todos(user_id, completed=None, tag_id=None, priority=None, due_date=None
     if priority:
         query = query.filter_by(priority=priority)
     if due_date:
-        # 查找指定日期的任务
+        # 查找用户时区中指定日期的任务
         query_date = datetime.strptime(due_date, '%Y-%m-%d').date()
-        query = query.filter(db.func.date(Todo.due_date) == query_date)
+        query = query.filter(in_window(Todo.due_date, day_window(query_date, get_user_timezone(user_id))))
+    relevance = None
     if search:
-        # 搜索任务标题和描述
-        search_term = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                Todo.title.ilike(search_term),
-                Todo.description.ilike(search_term)
-            )
-        )
-    
-    # 排序条件
-    if sort_by and sort_by != 'tags':
-        if sort_by == 'due_date':
-            if sort_order == 'desc':
-                query = query.order_by(Todo.due_date.desc())
-            else:
-                query = query.order_by(Todo.due_date.asc())
-        elif sort_by == 'priority':
-            if sort_order == 'desc':
-                query = query.order_by(Todo.priority.desc())
-            else:
-                query = query.order_by(Todo.priority.asc())
-        elif sort_by == 'created_at':
-            if sort_order == 'desc':
-                query = query.order_by(Todo.created_at.desc())
-            else:
-                query = query.order_by(Todo.created_at.asc())
-        elif sort_by == 'title':
-            if sort_order == 'desc':
-                query = query.order_by(Todo.title.desc())
-            else:
-                query = query.order_by(Todo.title.asc())
+        # 搜索任务标题和描述，由配置的搜索后端过滤并给出相关度
+        query, relevance = get_search_backend().filter_query(query, user_id, search)
+    
+    # 排序条件，id作为第二排序键保证顺序稳定；搜索且未指定排序时按相关度排序
+    if sort_by not in SORT_COLUMNS and sort_by != 'tags':
+        sort_by = 'relevance' if relevance is not None else None
+    sort_order = 'desc' if sort_order == 'desc' else 'asc'
+    descending = sort_order == 'desc'
+    sort_key = relevance if sort_by == 'relevance' else _sort_key(sort_by)
+    
+    if sort_key is not None:
+        query = query.add_columns(sort_key)
+        query = query.order_by(sort_key.desc() if descending else sort_key.asc())
+    query = query.order_by(Todo.id.desc() if descending else Todo.id.asc())
+    
+    # 游标分页
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        query = query.filter(_keyset_filter(sort_key, descending, value, last_id))
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        # 多取一条用于判断是否还有下一页
+        query = query.limit(limit + 1)
+    
+    rows = query.all()
+    if sort_key is not None:
+        rows = [(row[0], row[1]) for row in rows]
+    else:
+        rows = [(todo, None) for todo in rows]
     
-    todos = query.all()
-    
-    # 按标签排序需要特殊处理
-    if sort_by == 'tags':
-        def get_first_tag_name(todo):
-            """
-            获取任务的第一个标签名称，如果没有标签则返回空字符串
-            """
-            tags = list(todo.tags)
-            if tags:
-                return tags[0].name
-            return ""
-        
-        # 按标签名称排序
-        todos.sort(key=get_first_tag_name, reverse=(sort_order == 'desc'))
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last_todo, last_value = rows[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, last_value, last_todo.id)
     
     # 转换为响应格式
-    output = []
-    for todo in todos:
-        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-        
-        todo_data = {
-            'id': todo.id,
-            'title': todo.title,
-            'description': todo.description,
-            'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
-            'priority': todo.priority,
-            'tags': tags
-        }
-        output.append(todo_data)
-    
-    return output
+    return {'todos': serialize_todos(todo for todo, _ in rows), 'next_cursor': next_cursor}
 
+@read_only
 def get_today_todos(user_id):
     """
-    获取用户今天的待办事项
+    获取用户今天（用户所在时区）的待办事项
     """
-    # 获取当前UTC时间
-    now_utc = datetime.now(timezone.utc)
-    # 转换为北京时间（UTC+8）
-    now_cst = now_utc.astimezone(timezone(timedelta(hours=8)))
-    # 获取今天的日期（北京时间）
-    today = now_cst.date()
+    tz_name = get_user_timezone(user_id)
+    today = local_today(tz_name)
     
-    # 构建查询
+    # 本地日期换算成UTC半开区间，使用(user_id, due_date)索引做范围扫描
     query = Todo.query.filter_by(user_id=user_id)
-    query = query.filter(
-        db.func.date(
-            func.CONVERT_TZ(Todo.due_date,'UTC','Asia/Shanghai')
-        ) == today
-    )
+    query = query.filter(in_window(Todo.due_date, day_window(today, tz_name)))
     query = query.order_by(Todo.due_date.asc())  # 按时间顺序排序
     
     todos = query.all()
     
     # 转换为响应格式
-    output = []
-    for todo in todos:
-        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-        
-        todo_data = {
-            'id': todo.id,
-            'title': todo.title,
-            'description': todo.description,
-            'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
-            'priority': todo.priority,
-            'tags': tags
-        }
-        output.append(todo_data)
-    
-    return output
+    return serialize_todos(todos)
 
+@read_only
 def get_week_todos(user_id):
     """
-    获取用户本周的待办事项
+    获取用户本周（周一至周日，用户所在时区）的待办事项，按本地日期分组
     """
-    # 获取当前UTC时间并转换为北京时间
-    now_utc = datetime.now(timezone.utc)
-    now_cst = now_utc.astimezone(timezone(timedelta(hours=8)))
-    # 获取今天的日期（北京时间）
-    today = now_cst.date()
-    # 计算本周一和下周一的日期（北京时间）
-    monday = today - timedelta(days=today.weekday())
-    next_monday = monday + timedelta(days=7)
+    tz_name = get_user_timezone(user_id)
     
-    # 构建查询，使用北京时间进行日期比较 - 使用SQLAlchemy的datetime函数进行时区转换
     query = Todo.query.filter_by(user_id=user_id)
-    query = query.filter(db.func.date(db.func.datetime(Todo.due_date, '+8 hours')) >= monday)
-    query = query.filter(db.func.date(db.func.datetime(Todo.due_date, '+8 hours')) < next_monday)
+    query = query.filter(in_window(Todo.due_date, week_window(local_today(tz_name), tz_name)))
     query = query.order_by(Todo.due_date.asc())  # 按时间顺序排序
     
     todos = query.all()
@@ -156,79 +203,62 @@ def get_week_todos(user_id):
     # 按日期分组
     week_todos = {}
     for todo in todos:
-        date_str = todo.due_date.strftime('%Y-%m-%d')
+        date_str = local_date(todo.due_date, tz_name).strftime('%Y-%m-%d')
         if date_str not in week_todos:
             week_todos[date_str] = []
         
-        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-        
-        todo_data = {
-            'id': todo.id,
-            'title': todo.title,
-            'description': todo.description,
-            'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
-            'priority': todo.priority,
-            'tags': tags
-        }
-        week_todos[date_str].append(todo_data)
+        week_todos[date_str].append(serialize_todo(todo))
     
     return week_todos
 
+@read_only
 def get_todos_preview(user_id, start_date_param=None):
     """
-    获取一周任务预览数据，按日期分组
+    获取一周任务预览数据，按日期（用户所在时区）分组
+    共两次数据库往返：按主键读取计数行和一次7天范围查询；起始日期后7天不含今天时再按索引统计今天的任务数
     """
-    # 获取当前UTC时间并转换为北京时间
-    now_utc = datetime.now(timezone.utc)
-    now_cst = now_utc.astimezone(timezone(timedelta(hours=8)))
+    tz_name = get_user_timezone(user_id)
+    today = local_today(tz_name)
     
-    # 获取起始日期，如果没有提供则使用今天（北京时间）
+    # 获取起始日期，如果没有提供或格式错误则使用今天
+    start_date = today
     if start_date_param:
         try:
             # 解析起始日期参数
             start_date = datetime.strptime(start_date_param, '%Y-%m-%d').date()
         except ValueError:
-            # 如果日期格式错误，使用今天（北京时间）
-            start_date = now_cst.date()
+            pass
+    
+    # 统计数据：随写入维护的计数行
+    total_tasks, completed_tasks = get_todo_stats(user_id)
+    
+    # 一次范围查询取出起始日期后7天内的任务，标签通过平铺的LEFT JOIN一并加载；
+    # joinedload生成的嵌套JOIN在SQLite中会被物化后对每个任务整表扫描一遍
+    tasks = (Todo.query.filter_by(user_id=user_id)
+             .filter(in_window(Todo.due_date, days_window(start_date, 7, tz_name)))
+             .outerjoin(todo_tags, todo_tags.c.todo_id == Todo.id)
+             .outerjoin(Tag, Tag.id == todo_tags.c.tag_id)
+             .options(contains_eager(Todo.tags))
+             .order_by(Todo.due_date.asc(), Todo.id.asc())
+             .all())
+    
+    # 按用户时区的日期分组
+    tasks_by_date = {}
+    for task in tasks:
+        tasks_by_date.setdefault(local_date(task.due_date, tz_name), []).append(serialize_todo(task))
+    
+    # 今天在预览范围内时直接使用当天的任务数
+    if 0 <= (today - start_date).days < 7:
+        today_tasks = len(tasks_by_date.get(today, []))
     else:
-        start_date = now_cst.date()
-    
-    # 统计数据
-    total_tasks = Todo.query.filter_by(user_id=user_id).count()
-    completed_tasks = Todo.query.filter_by(user_id=user_id, completed=True).count()
-    pending_tasks = Todo.query.filter_by(user_id=user_id, completed=False).count()
-    today_cst = now_cst.date()
-    today_tasks = (Todo.query.filter_by(user_id=user_id)
-                   .filter(db.func.date(func.CONVERT_TZ(Todo.due_date, 'UTC', 'Asia/Shanghai')) == today_cst).count())
+        today_tasks = db.session.query(func.count(Todo.id)).filter(
+            Todo.user_id == user_id, in_window(Todo.due_date, day_window(today, tz_name))
+        ).scalar()
     
-    # 获取指定起始日期后的7天任务数据
     week_tasks = []
     for i in range(7):
         date = start_date + timedelta(days=i)
-        
-        # 查询当天到期的任务 - 使用SQLAlchemy的datetime函数进行时区转换
-        tasks = Todo.query.filter_by(user_id=user_id)
-        tasks = tasks.filter(
-            func.DATE(
-                func.CONVERT_TZ(Todo.due_date, 'UTC', 'Asia/Shanghai')  # MySQL 时区转换
-            ) == today_cst
-        )
-        tasks = tasks.order_by(func.CONVERT_TZ(Todo.due_date, 'UTC', 'Asia/Shanghai').asc()).all()
-        
-        # 转换为响应格式
-        task_list = []
-        for task in tasks:
-            task_list.append({
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'completed': task.completed,
-                'due_date': task.due_date.isoformat() if task.due_date else None,
-                'priority': task.priority,
-                'tags': [{'id': tag.id, 'name': tag.name} for tag in task.tags]
-            })
+        task_list = tasks_by_date.get(date, [])
         
         # 添加当天数据
         week_tasks.append({
@@ -243,12 +273,21 @@ def get_todos_preview(user_id, start_date_param=None):
         'stats': {
             'total_tasks': total_tasks,
             'completed_tasks': completed_tasks,
-            'pending_tasks': pending_tasks,
+            'pending_tasks': total_tasks - completed_tasks,
             'today_tasks': today_tasks
         },
         'week_tasks': week_tasks
     }
 
+def _resolve_tags(user_id, tag_ids):
+    """
+    用一次IN查询解析属于该用户的标签，按传入顺序返回并去重，不存在或不属于该用户的ID被忽略
+    """
+    if not tag_ids:
+        return []
+    tags = {tag.id: tag for tag in Tag.query.filter(Tag.user_id == user_id, Tag.id.in_(set(tag_ids))).all()}
+    return [tags[tag_id] for tag_id in dict.fromkeys(tag_ids) if tag_id in tags]
+
 def create_todo(user_id, title, description=None, completed=False, due_date=None, priority=1, tags=None):
     """
     创建新的待办事项
@@ -276,38 +315,31 @@ def create_todo(user_id, title, description=None, completed=False, due_date=None
     priority = todo_data.get('priority', 1)
     tags = todo_data.get('tags', [])
     
+    revision = next_revision(user_id)
     new_todo = Todo(
         title=title,
         description=description,
         completed=completed,
         due_date=due_date,
         priority=priority,
-        user_id=user_id
+        user_id=user_id,
+        revision=revision
     )
     
-    # 处理标签
+    # 处理标签：一次IN查询解析全部标签
     if tags:
-        for tag_id in tags:
-            tag = Tag.query.filter_by(id=tag_id, user_id=user_id).first()
-            if tag:
-                new_todo.tags.append(tag)
+        new_todo.tags.extend(_resolve_tags(user_id, tags))
     
+    refresh_next_reminder(new_todo)
     db.session.add(new_todo)
+    adjust_todo_stats(user_id, total=1, completed=int(bool(completed)))
     db.session.commit()
+    _after_commit(user_id, saved=[new_todo])
     
-    # 转换为响应格式
-    tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in new_todo.tags]
-    
-    return {
-        'id': new_todo.id,
-        'title': new_todo.title,
-        'description': new_todo.description,
-        'completed': new_todo.completed,
-        'created_at': new_todo.created_at.isoformat(),
-        'due_date': new_todo.due_date.isoformat() if new_todo.due_date else None,
-        'priority': new_todo.priority,
-        'tags': tags
-    }
+    # 转换为响应格式，并推送给用户打开的其他页面
+    result = serialize_todo(new_todo)
+    publish_changes(user_id, revision, [todo_event('created', result)])
+    return result
 
 def update_todo(user_id, todo_id, title=None, description=None, completed=None, due_date=None, priority=None, tags=None):
     """
@@ -341,6 +373,9 @@ def update_todo(user_id, todo_id, title=None, description=None, completed=None,
     except ValidationError as err:
         raise ValueError(err.messages)
     
+    revision = todo.revision = next_revision(user_id)
+    was_completed = todo.completed
+    
     # 应用更新
     if 'title' in validated_data:
         todo.title = validated_data['title']
@@ -354,32 +389,29 @@ def update_todo(user_id, todo_id, title=None, description=None, completed=None,
             todo.completed_at = datetime.now(timezone.utc)
     if 'due_date' in validated_data:
         todo.due_date = validated_data['due_date']
+        # 截止时间变化后重新开始计算提醒
+        todo.reminder_mask = 0
     if 'priority' in validated_data:
         todo.priority = validated_data['priority']
     if 'tags' in validated_data:
-        # 先清除所有标签关联
-        todo.tags.clear()
-        # 添加新的标签关联
-        for tag_id in validated_data['tags']:
-            tag = Tag.query.filter_by(id=tag_id, user_id=user_id).first()
-            if tag:
-                todo.tags.append(tag)
-    
+        # 按差异更新标签关联：只删除被移除的、只插入新增的
+        wanted = _resolve_tags(user_id, validated_data['tags'])
+        wanted_ids = {tag.id for tag in wanted}
+        for tag in list(todo.tags):
+            if tag.id not in wanted_ids:
+                todo.tags.remove(tag)
+        current_ids = {tag.id for tag in todo.tags}
+        todo.tags.extend(tag for tag in wanted if tag.id not in current_ids)
+    
+    refresh_next_reminder(todo)
+    adjust_todo_stats(user_id, completed=int(todo.completed) - int(was_completed))
     db.session.commit()
+    _after_commit(user_id, saved=[todo])
     
-    # 转换为响应格式
-    tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-    
-    return {
-        'id': todo.id,
-        'title': todo.title,
-        'description': todo.description,
-        'completed': todo.completed,
-        'created_at': todo.created_at.isoformat(),
-        'due_date': todo.due_date.isoformat() if todo.due_date else None,
-        'priority': todo.priority,
-        'tags': tags
-    }
+    # 转换为响应格式，并推送给用户打开的其他页面
+    result = serialize_todo(todo)
+    publish_changes(user_id, revision, [todo_event('updated', result)])
+    return result
 
 def delete_todo(user_id, todo_id):
     """
@@ -390,40 +422,231 @@ def delete_todo(user_id, todo_id):
     if not todo:
         raise ValueError('Todo not found')
     
+    revision = next_revision(user_id)
+    record_deletions(user_id, 'todo', [todo_id], revision)
     db.session.delete(todo)
+    adjust_todo_stats(user_id, total=-1, completed=-int(todo.completed))
     db.session.commit()
+    _after_commit(user_id, deleted_ids=[todo_id])
+    publish_changes(user_id, revision, [todo_event('deleted', {'id': todo_id})])
     
     return {'message': 'Todo deleted successfully'}
 
-def get_overdue_todos(user_id):
+# 单次批量请求允许的最大操作数
+MAX_BATCH_OPERATIONS = 500
+
+# 批量接口支持的操作类型
+BATCH_OPERATIONS = ('create', 'update', 'delete', 'toggle')
+
+def batch_todos(user_id, operations):
     """
-    获取过期的待办事项
+    批量执行任务的创建、更新、删除和完成状态切换
+    
+    operations中每一项形如 {'op': 'create', 'data': {...}}、{'op': 'update', 'id': 1, 'data': {...}}、
+    {'op': 'delete', 'id': 1} 或 {'op': 'toggle', 'id': 1}。所有操作先用schema一次性校验，
+    全部有效时在一个事务中用批量INSERT/UPDATE/DELETE执行，任一操作无效则不做任何修改。
+    返回(是否全部成功, 每个操作的结果列表)
     """
-    now = datetime.now(timezone.utc)  # 保持使用UTC时间进行比较
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise ValueError(f'At most {MAX_BATCH_OPERATIONS} operations are allowed per batch')
+    
+    results = [{'index': index, 'op': None, 'status': 'ok'} for index in range(len(operations))]
+    errors = {}
+    creates, updates, target_ids = [], [], {}
+    
+    # 检查操作结构，同一任务在一次批量请求中只能出现一次
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+            errors[index] = f"op must be one of {', '.join(BATCH_OPERATIONS)}"
+            continue
+        op = operation['op']
+        results[index]['op'] = op
+        if op in ('create', 'update') and not isinstance(operation.get('data'), dict):
+            errors[index] = 'data must be an object'
+            continue
+        if op == 'create':
+            creates.append(index)
+            continue
+        todo_id = operation.get('id')
+        if not isinstance(todo_id, int) or isinstance(todo_id, bool):
+            errors[index] = 'id must be an integer'
+        elif todo_id in target_ids:
+            errors[index] = 'Duplicate todo id in batch'
+        else:
+            target_ids[todo_id] = index
+            if op == 'update':
+                updates.append(index)
+    
+    # 一次性校验所有创建和更新的数据
+    create_data = TodoSchema(many=True).validate([operations[index]['data'] for index in creates])
+    for position, messages in create_data.items():
+        errors[creates[position]] = messages
+    update_data = TodoUpdateSchema(many=True).validate([operations[index]['data'] for index in updates])
+    for position, messages in update_data.items():
+        errors[updates[position]] = messages
+    
+    # 一次查询取出所有要修改的任务，一次查询解析所有标签
+    todos = {}
+    if target_ids:
+        todos = {todo.id: todo for todo in Todo.query.filter(Todo.user_id == user_id, Todo.id.in_(target_ids)).all()}
+        for todo_id, index in target_ids.items():
+            if todo_id not in todos:
+                errors[index] = 'Todo not found'
+    
+    if errors:
+        for index, result in enumerate(results):
+            if index in errors:
+                result['status'] = 'error'
+                result['message'] = errors[index]
+            else:
+                result['status'] = 'skipped'
+        return False, results
     
-    query = Todo.query.filter_by(user_id=user_id, completed=False)
-    query = query.filter(Todo.due_date < now)
+    loaded = {}
+    for index in creates:
+        loaded[index] = TodoSchema().load(operations[index]['data'])
+    for index in updates:
+        loaded[index] = TodoUpdateSchema().load(operations[index]['data'])
     
-    todos = query.all()
+    tag_ids = {tag_id for data in loaded.values() for tag_id in data.get('tags', [])}
+    user_tags = {}
+    if tag_ids:
+        user_tags = {tag.id: tag for tag in Tag.query.filter(Tag.user_id == user_id, Tag.id.in_(tag_ids)).all()}
     
-    # 转换为响应格式
-    output = []
-    for todo in todos:
-        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
+    now = datetime.now(timezone.utc)
+    # 整个批次共用一个变更序号
+    revision = next_revision(user_id)
+    deleted_ids, changed_rows, added_pairs, removed_pairs = [], [], [], []
+    total_delta, completed_delta = 0, 0
+    for todo_id, index in target_ids.items():
+        operation = operations[index]
+        todo = todos[todo_id]
+        if operation['op'] == 'delete':
+            deleted_ids.append(todo_id)
+            total_delta -= 1
+            completed_delta -= int(todo.completed)
+            continue
         
-        todo_data = {
+        row = {
             'id': todo.id,
             'title': todo.title,
             'description': todo.description,
             'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
+            'completed_at': todo.completed_at,
+            'due_date': todo.due_date,
             'priority': todo.priority,
-            'tags': tags
+            'reminder_mask': todo.reminder_mask,
+            'updated_at': now,
+            'revision': revision,
         }
-        output.append(todo_data)
+        if operation['op'] == 'toggle':
+            row['completed'] = not todo.completed
+        else:
+            data = loaded[index]
+            for field in ('title', 'description', 'completed', 'due_date', 'priority'):
+                if field in data:
+                    row[field] = data[field]
+            if data.get('completed'):
+                row['completed_at'] = now
+            if 'due_date' in data:
+                row['reminder_mask'] = 0
+            if 'tags' in data:
+                current = {tag.id for tag in todo.tags}
+                wanted = {tag_id for tag_id in data['tags'] if tag_id in user_tags}
+                added_pairs.extend({'todo_id': todo.id, 'tag_id': tag_id} for tag_id in wanted - current)
+                removed_pairs.extend((todo.id, tag_id) for tag_id in current - wanted)
+        row['next_reminder_at'] = None if row['completed'] else next_reminder_time(row['due_date'], row['reminder_mask'])
+        completed_delta += int(bool(row['completed'])) - int(todo.completed)
+        changed_rows.append(row)
+    
+    # 批量删除
+    if deleted_ids:
+        record_deletions(user_id, 'todo', deleted_ids, revision)
+        db.session.execute(todo_tags.delete().where(todo_tags.c.todo_id.in_(deleted_ids)))
+        db.session.execute(delete(Todo).where(Todo.id.in_(deleted_ids)), execution_options={'synchronize_session': False})
+        for todo_id in deleted_ids:
+            db.session.expunge(todos[todo_id])
+    
+    # 按主键批量更新
+    if changed_rows:
+        db.session.execute(update(Todo), changed_rows)
+    if removed_pairs:
+        db.session.execute(todo_tags.delete().where(tuple_(todo_tags.c.todo_id, todo_tags.c.tag_id).in_(removed_pairs)))
+    
+    # 批量插入新任务，随后一次性插入它们的标签关联
+    new_todos = {}
+    for index in creates:
+        data = loaded[index]
+        todo = Todo(
+            title=data['title'],
+            description=data.get('description'),
+            completed=data.get('completed', False),
+            due_date=data.get('due_date'),
+            priority=data.get('priority', 1),
+            user_id=user_id,
+            reminder_mask=0,
+            revision=revision
+        )
+        refresh_next_reminder(todo)
+        new_todos[index] = todo
+    created_ids = {}
+    if new_todos:
+        db.session.add_all(new_todos.values())
+        db.session.flush()
+        # 提交后对象会过期，在此之前记下新任务的ID，避免提交后逐个重新加载
+        created_ids = {index: todo.id for index, todo in new_todos.items()}
+        for index, todo in new_todos.items():
+            added_pairs.extend(
+                {'todo_id': todo.id, 'tag_id': tag_id}
+                for tag_id in dict.fromkeys(loaded[index].get('tags', [])) if tag_id in user_tags
+            )
+    if added_pairs:
+        db.session.execute(todo_tags.insert(), added_pairs)
+    
+    total_delta += len(new_todos)
+    completed_delta += sum(int(bool(todo.completed)) for todo in new_todos.values())
+    adjust_todo_stats(user_id, total=total_delta, completed=completed_delta)
+    db.session.commit()
     
-    return output
+    # 重新读取写入后的任务（一次查询）用于响应和后续同步
+    saved_ids = [row['id'] for row in changed_rows] + list(created_ids.values())
+    saved = {}
+    if saved_ids:
+        saved = {todo.id: todo for todo in Todo.query.filter(Todo.id.in_(saved_ids)).all()}
+    
+    events = []
+    for index, todo_id in created_ids.items():
+        results[index]['todo'] = serialize_todo(saved[todo_id])
+        events.append(todo_event('created', results[index]['todo']))
+    for todo_id, index in target_ids.items():
+        if operations[index]['op'] == 'delete':
+            results[index]['id'] = todo_id
+            events.append(todo_event('deleted', {'id': todo_id}))
+        else:
+            results[index]['todo'] = serialize_todo(saved[todo_id])
+            events.append(todo_event('updated', results[index]['todo']))
+    
+    _after_commit(user_id, saved=saved.values(), deleted_ids=deleted_ids)
+    publish_changes(user_id, revision, events)
+    
+    return True, results
+
+@read_only
+def get_overdue_todos(user_id):
+    """
+    获取过期的待办事项
+    """
+    now = datetime.now(timezone.utc)  # 保持使用UTC时间进行比较
+    
+    query = Todo.query.filter_by(user_id=user_id, completed=False)
+    query = query.filter(Todo.due_date < now)
+    
+    todos = query.all()
+    
+    # 转换为响应格式
+    return serialize_todos(todos)
 
 def toggle_todo_completion(user_id, todo_id):
     """
@@ -435,22 +658,18 @@ def toggle_todo_completion(user_id, todo_id):
         raise ValueError('Todo not found')
     
     todo.completed = not todo.completed
+    revision = todo.revision = next_revision(user_id)
+    refresh_next_reminder(todo)
+    adjust_todo_stats(user_id, completed=1 if todo.completed else -1)
     db.session.commit()
+    _after_commit(user_id, saved=[todo])
     
-    # 转换为响应格式
-    tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-    
-    return {
-        'id': todo.id,
-        'title': todo.title,
-        'description': todo.description,
-        'completed': todo.completed,
-        'created_at': todo.created_at.isoformat(),
-        'due_date': todo.due_date.isoformat() if todo.due_date else None,
-        'priority': todo.priority,
-        'tags': tags
-    }
+    # 转换为响应格式，并推送给用户打开的其他页面
+    result = serialize_todo(todo)
+    publish_changes(user_id, revision, [todo_event('updated', result)])
+    return result
 
+@read_only
 def get_upcoming_todos(user_id, minutes=60):
     """
     获取即将到期的待办事项（默认60分钟内）
@@ -465,49 +684,70 @@ def get_upcoming_todos(user_id, minutes=60):
     todos = query.all()
     
     # 转换为响应格式
-    output = []
-    for todo in todos:
-        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
-        
-        todo_data = {
-            'id': todo.id,
-            'title': todo.title,
-            'description': todo.description,
-            'completed': todo.completed,
-            'created_at': todo.created_at.isoformat(),
-            'due_date': todo.due_date.isoformat() if todo.due_date else None,
-            'priority': todo.priority,
-            'tags': tags
-        }
-        output.append(todo_data)
-    
-    return output
+    return serialize_todos(todos)
 
-def delete_old_completed_tasks(user_id):
+# 已完成任务在创建多久之后会被清理
+COMPLETED_TASK_RETENTION = timedelta(hours=24)
+
+def _supports_skip_locked():
     """
-    删除用户24小时前已完成的任务
+    数据库是否支持SELECT ... FOR UPDATE SKIP LOCKED（MySQL 8.0.1+、MariaDB 10.6+、PostgreSQL）
     """
-    now = datetime.now(timezone.utc)
-    twenty_four_hours_ago = now - timedelta(hours=24)
-    
-    # 查询用户所有已完成且创建时间超过24小时的任务
-    old_tasks = Todo.query.filter_by(user_id=user_id, completed=True)
-    old_tasks = old_tasks.filter(Todo.created_at < twenty_four_hours_ago)
+    dialect = db.session.get_bind(Todo).dialect
+    if dialect.name == 'mysql':
+        version = dialect.server_version_info or ()
+        return version >= ((10, 6) if dialect.is_mariadb else (8, 0, 1))
+    return dialect.name == 'postgresql'
+
+def purge_completed_tasks(batch_size=500):
+    """
+    删除一批24小时前已完成的任务（跨所有用户），返回删除的条数
+    每批是一个短事务；已删除的行不会再被查到，反复调用直到返回值小于batch_size即可清理完毕
+
+    多个进程可能同时清理：取出的行用SELECT ... FOR UPDATE锁住，支持SKIP LOCKED时其他进程跳过这些行，
+    否则（如MySQL 5.7）等待锁释放后读到剩余的行。不支持行锁的数据库（SQLite）上，
+    每个用户在取得写锁（分配变更序号）之后重新确认仍需删除的行，已被其他进程删除或改为未完成的任务被跳过。
+    计数、删除记录和变更事件都按实际删除的行生成
+    """
+    cutoff = datetime.utcnow() - COMPLETED_TASK_RETENTION
+    conditions = (Todo.completed.is_(True), Todo.created_at < cutoff)
     
-    # 获取所有要删除的任务ID
-    old_task_ids = [task.id for task in old_tasks.all()]
+    # 通过(completed, created_at)索引取出并锁住一批要删除的任务
+    rows = db.session.query(Todo.id, Todo.user_id).filter(*conditions).limit(batch_size).with_for_update(
+        skip_locked=_supports_skip_locked()
+    ).all()
     
     # 如果没有要删除的任务，直接返回0
-    if not old_task_ids:
+    if not rows:
+        db.session.rollback()
         return 0
     
-    # 先删除中间表中的关联记录
-    from backend.app.models.models import todo_tags
-    db.session.execute(todo_tags.delete().where(todo_tags.c.todo_id.in_(old_task_ids)))
-    
-    # 然后删除任务
-    deleted_count = Todo.query.filter(Todo.id.in_(old_task_ids)).delete()
-    
+    ids_by_user = {}
+    for todo_id, user_id in rows:
+        ids_by_user.setdefault(user_id, []).append(todo_id)
+    
+    revisions = {}
+    purged = {}
+    for user_id, todo_ids in ids_by_user.items():
+        revision = next_revision(user_id)
+        todo_ids = db.session.scalars(db.select(Todo.id).where(Todo.id.in_(todo_ids), *conditions)).all()
+        if not todo_ids:
+            continue
+        # 先删除中间表中的关联记录，然后删除任务
+        db.session.execute(todo_tags.delete().where(todo_tags.c.todo_id.in_(todo_ids)))
+        deleted = db.session.execute(
+            delete(Todo).where(Todo.id.in_(todo_ids), *conditions), execution_options={'synchronize_session': False}
+        ).rowcount
+        # 为每个用户记录删除，供增量同步下发
+        record_deletions(user_id, 'todo', todo_ids, revision)
+        adjust_todo_stats(user_id, total=-deleted, completed=-deleted)
+        revisions[user_id] = revision
+        purged[user_id] = todo_ids
     db.session.commit()
     
-    return deleted_count
\ No newline at end of file
+    # 按用户同步搜索索引和响应缓存
+    for user_id, todo_ids in purged.items():
+        _after_commit(user_id, deleted_ids=todo_ids)
+        publish_changes(user_id, revisions[user_id], [todo_event('deleted', {'id': todo_id}) for todo_id in todo_ids])
+    
+    return sum(len(todo_ids) for todo_ids in purged.values())
@@ -0,0 +1,263 @@
+from datetime import datetime
+import atexit
+import threading
+import uuid
+
+from flask import Flask, current_app
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
+from sqlalchemy import delete, insert, update
+
+from backend.app import db, jwt
+from backend.app.models.models import RefreshTokenFamily, RevokedToken
+
+
+class TokenBlocklist:
+    """
+    已吊销令牌的jti集合
+
+    只有退出登录的访问令牌（有效期短）和不属于刷新令牌链的旧刷新令牌进入这里，
+    刷新令牌的轮换和吊销由数据库中的RefreshTokenFamily记录，不占用这里的内存。
+    每个受保护请求都要检查令牌是否被吊销，因此检查只查内存：未过期的jti压缩成16字节保存在字典中。
+    新吊销的jti先进入待写队列，由后台线程每隔flush_interval秒批量写入数据库，
+    同时读入其他进程吊销的jti并清理已过期的记录。进程重启时从数据库重新加载
+    """
+    def __init__(self, flush_interval=30):
+        self.flush_interval = flush_interval
+        self.is_running = False
+        self.thread = None
+        self.app = None
+        self._revoked = {}  # 压缩后的jti -> 过期时间
+        self._pending = []  # 待写入数据库的行
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._synced_id = 0  # 已从数据库读入的最大行ID
+        self._loaded = False
+
+    @staticmethod
+    def _key(jti):
+        try:
+            return uuid.UUID(jti).bytes
+        except ValueError:
+            return jti
+
+    def is_revoked(self, jti):
+        """
+        判断令牌是否已被吊销
+        """
+        if not self._loaded:
+            self.flush()
+        return self._key(jti) in self._revoked
+
+    def revoke(self, jti, token_type, user_id, expires_at):
+        """
+        吊销令牌，返回False表示该令牌此前已被吊销（例如同一个刷新令牌被并发使用）
+        """
+        key = self._key(jti)
+        with self._lock:
+            if key in self._revoked:
+                return False
+            self._revoked[key] = expires_at
+            self._pending.append({
+                'jti': jti,
+                'token_type': token_type,
+                'user_id': user_id,
+                'expires_at': expires_at,
+                'revoked_at': datetime.utcnow()
+            })
+        return True
+
+    def flush(self):
+        """
+        写入待写的jti，读入其他进程新吊销的jti，并清理已过期的记录和刷新令牌链
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            now = datetime.utcnow()
+            try:
+                if pending:
+                    # 其他进程可能已经写入了同一个jti
+                    existing = {jti for (jti,) in db.session.query(RevokedToken.jti).filter(
+                        RevokedToken.jti.in_([row['jti'] for row in pending])
+                    )}
+                    rows = [row for row in pending if row['jti'] not in existing]
+                    if rows:
+                        db.session.execute(insert(RevokedToken), rows)
+                loaded = db.session.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at).filter(
+                    RevokedToken.id > self._synced_id,
+                    RevokedToken.expires_at > now
+                ).all()
+                db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+                db.session.execute(delete(RefreshTokenFamily).where(RefreshTokenFamily.expires_at <= now))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                # 写入失败时放回队列，下次重试
+                with self._lock:
+                    self._pending[:0] = pending
+                raise
+
+            with self._lock:
+                for row_id, jti, expires_at in loaded:
+                    self._revoked[self._key(jti)] = expires_at
+                    self._synced_id = max(self._synced_id, row_id)
+                for key in [key for key, expires_at in self._revoked.items() if expires_at <= now]:
+                    del self._revoked[key]
+            self._loaded = True
+
+    def start(self, app: Flask):
+        """
+        启动定期持久化线程
+        """
+        if not self.is_running:
+            self.app = app
+            self.is_running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+            # 进程退出前写入尚未持久化的jti
+            atexit.register(self.stop)
+
+    def stop(self):
+        """
+        停止持久化线程，并写入剩余的jti
+        """
+        if self.is_running:
+            self.is_running = False
+            self._stop_event.set()
+            if self.thread:
+                self.thread.join()
+            with self.app.app_context():
+                self.flush()
+
+    def _run(self):
+        """
+        线程运行的主循环
+        """
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception as e:
+                print(f"持久化已吊销令牌时出错: {e}")
+
+
+def init_token_blocklist(app: Flask):
+    """
+    初始化吊销列表，flush_interval为0时不启动后台线程（由调用方自行flush）
+    """
+    blocklist = TokenBlocklist(flush_interval=app.config.get('TOKEN_BLOCKLIST_FLUSH_INTERVAL', 30))
+    app.extensions['token_blocklist'] = blocklist
+    if blocklist.flush_interval:
+        blocklist.start(app)
+    return blocklist
+
+
+def get_token_blocklist():
+    """
+    获取当前应用的吊销列表
+    """
+    return current_app.extensions['token_blocklist']
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return get_token_blocklist().is_revoked(jwt_payload['jti'])
+
+
+def issue_tokens(user_id, family_id=None, generation=0):
+    """
+    为用户签发访问令牌和刷新令牌，有效期见JWT_ACCESS_TOKEN_EXPIRES和JWT_REFRESH_TOKEN_EXPIRES
+
+    不指定family_id时（登录）新建一条刷新令牌链；刷新令牌中带有链ID和代数
+    """
+    if family_id is None:
+        family_id = uuid.uuid4().hex
+        db.session.add(RefreshTokenFamily(
+            id=family_id,
+            user_id=int(user_id),
+            generation=generation,
+            expires_at=datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        ))
+        db.session.commit()
+    identity = str(user_id)
+    return {
+        'access_token': create_access_token(identity=identity),
+        'refresh_token': create_refresh_token(
+            identity=identity, additional_claims={'fam': family_id, 'gen': generation}
+        ),
+        'user_id': int(user_id)
+    }
+
+
+def authenticate_access_token(token):
+    """
+    校验访问令牌的签名、有效期和吊销状态，返回令牌所属的用户ID，无效时抛出ValueError
+    用于HTTP请求之外的通道（如Socket.IO连接）
+    """
+    try:
+        payload = decode_token(token)
+    except (JWTExtendedException, PyJWTError):
+        raise ValueError('Invalid token')
+    if payload['type'] != 'access' or get_token_blocklist().is_revoked(payload['jti']):
+        raise ValueError('Invalid token')
+    return int(payload['sub'])
+
+
+def revoke_token(payload):
+    """
+    吊销已解码的令牌，返回False表示它此前已被吊销
+    刷新令牌作废整条链（立即对所有进程生效），访问令牌进入吊销列表
+    """
+    if payload['type'] == 'refresh' and 'fam' in payload:
+        result = db.session.execute(
+            update(RefreshTokenFamily).where(
+                RefreshTokenFamily.id == payload['fam'],
+                RefreshTokenFamily.user_id == int(payload['sub']),
+                RefreshTokenFamily.revoked_at.is_(None)
+            ).values(revoked_at=datetime.utcnow()),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        return result.rowcount == 1
+    return get_token_blocklist().revoke(
+        payload['jti'],
+        payload['type'],
+        int(payload['sub']),
+        datetime.utcfromtimestamp(payload['exp'])
+    )
+
+
+def rotate_refresh_token(payload):
+    """
+    用刷新令牌换取一对新令牌，旧的刷新令牌随即作废
+    只校验签名并把令牌链的代数原子地加一，不查询用户、不计算密码哈希；
+    同一个刷新令牌被并发或重复使用时只有一次成功
+    """
+    if 'fam' not in payload:
+        # 引入令牌链之前签发的刷新令牌：吊销其jti，换成新链中的令牌
+        if not revoke_token(payload):
+            raise ValueError('Token has been revoked')
+        return issue_tokens(payload['sub'])
+
+    generation = int(payload['gen'])
+    result = db.session.execute(
+        update(RefreshTokenFamily).where(
+            RefreshTokenFamily.id == payload['fam'],
+            RefreshTokenFamily.user_id == int(payload['sub']),
+            RefreshTokenFamily.generation == generation,
+            RefreshTokenFamily.revoked_at.is_(None)
+        ).values(
+            generation=generation + 1,
+            expires_at=datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        raise ValueError('Token has been revoked')
+    return issue_tokens(payload['sub'], payload['fam'], generation + 1)
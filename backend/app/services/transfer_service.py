@@ -0,0 +1,237 @@
+from datetime import datetime
+from itertools import groupby
+import json
+
+from marshmallow import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import lazyload
+
+from backend.app import db
+from backend.app.database import read_only
+from backend.app.models.models import Todo, Tag, todo_tags
+from backend.app.schems import TagSchema, TodoImportSchema
+from backend.app.services.change_service import next_revision
+from backend.app.services.event_service import publish_changes
+from backend.app.services.stats_service import adjust_todo_stats
+from backend.app.services.reminder_service import _as_utc_naive, next_reminder_time
+from backend.app.services.todo_service import _after_commit
+
+# 导出格式版本，写在第一行的meta记录中
+EXPORT_FORMAT_VERSION = 1
+# 导出时数据库游标每次取回的行数，也是每次写出的记录数
+EXPORT_CHUNK_SIZE = 1000
+# 导入时每批校验、插入并提交的任务数
+IMPORT_BATCH_SIZE = 1000
+
+DEFAULT_TAG_COLOR = '#3498db'
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+
+@read_only
+def export_user_data(user_id):
+    """
+    以NDJSON格式逐块生成用户的全部标签和任务，每行一条记录：
+    {"type":"meta",...}、{"type":"tag","name":...,"color":...}、{"type":"todo",...,"tags":[标签名]}
+
+    任务与标签关联通过一次外连接查询按yield_per分块流式读取，内存占用与数据量无关
+    """
+    yield _dumps({'type': 'meta', 'version': EXPORT_FORMAT_VERSION, 'exported_at': datetime.utcnow().isoformat()}) + '\n'
+
+    # 标签数量有限，先整体读出用于把标签ID换成名称
+    tag_names = {}
+    lines = []
+    for tag_id, name, color in db.session.query(Tag.id, Tag.name, Tag.color).filter(Tag.user_id == user_id).order_by(Tag.id):
+        tag_names[tag_id] = name
+        lines.append(_dumps({'type': 'tag', 'name': name, 'color': color}))
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+    # 按(created_at, id)顺序可直接沿ix_todo_user_id_created_at索引读取，同一任务的多行标签相邻
+    stmt = select(
+        Todo.id, Todo.title, Todo.description, Todo.completed, Todo.completed_at,
+        Todo.created_at, Todo.due_date, Todo.priority, todo_tags.c.tag_id
+    ).outerjoin(todo_tags, todo_tags.c.todo_id == Todo.id).where(
+        Todo.user_id == user_id
+    ).order_by(Todo.created_at, Todo.id)
+    rows = db.session.execute(stmt, execution_options={'yield_per': EXPORT_CHUNK_SIZE})
+
+    lines = []
+    for _, group in groupby(rows, key=lambda row: row.id):
+        group = list(group)
+        row = group[0]
+        lines.append(_dumps({
+            'type': 'todo',
+            'title': row.title,
+            'description': row.description,
+            'completed': row.completed,
+            'completed_at': _isoformat(row.completed_at),
+            'created_at': _isoformat(row.created_at),
+            'due_date': _isoformat(row.due_date),
+            'priority': row.priority,
+            'tags': [tag_names[r.tag_id] for r in group if r.tag_id in tag_names]
+        }))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def _load_tag(line_no, record):
+    """
+    校验一条标签记录，返回(名称, 颜色)
+    """
+    data = {'name': record.get('name')}
+    if record.get('color') is not None:
+        data['color'] = record['color']
+    try:
+        data = TagSchema().load(data)
+    except ValidationError as err:
+        raise ValueError(f'Line {line_no}: {err.messages}')
+    return data['name'], data.get('color', DEFAULT_TAG_COLOR)
+
+
+def _import_batch(user_id, tag_ids, pending_tags, records, counts):
+    """
+    校验并写入一批任务：先一次性创建缺少的标签，再批量插入任务和标签关联，最后提交
+    """
+    try:
+        loaded = TodoImportSchema(many=True).load([record for _, record in records])
+    except ValidationError as err:
+        index = min(err.messages)
+        raise ValueError(f'Line {records[index][0]}: {err.messages[index]}')
+
+    # 任务引用的未知标签按默认颜色创建
+    for (line_no, _), data in zip(records, loaded):
+        for name in data['tags']:
+            if name not in tag_ids and name not in pending_tags:
+                pending_tags[name] = _load_tag(line_no, {'name': name})[1]
+
+    revision = next_revision(user_id)
+    if pending_tags:
+        db.session.execute(insert(Tag), [
+            {'name': name, 'color': color, 'user_id': user_id, 'revision': revision}
+            for name, color in pending_tags.items()
+        ])
+        for tag_id, name in db.session.query(Tag.id, Tag.name).filter(
+            Tag.user_id == user_id, Tag.name.in_(list(pending_tags))
+        ):
+            tag_ids.setdefault(name, tag_id)
+        counts['tags'] += len(pending_tags)
+        pending_tags.clear()
+
+    # 批量插入任务。支持批量RETURNING的数据库（PostgreSQL等）要求按参数顺序返回ID，与行一一对应；
+    # MySQL的多行INSERT和SQLite的executemany（逐行执行）都按行的顺序分配递增的自增ID，
+    # 插入后按本批独占的变更序号查询，排序后的ID与行一一对应
+    now = datetime.utcnow()
+    rows = []
+    for data in loaded:
+        completed = data['completed']
+        due_date = _as_utc_naive(data.get('due_date'))
+        rows.append({
+            'title': data['title'],
+            'description': data.get('description'),
+            'completed': completed,
+            'completed_at': _as_utc_naive(data.get('completed_at')),
+            'created_at': _as_utc_naive(data['created_at']) if data.get('created_at') else now,
+            'updated_at': now,
+            'due_date': due_date,
+            'priority': data['priority'],
+            'user_id': user_id,
+            'reminder_mask': 0,
+            'next_reminder_at': None if completed else next_reminder_time(due_date, 0),
+            'revision': revision
+        })
+    todo_ids = []
+    if rows:
+        dialect = db.session.get_bind(Todo).dialect
+        if dialect.insert_executemany_returning and dialect.name != 'sqlite':
+            todo_ids = db.session.scalars(insert(Todo).returning(Todo.id, sort_by_parameter_order=True), rows).all()
+        else:
+            db.session.execute(insert(Todo), rows)
+            todo_ids = db.session.scalars(select(Todo.id).where(
+                Todo.user_id == user_id, Todo.revision == revision
+            ).order_by(Todo.id)).all()
+
+    pairs = [
+        {'todo_id': todo_id, 'tag_id': tag_ids[name]}
+        for todo_id, data in zip(todo_ids, loaded) for name in dict.fromkeys(data['tags'])
+    ]
+    if pairs:
+        db.session.execute(todo_tags.insert(), pairs)
+    adjust_todo_stats(user_id, total=len(rows), completed=sum(int(row['completed']) for row in rows))
+    db.session.commit()
+    counts['todos'] += len(rows)
+
+    # 重新读取本批任务（一次查询，不加载标签）用于同步提醒和搜索索引
+    saved = []
+    if todo_ids:
+        saved = Todo.query.options(lazyload(Todo.tags)).filter(Todo.id.in_(todo_ids)).all()
+    _after_commit(user_id, saved=saved)
+    # 导入的任务不逐条推送，客户端收到后走增量同步
+    publish_changes(user_id, revision, None)
+
+
+def import_user_data(user_id, lines, batch_size=None):
+    """
+    从NDJSON行（export_user_data的格式）导入标签和任务，标签按名称映射到用户已有的标签，不存在时创建
+
+    每batch_size个任务校验一次并在一个事务中批量插入，内存占用与上传大小无关。
+    某一行无效时抛出ValueError，此前的批次已经提交，出错的批次不会写入任何数据。
+    返回导入的标签数和任务数
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    tag_ids = {}
+    for tag_id, name in db.session.query(Tag.id, Tag.name).filter(Tag.user_id == user_id).order_by(Tag.id):
+        tag_ids.setdefault(name, tag_id)
+    pending_tags = {}  # 待创建的标签：名称 -> 颜色
+    records = []
+    counts = {'tags': 0, 'todos': 0}
+
+    try:
+        for line_no, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                raise ValueError(f'Line {line_no}: invalid JSON')
+            if not isinstance(record, dict):
+                raise ValueError(f'Line {line_no}: record must be an object')
+
+            kind = record.get('type')
+            if kind == 'meta':
+                version = record.get('version', EXPORT_FORMAT_VERSION)
+                if not isinstance(version, int) or isinstance(version, bool):
+                    raise ValueError(f'Line {line_no}: version must be an integer')
+                if version > EXPORT_FORMAT_VERSION:
+                    raise ValueError(f'Line {line_no}: unsupported export version')
+            elif kind == 'tag':
+                name, color = _load_tag(line_no, record)
+                if name not in tag_ids:
+                    pending_tags[name] = color
+            elif kind == 'todo':
+                records.append((line_no, record))
+                if len(records) >= batch_size:
+                    _import_batch(user_id, tag_ids, pending_tags, records, counts)
+                    records = []
+            else:
+                raise ValueError(f'Line {line_no}: unknown record type')
+
+        if records or pending_tags:
+            _import_batch(user_id, tag_ids, pending_tags, records, counts)
+    except ValueError as e:
+        db.session.rollback()
+        raise ValueError(f"{e} (imported {counts['todos']} todos before this error)")
+
+    return counts
@@ -1,7 +1,10 @@
-from backend.app import bcrypt, db
-from backend.app.models.models import User
+from backend.app import db
+from backend.app.date_windows import DEFAULT_TIMEZONE, is_valid_timezone
+from backend.app.models.models import TodoStats, User
 from backend.app.schems import UserSchema
-from backend.app.services.todo_service import delete_old_completed_tasks
+from backend.app.services.password_service import hash_password, verify_password, password_needs_rehash
+from backend.app.services.cache_service import bump_user_version
+from backend.app.services.identity_service import invalidate_identity
 from marshmallow import ValidationError
 
 def get_user_by_id(user_id):
@@ -16,10 +19,13 @@ def get_user_by_username(username):
     """
     return User.query.filter_by(username=username).first()
 
-def create_user(username, password):
+def create_user(username, password, timezone=None):
     """
-    创建新用户
+    创建新用户，timezone为IANA时区名称（如Asia/Shanghai），不提供时使用默认时区
     """
+    if timezone is not None and not is_valid_timezone(timezone):
+        raise ValueError('Invalid timezone')
+
     # 使用schema验证输入数据
     user_schema = UserSchema()
     try:
@@ -33,12 +39,14 @@ def create_user(username, password):
     if existing_user:
         raise ValueError('Username already exists')
     
-    # 创建新用户
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
-    new_user = User(username=username, password=hashed_password)
+    # 创建新用户，哈希计算在工作池中进行
+    hashed_password = hash_password(password)
+    new_user = User(username=username, password=hashed_password, timezone=timezone or DEFAULT_TIMEZONE)
     
-    # 添加到数据库
+    # 添加到数据库，同时创建空的任务计数行
     db.session.add(new_user)
+    db.session.flush()
+    db.session.add(TodoStats(user_id=new_user.id))
     db.session.commit()
     
     return new_user
@@ -48,8 +56,26 @@ def authenticate_user(username, password):
     验证用户身份
     """
     user = get_user_by_username(username)
-    if user and bcrypt.check_password_hash(user.password, password):
-        # 在用户登录时删除24小时前已完成的任务
-        delete_old_completed_tasks(user.id)
+    if user and verify_password(user.password, password):
+        # 工作因子调整后，在登录成功时用明文密码透明地重新计算哈希
+        if password_needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+            invalidate_identity(user.id)
         return user
-    return None
\ No newline at end of file
+    return None
+
+def update_user_timezone(user_id, timezone):
+    """
+    修改用户的时区，今日、本周等按本地日期计算的结果随之变化
+    """
+    if not isinstance(timezone, str) or not is_valid_timezone(timezone):
+        raise ValueError('Invalid timezone')
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise ValueError('User not found')
+    user.timezone = timezone
+    db.session.commit()
+    invalidate_identity(user_id)
+    bump_user_version(user_id)
+    return user
@@ -0,0 +1,499 @@
+"""
+API接口基准测试
+
+用create_app、Flask测试客户端和磁盘上的SQLite数据库，按数据规模档位生成数据集，
+对api_bp中的每个路由以及提醒服务的_check_upcoming_tasks测量延迟分位数、每个请求的SQL语句数和峰值内存，
+结果保存为JSON，便于比较不同版本或配置的运行结果
+
+    python -m backend.benchmarks.bench_api --profile 1k --output bench-1k.json
+    python -m backend.benchmarks.bench_api --profile 100k --db /tmp/bench-100k.db --output new.json --baseline old.json
+    python -m backend.benchmarks.bench_api --todos 50000 --tags 20 --tags-per-todo 3 --cases todos tags
+
+数据集分布在--users个用户中，测量使用第一个用户（bench_0）的令牌。生成100万条任务需要几分钟，
+用--db指定数据库文件后，参数相同的后续运行会直接复用已生成的数据（写接口的测量会在其中留下少量新数据）。
+默认关闭响应缓存以测量实际的查询开销，--cache打开；峰值内存在计时之外单独用tracemalloc执行一次请求得到
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import json
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import event, insert, update
+
+from backend.app import create_app, db
+from backend.app.config import Config
+from backend.app.models.models import Tag, Todo, User, todo_tags
+from backend.app.services.reminder_service import ReminderService, next_reminder_time
+from backend.app.services.stats_service import rebuild_todo_stats
+from backend.app.services.user_service import create_user
+
+# 数据规模档位：任务总数、每个用户的标签数、每个任务最多的标签数、用户数
+PROFILES = {
+    '1k': {'todos': 1_000, 'tags': 10, 'tags_per_todo': 2, 'users': 1},
+    '100k': {'todos': 100_000, 'tags': 50, 'tags_per_todo': 3, 'users': 10},
+    '1m': {'todos': 1_000_000, 'tags': 200, 'tags_per_todo': 5, 'users': 100},
+}
+# 生成数据时每次批量插入的行数
+SEED_CHUNK_SIZE = 10_000
+PASSWORD = 'Passw0rd'
+
+
+def _make_app(database_path, cache):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        SQLALCHEMY_REPLICA_URIS = []
+        REMINDER_SERVICE_ENABLED = False
+        PURGE_SERVICE_ENABLED = False
+        RESPONSE_CACHE_ENABLED = cache
+        TOKEN_BLOCKLIST_FLUSH_INTERVAL = 0
+        CHANGE_EVENT_WINDOW = 0
+        SOCKETIO_ASYNC_MODE = 'threading'
+        SOCKETIO_MESSAGE_QUEUE = None
+
+    return create_app(BenchConfig)
+
+
+def seed(app, todos, tags, tags_per_todo, users):
+    """
+    批量生成数据集：截止时间分布在前后30天内（其中一部分即将到期，提醒服务有事可做），约三分之一已完成
+    """
+    now = datetime.utcnow()
+    with app.app_context():
+        db.create_all()
+        password = create_user('bench_0', PASSWORD).password
+        if users > 1:
+            db.session.execute(insert(User), [
+                {'username': f'bench_{i}', 'password': password} for i in range(1, users)
+            ])
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+        db.session.execute(insert(Tag), [
+            {'name': f'tag_{i}', 'color': '#3498db', 'user_id': user_id, 'revision': 1}
+            for user_id in user_ids for i in range(tags)
+        ])
+        tag_ids = {}
+        for tag_id, user_id in db.session.query(Tag.id, Tag.user_id).order_by(Tag.id):
+            tag_ids.setdefault(user_id, []).append(tag_id)
+        db.session.commit()
+
+        todo_rows, tag_rows = [], []
+        for i in range(todos):
+            user_id = user_ids[i % len(user_ids)]
+            due_date = now + timedelta(minutes=(i * 7919) % (60 * 24 * 60) - 30 * 24 * 60)
+            completed = i % 3 == 0
+            todo_rows.append({
+                'id': i + 1,
+                'title': f'task {i}',
+                'description': f'benchmark task {i} ' * 3,
+                'completed': completed,
+                'completed_at': now if completed else None,
+                'created_at': now - timedelta(minutes=i % 10_000),
+                'updated_at': now,
+                'due_date': due_date,
+                'priority': i % 3 + 1,
+                'user_id': user_id,
+                'reminder_mask': 0,
+                'next_reminder_at': None if completed else next_reminder_time(due_date, 0, now),
+                'revision': 1,
+            })
+            user_tags = tag_ids.get(user_id, [])
+            for k in range(min(i % (tags_per_todo + 1), len(user_tags))):
+                tag_rows.append({'todo_id': i + 1, 'tag_id': user_tags[(i + k) % len(user_tags)]})
+            if len(todo_rows) >= SEED_CHUNK_SIZE or i == todos - 1:
+                db.session.execute(insert(Todo), todo_rows)
+                if tag_rows:
+                    db.session.execute(todo_tags.insert(), tag_rows)
+                db.session.commit()
+                todo_rows, tag_rows = [], []
+
+        db.session.execute(update(User).values(change_seq=1))
+        db.session.commit()
+        rebuild_todo_stats()
+        db.session.remove()
+
+
+def _percentile(ordered, q):
+    """
+    最近秩法求分位数，ordered已排序
+    """
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def _summary(latencies, queries, peak_bytes):
+    ordered = sorted(latencies)
+    return {
+        'iterations': len(ordered),
+        'latency_ms': {
+            'mean': statistics.fmean(ordered) * 1000,
+            'p50': _percentile(ordered, 50) * 1000,
+            'p90': _percentile(ordered, 90) * 1000,
+            'p95': _percentile(ordered, 95) * 1000,
+            'p99': _percentile(ordered, 99) * 1000,
+            'max': ordered[-1] * 1000,
+        },
+        'queries_per_request': {'mean': statistics.fmean(queries), 'max': max(queries)},
+        'peak_memory_kb': peak_bytes / 1024,
+    }
+
+
+class QueryCounter:
+    """
+    统计数据库引擎上执行的SQL语句数
+    """
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class BenchContext:
+    """
+    测量过程中共享的客户端、令牌和样本数据
+    """
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+        self.sequence = 0
+        tokens = self.call('POST', '/api/login', json={'username': 'bench_0', 'password': PASSWORD})
+        self.access_token = tokens['access_token']
+        self.refresh_token = tokens['refresh_token']
+        self.headers = {'Authorization': f'Bearer {self.access_token}'}
+        self.user_id = self.call('GET', '/api/user', headers=self.headers)['id']
+        page = self.call('GET', '/api/todos?limit=20&sort_by=created_at', headers=self.headers)
+        self.todo_ids = [todo['id'] for todo in page['todos']]
+        self.tag_ids = [tag['id'] for tag in self.call('GET', '/api/tags', headers=self.headers)['tags']]
+        self.cursor = self.call('GET', '/api/todos/changes', headers=self.headers)['cursor']
+        self.due_date = (datetime.utcnow() + timedelta(days=3)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def call(self, method, path, **kwargs):
+        """
+        不计时的准备请求，返回JSON响应
+        """
+        response = self.client.open(path, method=method, **kwargs)
+        assert response.status_code < 400, (method, path, response.status_code, response.get_data(as_text=True))
+        return response.get_json()
+
+    def next(self):
+        self.sequence += 1
+        return self.sequence
+
+    def sample_todo(self):
+        return self.todo_ids[self.next() % len(self.todo_ids)]
+
+    def sample_tag(self):
+        return self.tag_ids[self.next() % len(self.tag_ids)]
+
+    def new_todo(self):
+        return self.call('POST', '/api/todos', headers=self.headers, json={
+            'title': f'bench {self.next()}', 'description': '', 'due_date': self.due_date, 'tags': []
+        })['id']
+
+    def new_tag(self):
+        return self.call('POST', '/api/tags', headers=self.headers, json={
+            'name': f'bench_tag_{self.next()}', 'color': '#2ecc71'
+        })['id']
+
+    def rotate(self):
+        """
+        用刷新令牌换一对新令牌，返回新的访问令牌
+        """
+        tokens = self.call('POST', '/api/token/refresh', headers={'Authorization': f'Bearer {self.refresh_token}'})
+        self.refresh_token = tokens['refresh_token']
+        return tokens['access_token']
+
+
+@dataclass
+class Case:
+    """
+    一个测量用例：method和rule对应api_bp中的路由，prepare返回本次请求的参数（不计时）
+    """
+    name: str
+    method: str
+    rule: str
+    prepare: object
+    after: object = None
+
+
+def _import_body(ctx):
+    n = ctx.next()
+    lines = [json.dumps({'type': 'tag', 'name': f'import_{n}', 'color': '#9b59b6'})]
+    lines += [json.dumps({
+        'type': 'todo', 'title': f'imported {n}-{i}', 'due_date': ctx.due_date, 'priority': 2, 'tags': [f'import_{n}']
+    }) for i in range(20)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _batch_operations(ctx):
+    operations = [
+        {'op': 'create', 'data': {'title': f'batch {ctx.next()}', 'description': '', 'due_date': ctx.due_date, 'tags': []}}
+        for _ in range(10)
+    ]
+    operations += [{'op': 'toggle', 'id': todo_id} for todo_id in dict.fromkeys(ctx.todo_ids[:10])]
+    return operations
+
+
+def _set_refresh_token(ctx, response):
+    ctx.refresh_token = response.get_json()['refresh_token']
+
+
+# 读接口在前、写接口在后，读接口测量的是生成好的数据集
+CASES = [
+    Case('user', 'GET', '/user', lambda ctx: {'path': '/api/user', 'headers': ctx.headers}),
+    Case('todos (page of 50)', 'GET', '/todos',
+         lambda ctx: {'path': '/api/todos?limit=50', 'headers': ctx.headers}),
+    Case('todos (sorted by priority)', 'GET', '/todos',
+         lambda ctx: {'path': '/api/todos?limit=50&sort_by=priority&sort_order=desc', 'headers': ctx.headers}),
+    Case('todos (search)', 'GET', '/todos',
+         lambda ctx: {'path': '/api/todos?limit=50&search=task%201', 'headers': ctx.headers}),
+    Case('todos (all)', 'GET', '/todos', lambda ctx: {'path': '/api/todos', 'headers': ctx.headers}),
+    Case('todos today', 'GET', '/todos/today', lambda ctx: {'path': '/api/todos/today', 'headers': ctx.headers}),
+    Case('todos preview', 'GET', '/todos/preview',
+         lambda ctx: {'path': '/api/todos/preview', 'headers': ctx.headers}),
+    Case('todos week', 'GET', '/todos/week', lambda ctx: {
+        'path': f"/api/todos/week?start_date={(datetime.utcnow() + timedelta(days=7)).strftime('%Y-%m-%d')}",
+        'headers': ctx.headers
+    }),
+    Case('todos changes', 'GET', '/todos/changes',
+         lambda ctx: {'path': f'/api/todos/changes?since={ctx.cursor}', 'headers': ctx.headers}),
+    Case('todos upcoming', 'GET', '/todos/upcoming',
+         lambda ctx: {'path': '/api/todos/upcoming?minutes=60', 'headers': ctx.headers}),
+    Case('tags', 'GET', '/tags', lambda ctx: {'path': '/api/tags', 'headers': ctx.headers}),
+    Case('export', 'GET', '/export', lambda ctx: {'path': '/api/export', 'headers': ctx.headers}),
+    Case('register', 'POST', '/register', lambda ctx: {
+        'path': '/api/register', 'json': {'username': f'bench_new_{ctx.next()}_{int(time.time())}', 'password': PASSWORD}
+    }),
+    Case('login', 'POST', '/login',
+         lambda ctx: {'path': '/api/login', 'json': {'username': 'bench_0', 'password': PASSWORD}}),
+    Case('token refresh', 'POST', '/token/refresh', lambda ctx: {
+        'path': '/api/token/refresh', 'headers': {'Authorization': f'Bearer {ctx.refresh_token}'}
+    }, after=_set_refresh_token),
+    Case('logout', 'POST', '/logout',
+         lambda ctx: {'path': '/api/logout', 'headers': {'Authorization': f'Bearer {ctx.rotate()}'}}),
+    Case('update user', 'PATCH', '/user',
+         lambda ctx: {'path': '/api/user', 'headers': ctx.headers, 'json': {'timezone': 'Asia/Shanghai'}}),
+    Case('create todo', 'POST', '/todos', lambda ctx: {'path': '/api/todos', 'headers': ctx.headers, 'json': {
+        'title': f'created {ctx.next()}', 'description': '', 'due_date': ctx.due_date, 'priority': 2,
+        'tags': ctx.tag_ids[:2]
+    }}),
+    Case('update todo', 'PUT', '/todos/<int:todo_id>', lambda ctx: {
+        'path': f'/api/todos/{ctx.sample_todo()}', 'headers': ctx.headers,
+        'json': {'title': f'updated {ctx.next()}', 'priority': 3}
+    }),
+    Case('toggle todo', 'PUT', '/todos/<int:todo_id>/toggle',
+         lambda ctx: {'path': f'/api/todos/{ctx.sample_todo()}/toggle', 'headers': ctx.headers}),
+    Case('delete todo', 'DELETE', '/todos/<int:todo_id>',
+         lambda ctx: {'path': f'/api/todos/{ctx.new_todo()}', 'headers': ctx.headers}),
+    Case('batch (10 creates + 10 toggles)', 'POST', '/todos/batch', lambda ctx: {
+        'path': '/api/todos/batch', 'headers': ctx.headers, 'json': {'operations': _batch_operations(ctx)}
+    }),
+    Case('import (20 todos)', 'POST', '/import', lambda ctx: {
+        'path': '/api/import', 'headers': {**ctx.headers, 'Content-Type': 'application/x-ndjson'},
+        'data': _import_body(ctx)
+    }),
+    Case('create tag', 'POST', '/tags', lambda ctx: {
+        'path': '/api/tags', 'headers': ctx.headers, 'json': {'name': f'created_{ctx.next()}', 'color': '#e67e22'}
+    }),
+    Case('update tag', 'PUT', '/tags/<int:tag_id>', lambda ctx: {
+        'path': f'/api/tags/{ctx.sample_tag()}', 'headers': ctx.headers, 'json': {'color': '#34495e'}
+    }),
+    Case('delete tag', 'DELETE', '/tags/<int:tag_id>',
+         lambda ctx: {'path': f'/api/tags/{ctx.new_tag()}', 'headers': ctx.headers}),
+]
+
+
+def _request(ctx, case, counter):
+    """
+    执行一次请求（读完整个响应体），返回(耗时, SQL语句数, 状态码)
+    """
+    kwargs = case.prepare(ctx)
+    path = kwargs.pop('path')
+    counter.count = 0
+    started = time.perf_counter()
+    response = ctx.client.open(path, method=case.method, **kwargs)
+    response.get_data()
+    elapsed = time.perf_counter() - started
+    queries = counter.count
+    response.close()
+    if case.after is not None and response.status_code < 400:
+        case.after(ctx, response)
+    return elapsed, queries, response.status_code
+
+
+def _measure(ctx, case, counter, iterations, warmup):
+    for _ in range(warmup):
+        _request(ctx, case, counter)
+    latencies, queries, statuses = [], [], {}
+    for _ in range(iterations):
+        elapsed, count, status = _request(ctx, case, counter)
+        latencies.append(elapsed)
+        queries.append(count)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    tracemalloc.start()
+    try:
+        _request(ctx, case, counter)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {'name': case.name, 'method': case.method, 'rule': '/api' + case.rule, 'status_codes': statuses}
+    result.update(_summary(latencies, queries, peak))
+    return result
+
+
+def _uncovered_routes(app):
+    """
+    api_bp中没有测量用例的路由，新增接口时提醒补充用例
+    """
+    covered = {(case.method, '/api' + case.rule) for case in CASES}
+    return sorted(
+        f'{method} {rule.rule}'
+        for rule in app.url_map.iter_rules() if rule.endpoint.startswith('api.')
+        for method in rule.methods - {'HEAD', 'OPTIONS'} if (method, rule.rule) not in covered
+    )
+
+
+def bench_reminders(app, counter, iterations):
+    """
+    测量提醒扫描：第一次调用包括领取分片、加载窗口和发送已到期的提醒，之后是没有新提醒时的常规唤醒
+    """
+    service = ReminderService(app)
+    cold = []
+    counter.count = 0
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        service._check_upcoming_tasks()
+        cold.append(time.perf_counter() - started)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    cold_queries = counter.count
+
+    latencies, queries = [], []
+    for _ in range(iterations):
+        counter.count = 0
+        started = time.perf_counter()
+        service._check_upcoming_tasks()
+        latencies.append(time.perf_counter() - started)
+        queries.append(counter.count)
+    with app.app_context():
+        service.leases.release()
+        db.session.remove()
+    return {
+        'name': 'ReminderService._check_upcoming_tasks',
+        'cold': _summary(cold, [cold_queries], peak),
+        'steady': _summary(latencies, queries, 0),
+    }
+
+
+def run(args, settings):
+    directory = None
+    if args.db:
+        database_path = Path(args.db).resolve()
+    else:
+        directory = tempfile.TemporaryDirectory()
+        database_path = Path(directory.name) / 'bench.db'
+    meta_path = database_path.with_name(database_path.name + '.json')
+
+    try:
+        app = _make_app(database_path, args.cache)
+        seed_seconds = None
+        if not (database_path.exists() and meta_path.exists() and json.loads(meta_path.read_text()) == settings):
+            database_path.unlink(missing_ok=True)
+            print(f"生成数据集：{settings}", file=sys.stderr)
+            started = time.perf_counter()
+            seed(app, **settings)
+            seed_seconds = time.perf_counter() - started
+            meta_path.write_text(json.dumps(settings))
+
+        with app.app_context():
+            counter = QueryCounter(db.engine)
+        ctx = BenchContext(app)
+        routes = []
+        selected = [case for case in CASES if not args.cases or any(word in case.name for word in args.cases)]
+        for case in selected:
+            print(f"测量 {case.method} /api{case.rule} ({case.name})", file=sys.stderr)
+            routes.append(_measure(ctx, case, counter, args.requests, args.warmup))
+        reminders = bench_reminders(app, counter, args.requests) if not args.cases or 'reminders' in args.cases else None
+
+        return {
+            'meta': {
+                'dataset': settings,
+                'profile': args.profile,
+                'requests': args.requests,
+                'warmup': args.warmup,
+                'response_cache': args.cache,
+                'seed_seconds': seed_seconds,
+                'started_at': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'routes': routes,
+            'reminders': reminders,
+            'uncovered_routes': _uncovered_routes(app),
+        }
+    finally:
+        if directory is not None:
+            directory.cleanup()
+
+
+def compare(result, baseline):
+    """
+    按用例名称对比p50/p95延迟和SQL语句数，比例>1表示比基线慢
+    """
+    previous = {route['name']: route for route in baseline.get('routes', [])}
+    print(f"{'case':<34} {'p50 ms':>9} {'x':>6} {'p95 ms':>9} {'x':>6} {'queries':>8} {'base':>6}")
+    for route in result['routes']:
+        old = previous.get(route['name'])
+        if old is None:
+            continue
+        p50, p95 = route['latency_ms']['p50'], route['latency_ms']['p95']
+        print(f"{route['name']:<34} {p50:>9.2f} {p50 / old['latency_ms']['p50']:>6.2f} "
+              f"{p95:>9.2f} {p95 / old['latency_ms']['p95']:>6.2f} "
+              f"{route['queries_per_request']['mean']:>8.1f} {old['queries_per_request']['mean']:>6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API接口基准测试（测试客户端 + 磁盘SQLite）')
+    parser.add_argument('--profile', choices=PROFILES, default='1k', help='数据规模档位')
+    parser.add_argument('--todos', type=int, help='覆盖档位中的任务总数')
+    parser.add_argument('--tags', type=int, help='覆盖档位中每个用户的标签数')
+    parser.add_argument('--tags-per-todo', type=int, choices=range(0, 6), help='覆盖档位中每个任务最多的标签数')
+    parser.add_argument('--users', type=int, help='覆盖档位中的用户数')
+    parser.add_argument('--requests', type=int, default=50, help='每个用例计时的请求数')
+    parser.add_argument('--warmup', type=int, default=3, help='每个用例计时前的预热请求数')
+    parser.add_argument('--cases', nargs='+', help='只运行名称包含这些关键字的用例（reminders表示提醒扫描）')
+    parser.add_argument('--cache', action='store_true', help='打开响应缓存')
+    parser.add_argument('--db', help='数据库文件路径，参数相同时复用已生成的数据')
+    parser.add_argument('--output', help='结果JSON的保存路径，默认输出到标准输出')
+    parser.add_argument('--baseline', help='与之对比的上一次结果JSON')
+    args = parser.parse_args()
+
+    settings = dict(PROFILES[args.profile])
+    for key in ('todos', 'tags', 'tags_per_todo', 'users'):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+
+    result = run(args, settings)
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+    else:
+        print(output)
+    if result['uncovered_routes']:
+        print(f"没有测量用例的路由: {', '.join(result['uncovered_routes'])}", file=sys.stderr)
+    if args.baseline:
+        compare(result, json.loads(Path(args.baseline).read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+登录吞吐量基准测试
+
+用Flask测试客户端和临时SQLite数据库，在多个并发线程中反复登录，
+比较不同bcrypt工作因子和工作池类型下的吞吐量与延迟
+
+用法：python -m backend.benchmarks.bench_login --rounds 10 12 --executor thread process
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from backend.app import create_app, db
+from backend.app.config import Config
+from backend.app.services.user_service import create_user
+
+
+def _make_app(database_path, rounds, executor, workers):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{database_path}'
+        REMINDER_SERVICE_ENABLED = False
+        RESPONSE_CACHE_ENABLED = False
+        PURGE_SERVICE_ENABLED = False
+        TOKEN_BLOCKLIST_FLUSH_INTERVAL = 0
+        BCRYPT_LOG_ROUNDS = rounds
+        PASSWORD_HASH_EXECUTOR = executor
+        PASSWORD_HASH_WORKERS = workers
+        PASSWORD_HASH_MAX_PENDING = 1024
+
+    return create_app(BenchConfig)
+
+
+def run(rounds, executor, users, requests, concurrency, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        app = _make_app(Path(directory) / 'bench.db', rounds, executor, workers)
+        with app.app_context():
+            db.create_all()
+            for i in range(users):
+                create_user(f'bench{i}', 'Passw0rd')
+
+        latencies = []
+
+        def login(i):
+            client = app.test_client()
+            start = time.perf_counter()
+            response = client.post('/api/login', json={'username': f'bench{i % users}', 'password': 'Passw0rd'})
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.get_data(as_text=True)
+            latencies.append(elapsed)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(login, range(requests)))
+        wall = time.perf_counter() - started
+
+        with app.app_context():
+            app.extensions['password_hasher'].shutdown()
+
+    latencies.sort()
+    return {
+        'rounds': rounds,
+        'executor': executor,
+        'logins_per_second': requests / wall,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登录吞吐量基准测试')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12])
+    parser.add_argument('--executor', nargs='+', default=['thread', 'process'], choices=['thread', 'process'])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'executor':>8} {'logins/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for rounds in args.rounds:
+        for executor in args.executor:
+            result = run(rounds, executor, args.users, args.requests, args.concurrency, args.workers)
+            print(f"{result['rounds']:>6} {result['executor']:>8} {result['logins_per_second']:>10.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
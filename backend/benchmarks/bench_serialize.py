@@ -0,0 +1,111 @@
+"""
+任务序列化吞吐量基准测试
+
+构造内存中的任务对象（每个任务带若干标签，不访问数据库），比较：
+旧的逐字段字典 + 标准库json、统一序列化器 + 标准库json提供器、统一序列化器 + orjson提供器
+
+用法：python -m backend.benchmarks.bench_serialize --todos 10000 --repeat 5
+"""
+import argparse
+from datetime import datetime, timedelta
+import time
+
+from backend.app import create_app
+from backend.app.config import Config
+from backend.app.json_provider import OrjsonProvider, TodoJSONProvider, orjson
+from backend.app.models.models import Tag, Todo
+from backend.app.serializers import serialize_todos
+
+
+def _make_todos(count, tags_per_todo):
+    tags = [Tag(id=i, name=f'tag{i}', color='#3498db') for i in range(1, 11)]
+    now = datetime.utcnow()
+    todos = []
+    for i in range(count):
+        todo = Todo(
+            id=i + 1,
+            title=f'任务 {i}',
+            description='描述' * 20,
+            completed=i % 3 == 0,
+            created_at=now,
+            due_date=now + timedelta(hours=i),
+            priority=i % 3 + 1
+        )
+        todo.tags = tags[i % 10:i % 10 + tags_per_todo]
+        todos.append(todo)
+    return todos
+
+
+def _legacy_serialize(todos):
+    # 重构前各接口中复制的逐字段写法
+    output = []
+    for todo in todos:
+        tags = [{'id': tag.id, 'name': tag.name, 'color': tag.color} for tag in todo.tags]
+        output.append({
+            'id': todo.id,
+            'title': todo.title,
+            'description': todo.description,
+            'completed': todo.completed,
+            'created_at': todo.created_at.isoformat(),
+            'due_date': todo.due_date.isoformat() if todo.due_date else None,
+            'priority': todo.priority,
+            'tags': tags
+        })
+    return output
+
+
+def _best_of(repeat, fn):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _make_app():
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        REMINDER_SERVICE_ENABLED = False
+        PURGE_SERVICE_ENABLED = False
+        TOKEN_BLOCKLIST_FLUSH_INTERVAL = 0
+
+    return create_app(BenchConfig)
+
+
+def run(count, tags_per_todo, repeat):
+    app = _make_app()
+    todos = _make_todos(count, tags_per_todo)
+    json_provider = TodoJSONProvider(app)
+    cases = [
+        ('legacy dict + json', lambda: json_provider.response({'todos': _legacy_serialize(todos)})),
+        ('serializer + json', lambda: json_provider.response({'todos': serialize_todos(todos)})),
+    ]
+    if orjson is not None:
+        orjson_provider = OrjsonProvider(app)
+        cases.append(('serializer + orjson', lambda: orjson_provider.response({'todos': serialize_todos(todos)})))
+    # 只序列化不编码，用于区分两部分的开销
+    cases.append(('serializer only', lambda: serialize_todos(todos)))
+
+    results = []
+    with app.app_context():
+        for name, fn in cases:
+            seconds = _best_of(repeat, fn)
+            results.append((name, seconds))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='任务序列化吞吐量基准测试')
+    parser.add_argument('--todos', type=int, default=10000)
+    parser.add_argument('--tags', type=int, default=2, help='每个任务的标签数')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'case':<22} {'ms':>8} {'todos/s':>12}")
+    for name, seconds in run(args.todos, args.tags, args.repeat):
+        print(f"{name:<22} {seconds * 1000:>8.1f} {args.todos / seconds:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Web服务吞吐量基准测试
+
+对每种异步模式用 python -m backend serve 启动服务（临时SQLite数据库，关闭响应缓存），
+由多个客户端线程通过长连接并发请求 GET /api/todos?limit=20，统计吞吐量与延迟
+
+用法：python -m backend.benchmarks.bench_server --modes threading eventlet gevent --concurrency 32 --duration 10
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import http.client
+import json
+import os
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def _request(connection, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def _wait_until_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            _request(connection, 'GET', '/api/user')
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def _seed(port, todos):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    credentials = {'username': 'bench', 'password': 'Passw0rd'}
+    _request(connection, 'POST', '/api/register', credentials)
+    status, data = _request(connection, 'POST', '/api/login', credentials)
+    assert status == 200, data
+    token = json.loads(data)['access_token']
+    due_date = (datetime.utcnow() + timedelta(days=3)).isoformat() + 'Z'
+    operations = [{'op': 'create', 'data': {'title': f'task {i}', 'due_date': due_date}} for i in range(todos)]
+    status, data = _request(connection, 'POST', '/api/todos/batch', {'operations': operations}, token)
+    assert status == 200, data
+    connection.close()
+    return token
+
+
+def run(mode, port, concurrency, duration, threads, todos):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(
+            os.environ,
+            SQLALCHEMY_DATABASE_URI=f"sqlite:///{Path(directory) / 'bench.db'}",
+            RESPONSE_CACHE_ENABLED='false',
+            BCRYPT_LOG_ROUNDS='4',
+        )
+        subprocess.run([sys.executable, '-m', 'backend', 'migrate'], env=env, check=True, capture_output=True)
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'backend', 'serve', '--port', str(port), '--async-mode', mode,
+             '--threads', str(threads)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_until_ready(port)
+            token = _seed(port, todos)
+
+            deadline = time.monotonic() + duration
+
+            def client(_):
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                latencies, errors = [], 0
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    status, _ = _request(connection, 'GET', '/api/todos?limit=20', token=token)
+                    latencies.append(time.perf_counter() - started)
+                    errors += status != 200
+                connection.close()
+                return latencies, errors
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(client, range(concurrency)))
+            wall = time.perf_counter() - started
+        finally:
+            server.terminate()
+            server.wait(timeout=60)
+
+    latencies = sorted(latency for result, _ in results for latency in result)
+    return {
+        'mode': mode,
+        'requests_per_second': len(latencies) / wall,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': sum(errors for _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web服务吞吐量基准测试')
+    parser.add_argument('--modes', nargs='+', default=['threading', 'eventlet', 'gevent'],
+                        choices=['threading', 'eventlet', 'gevent'])
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=1000)
+    parser.add_argument('--todos', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for mode in args.modes:
+        result = run(mode, args.port, args.concurrency, args.duration, args.threads, args.todos)
+        print(f"{result['mode']:>10} {result['requests_per_second']:>8.1f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
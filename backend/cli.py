@@ -0,0 +1,348 @@
+"""
+生产环境启动器
+
+    python -m backend migrate                      # 建表或升级数据库结构
+    python -m backend serve --workers 4 --threads 1000 --async-mode auto
+    python -m backend reminders                    # 独立的提醒进程，可在多台机器上各运行一个
+    python -m backend reconcile-stats              # 从任务表重新生成每个用户的任务计数
+
+migrate和serve是两个独立的步骤：部署时先执行一次migrate，再启动（或滚动重启）serve。
+serve在单进程内使用eventlet/gevent协程或线程处理请求；--workers大于1时启动多个工作进程，
+分别监听port、port+1、...，前面需要一个按客户端粘滞（如nginx ip_hash）的反向代理，
+这是Flask-SocketIO长轮询连接的要求。收到SIGTERM后工作进程不再接受新请求（返回503），
+等进行中的请求完成（最多--drain-timeout秒）并停止后台服务后退出。
+提醒扫描可以用serve --no-reminders从Web进程中拆出，交给reminders进程：
+所有运行提醒服务的进程通过数据库租约分摊用户分片，每条提醒只由一个进程发送
+"""
+import argparse
+import os
+from pathlib import Path
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+MIGRATIONS_DIR = str(Path(__file__).parent / 'migrations')
+# 旧版run.py用db.create_all()建出的表结构对应的迁移版本
+CREATE_ALL_BASELINE_REVISION = '536a15a51913'
+ASYNC_MODES = ('eventlet', 'gevent', 'threading')
+
+
+def detect_async_mode(requested='auto'):
+    """
+    选择Flask-SocketIO的异步模式：auto时依次尝试eventlet、gevent，都未安装时使用threading
+    """
+    if requested != 'auto':
+        return requested
+    for mode in ('eventlet', 'gevent'):
+        try:
+            __import__(mode)
+        except ImportError:
+            continue
+        return mode
+    return 'threading'
+
+
+def monkey_patch(async_mode):
+    """
+    协程模式必须在导入应用（以及数据库驱动、threading等）之前打补丁
+    """
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif async_mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def spawn_background(async_mode, fn):
+    """
+    在后台执行fn；信号处理函数可能运行在事件循环中，协程模式下不能等待线程启动
+    """
+    if async_mode == 'eventlet':
+        import eventlet
+        eventlet.spawn(fn)
+    elif async_mode == 'gevent':
+        import gevent
+        gevent.spawn(fn)
+    else:
+        threading.Thread(target=fn, daemon=True).start()
+
+
+def _make_app(**overrides):
+    from backend.app import create_app
+    from backend.app.config import Config
+
+    config_class = type('LauncherConfig', (Config,), overrides)
+    return create_app(config_class)
+
+
+def migrate(args):
+    """
+    将数据库结构升级到最新版本
+    空数据库直接按模型建表并标记为最新版本；旧版本用create_all建出、没有版本记录的数据库先标记为基线版本再升级
+    """
+    from flask_migrate import stamp, upgrade
+    from sqlalchemy import inspect
+
+    from backend.app import db
+
+    app = _make_app(REMINDER_SERVICE_ENABLED=False, PURGE_SERVICE_ENABLED=False, TOKEN_BLOCKLIST_FLUSH_INTERVAL=0)
+    with app.app_context():
+        tables = set(inspect(db.engine).get_table_names())
+        if 'user' not in tables:
+            print("数据库为空，按当前模型建表")
+            db.create_all()
+            stamp(directory=MIGRATIONS_DIR)
+        else:
+            if 'alembic_version' not in tables:
+                print(f"未找到迁移版本记录，按旧版create_all建出的结构标记为{CREATE_ALL_BASELINE_REVISION}")
+                stamp(directory=MIGRATIONS_DIR, revision=CREATE_ALL_BASELINE_REVISION)
+            upgrade(directory=MIGRATIONS_DIR)
+    print("数据库已是最新版本")
+
+
+class DrainMiddleware:
+    """
+    统计进行中的HTTP请求；开始排空后新请求直接返回503，让负载均衡把流量切到其他进程
+    Socket.IO连接是长连接，不计入进行中的请求，进程退出后客户端会自动重连
+    """
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.draining = False
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def _done(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith('/socket.io'):
+            return self.wsgi_app(environ, start_response)
+        if self.draining:
+            start_response('503 Service Unavailable', [
+                ('Content-Type', 'application/json'),
+                ('Retry-After', '1'),
+                ('Connection', 'close'),
+            ])
+            return [b'{"message": "Server is shutting down"}']
+
+        from werkzeug.wsgi import ClosingIterator
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            # 流式响应在响应体发送完毕后才算完成
+            return ClosingIterator(self.wsgi_app(environ, start_response), [self._done])
+        except BaseException:
+            self._done()
+            raise
+
+    def drain(self, timeout):
+        """
+        停止接收新请求，等待进行中的请求完成，返回是否在超时前全部完成
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout
+        while self.in_flight > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.in_flight == 0
+
+
+def _stop_background_services(app):
+    from backend.app.services import maintenance_service, reminder_service
+
+    for service in (reminder_service.reminder_service, maintenance_service.purge_service):
+        if service is not None:
+            service.stop()
+    for extension in ('token_blocklist', 'change_events'):
+        if app.extensions.get(extension) is not None:
+            app.extensions[extension].stop()
+    # 发布尚未刷新的Socket.IO消息批次
+    from backend.app import socketio
+
+    manager = getattr(socketio.server, 'manager', None)
+    if hasattr(manager, 'flush'):
+        manager.flush()
+
+
+def serve_worker(args):
+    """
+    在当前进程中运行一个工作进程
+    """
+    async_mode = detect_async_mode(args.async_mode)
+    monkey_patch(async_mode)
+
+    from backend.app import socketio
+
+    # 提醒服务通过分片租约在进程间分摊；清理服务只在第一个工作进程中运行
+    app = _make_app(
+        SOCKETIO_ASYNC_MODE=async_mode,
+        REMINDER_SERVICE_ENABLED=args.reminders,
+        PURGE_SERVICE_ENABLED=args.worker_index == 0,
+    )
+    drain = DrainMiddleware(app.wsgi_app)
+    app.wsgi_app = drain
+
+    def shutdown():
+        drained = drain.drain(args.drain_timeout)
+        print(f"工作进程{args.worker_index}已排空" if drained else
+              f"工作进程{args.worker_index}排空超时，仍有{drain.in_flight}个请求未完成")
+        _stop_background_services(app)
+        sys.stdout.flush()
+        os._exit(0)
+
+    def handle_sigterm(signum, frame):
+        if not drain.draining:
+            drain.draining = True
+            spawn_background(async_mode, shutdown)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    options = {}
+    if async_mode == 'eventlet':
+        options['max_size'] = args.threads
+    elif async_mode == 'gevent':
+        options['spawn'] = args.threads
+    else:
+        # Werkzeug的多线程服务器每个连接一个线程，不支持限制线程数
+        options['allow_unsafe_werkzeug'] = True
+
+    print(f"工作进程{args.worker_index}（{async_mode}）监听 {args.host}:{args.port}")
+    socketio.run(app, host=args.host, port=args.port, log_output=args.access_log, **options)
+
+
+def supervise(args):
+    """
+    启动多个工作进程并转发SIGTERM/SIGINT；工作进程意外退出时重新启动
+    """
+    def spawn(index):
+        command = [
+            sys.executable, '-m', 'backend', 'serve',
+            '--host', args.host,
+            '--port', str(args.port + index),
+            '--workers', '1',
+            '--worker-index', str(index),
+            '--threads', str(args.threads),
+            '--async-mode', args.async_mode,
+            '--drain-timeout', str(args.drain_timeout),
+        ]
+        if args.access_log:
+            command.append('--access-log')
+        command.append('--reminders' if args.reminders else '--no-reminders')
+        return subprocess.Popen(command)
+
+    workers = {index: spawn(index) for index in range(args.workers)}
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopping.set()
+        for process in workers.values():
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    while not stopping.is_set():
+        for index, process in list(workers.items()):
+            if process.poll() is not None and not stopping.is_set():
+                print(f"工作进程{index}退出（返回码{process.returncode}），重新启动")
+                workers[index] = spawn(index)
+        stopping.wait(1)
+
+    # 等待各工作进程排空，超时后强制结束
+    deadline = time.monotonic() + args.drain_timeout + 5
+    for process in workers.values():
+        try:
+            process.wait(timeout=max(deadline - time.monotonic(), 0))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def serve(args):
+    if args.workers > 1:
+        supervise(args)
+    else:
+        serve_worker(args)
+
+
+def run_reminders(args):
+    """
+    运行独立的提醒进程，不处理HTTP请求；收到SIGTERM/SIGINT后释放分片租约并退出
+    """
+    from backend.app.services import reminder_service
+
+    app = _make_app(
+        SOCKETIO_ASYNC_MODE='threading',
+        REMINDER_SERVICE_ENABLED=True,
+        PURGE_SERVICE_ENABLED=False,
+    )
+    stopping = threading.Event()
+
+    def handle_signal(signum, frame):
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    print(f"提醒进程{reminder_service.reminder_service.leases.worker_id}已启动")
+    while not stopping.wait(1):
+        pass
+    _stop_background_services(app)
+
+
+def reconcile_stats(args):
+    """
+    从任务表重新生成todo_stats中的计数，用于修复手工改动数据库等原因造成的偏差
+    """
+    from backend.app import db
+    from backend.app.services.stats_service import rebuild_todo_stats
+
+    app = _make_app(REMINDER_SERVICE_ENABLED=False, PURGE_SERVICE_ENABLED=False, TOKEN_BLOCKLIST_FLUSH_INTERVAL=0)
+    with app.app_context():
+        rows = rebuild_todo_stats()
+        db.session.remove()
+    print(f"已重新生成{rows}个用户的任务计数")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend', description='MyToDoList 启动器')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('migrate', help='建表或将数据库升级到最新版本')
+
+    serve_parser = commands.add_parser('serve', help='启动Web服务')
+    serve_parser.add_argument('--host', default=os.environ.get('HOST', '0.0.0.0'))
+    serve_parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    serve_parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_WORKERS', 1)),
+                              help='工作进程数，第i个进程监听port+i')
+    serve_parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 1000)),
+                              help='每个进程的并发协程数上限（eventlet/gevent）')
+    serve_parser.add_argument('--async-mode', default=os.environ.get('SOCKETIO_ASYNC_MODE', 'auto'),
+                              choices=('auto',) + ASYNC_MODES)
+    serve_parser.add_argument('--drain-timeout', type=float, default=float(os.environ.get('DRAIN_TIMEOUT', 30)),
+                              help='收到SIGTERM后等待进行中请求完成的最长时间（秒）')
+    serve_parser.add_argument('--access-log', action='store_true', help='输出访问日志')
+    serve_parser.add_argument('--reminders', action=argparse.BooleanOptionalAction,
+                              default=os.environ.get('WEB_REMINDERS', 'true').lower() == 'true',
+                              help='Web进程是否参与提醒扫描；--no-reminders时由reminders进程负责')
+    serve_parser.add_argument('--worker-index', type=int, default=0, help=argparse.SUPPRESS)
+
+    commands.add_parser('reminders', help='运行独立的提醒进程（通过数据库租约与其他提醒进程分摊分片）')
+    commands.add_parser('reconcile-stats', help='从任务表重新生成每个用户的任务计数')
+
+    args = parser.parse_args(argv)
+    if args.command == 'migrate':
+        migrate(args)
+    elif args.command == 'reminders':
+        run_reminders(args)
+    elif args.command == 'reconcile-stats':
+        reconcile_stats(args)
+    else:
+        serve(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""Add composite indexes for service query shapes
+
+Revision ID: 7f3b2a91d0c8
+Revises: c41d7e9a2b65
+Create Date: 2026-10-18 15:31:44.902117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3b2a91d0c8'
+down_revision = 'c41d7e9a2b65'
+branch_labels = None
+depends_on = None
+
+# (索引名, 表名, 列)
+INDEXES = [
+    # 未完成任务的截止时间范围查询（过期、即将到期、提醒）
+    ('ix_todo_user_id_completed_due_date', 'todo', ['user_id', 'completed', 'due_date']),
+    # 按日/周的截止时间范围查询，以及按截止时间排序
+    ('ix_todo_user_id_due_date', 'todo', ['user_id', 'due_date']),
+    # 按创建时间排序，以及清理已完成的旧任务
+    ('ix_todo_user_id_created_at', 'todo', ['user_id', 'created_at']),
+    ('ix_todo_user_id_priority', 'todo', ['user_id', 'priority']),
+    ('ix_todo_user_id_title', 'todo', ['user_id', 'title']),
+    ('ix_tag_user_id', 'tag', ['user_id']),
+    # 按标签查找任务、删除标签
+    ('ix_todo_tags_tag_id_todo_id', 'todo_tags', ['tag_id', 'todo_id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
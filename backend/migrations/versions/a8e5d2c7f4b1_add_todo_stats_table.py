@@ -0,0 +1,41 @@
+"""Add todo_stats table with per-user task counters
+
+Revision ID: a8e5d2c7f4b1
+Revises: f1c7b4e9a2d3
+Create Date: 2026-10-18 22:03:15.774920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e5d2c7f4b1'
+down_revision = 'f1c7b4e9a2d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('todo_stats',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('total_tasks', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('completed_tasks', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # 按现有任务生成计数
+    user = sa.table('user', sa.column('id', sa.Integer))
+    todo = sa.table('todo', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                    sa.column('completed', sa.Boolean))
+    todo_stats = sa.table('todo_stats', sa.column('user_id', sa.Integer), sa.column('total_tasks', sa.Integer),
+                          sa.column('completed_tasks', sa.Integer))
+    counts = sa.select(
+        user.c.id,
+        sa.func.count(todo.c.id),
+        sa.func.coalesce(sa.func.sum(sa.case((todo.c.completed.is_(True), 1), else_=0)), 0),
+    ).select_from(user.outerjoin(todo, todo.c.user_id == user.c.id)).group_by(user.c.id)
+    op.execute(todo_stats.insert().from_select(['user_id', 'total_tasks', 'completed_tasks'], counts))
+
+def downgrade():
+    op.drop_table('todo_stats')
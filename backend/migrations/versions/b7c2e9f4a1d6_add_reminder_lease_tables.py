@@ -0,0 +1,41 @@
+"""Add reminder_worker and reminder_lease tables for sharded reminder workers
+
+Revision ID: b7c2e9f4a1d6
+Revises: a5d1c8e3f902
+Create Date: 2026-10-18 19:12:05.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2e9f4a1d6'
+down_revision = 'a5d1c8e3f902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reminder_worker',
+        sa.Column('worker_id', sa.String(length=64), nullable=False),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('worker_id')
+    )
+    with op.batch_alter_table('reminder_worker', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_reminder_worker_heartbeat_at'), ['heartbeat_at'], unique=False)
+
+    op.create_table('reminder_lease',
+        sa.Column('shard', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('owner', sa.String(length=64), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('shard')
+    )
+
+
+def downgrade():
+    op.drop_table('reminder_lease')
+    with op.batch_alter_table('reminder_worker', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reminder_worker_heartbeat_at'))
+
+    op.drop_table('reminder_worker')
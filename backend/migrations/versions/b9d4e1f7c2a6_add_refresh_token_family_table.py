@@ -0,0 +1,39 @@
+"""Add refresh_token_family table for per-login refresh token generations
+
+Revision ID: b9d4e1f7c2a6
+Revises: a8e5d2c7f4b1
+Create Date: 2026-10-19 10:26:41.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b9d4e1f7c2a6'
+down_revision = 'a8e5d2c7f4b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('refresh_token_family',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('generation', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_refresh_token_family_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_refresh_token_family_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('refresh_token_family', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_refresh_token_family_user_id'))
+        batch_op.drop_index(batch_op.f('ix_refresh_token_family_expires_at'))
+
+    op.drop_table('refresh_token_family')
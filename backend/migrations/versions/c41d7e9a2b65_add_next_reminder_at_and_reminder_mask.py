@@ -0,0 +1,113 @@
+"""Add next_reminder_at and reminder_mask to Todo model, replacing reminders_sent
+
+Revision ID: c41d7e9a2b65
+Revises: 536a15a51913
+Create Date: 2026-10-18 14:52:10.318204
+
+"""
+from datetime import datetime, timedelta
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2b65'
+down_revision = '536a15a51913'
+branch_labels = None
+depends_on = None
+
+# 与 reminder_service.REMINDER_TIMEPOINTS 保持一致：(名称, 提前量, 位)
+TIMEPOINTS = [
+    ('1h', timedelta(hours=1), 1),
+    ('15m', timedelta(minutes=15), 2),
+    ('5m', timedelta(minutes=5), 4),
+]
+GRACE = timedelta(minutes=1)
+BATCH_SIZE = 1000
+
+todo = sa.table(
+    'todo',
+    sa.column('id', sa.Integer),
+    sa.column('completed', sa.Boolean),
+    sa.column('due_date', sa.DateTime),
+    sa.column('reminders_sent', sa.Text),
+    sa.column('next_reminder_at', sa.DateTime),
+    sa.column('reminder_mask', sa.SmallInteger),
+)
+
+
+def _next_reminder_at(due_date, mask, now):
+    if due_date is None:
+        return None
+    for _, delta, bit in TIMEPOINTS:
+        if not mask & bit and now < due_date - delta + GRACE:
+            return due_date - delta
+    return None
+
+
+def _execute_in_batches(bind, statement, params):
+    for start in range(0, len(params), BATCH_SIZE):
+        bind.execute(statement, params[start:start + BATCH_SIZE])
+
+
+def upgrade():
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('next_reminder_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reminder_mask', sa.SmallInteger(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_todo_next_reminder_at'), ['next_reminder_at'], unique=False)
+
+    # 根据reminders_sent中的JSON回填位掩码，并为未完成的任务计算下一次提醒时间
+    bind = op.get_bind()
+    now = datetime.utcnow()
+    bits = {name: bit for name, _, bit in TIMEPOINTS}
+    rows = bind.execute(
+        sa.select(todo.c.id, todo.c.completed, todo.c.due_date, todo.c.reminders_sent)
+    ).fetchall()
+    params = []
+    for todo_id, completed, due_date, reminders_sent in rows:
+        try:
+            sent = json.loads(reminders_sent) if reminders_sent else []
+        except ValueError:
+            sent = []
+        mask = 0
+        for name in sent:
+            mask |= bits.get(name, 0)
+        next_reminder_at = None if completed else _next_reminder_at(due_date, mask, now)
+        if mask or next_reminder_at is not None:
+            params.append({'b_id': todo_id, 'b_mask': mask, 'b_next': next_reminder_at})
+    _execute_in_batches(
+        bind,
+        todo.update().where(todo.c.id == sa.bindparam('b_id'))
+        .values(reminder_mask=sa.bindparam('b_mask'), next_reminder_at=sa.bindparam('b_next')),
+        params,
+    )
+
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_column('reminders_sent')
+
+
+def downgrade():
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reminders_sent', sa.Text(), nullable=True))
+
+    # 将位掩码还原为JSON列表
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(todo.c.id, todo.c.reminder_mask).where(todo.c.reminder_mask != 0)
+    ).fetchall()
+    params = [
+        {'b_id': todo_id, 'b_sent': json.dumps([name for name, _, bit in TIMEPOINTS if mask & bit])}
+        for todo_id, mask in rows
+    ]
+    _execute_in_batches(
+        bind,
+        todo.update().where(todo.c.id == sa.bindparam('b_id')).values(reminders_sent=sa.bindparam('b_sent')),
+        params,
+    )
+
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_todo_next_reminder_at'))
+        batch_op.drop_column('reminder_mask')
+        batch_op.drop_column('next_reminder_at')
@@ -0,0 +1,26 @@
+"""Add timezone to user for local-day date windows
+
+Revision ID: d3f6a2b8c514
+Revises: b7c2e9f4a1d6
+Create Date: 2026-10-18 20:05:41.902317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f6a2b8c514'
+down_revision = 'b7c2e9f4a1d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('timezone', sa.String(length=64), server_default='Asia/Shanghai', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('timezone')
@@ -0,0 +1,25 @@
+"""Add index for the background purge of completed todos
+
+Revision ID: e8a4f0b3c217
+Revises: 7f3b2a91d0c8
+Create Date: 2026-10-18 17:02:15.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8a4f0b3c217'
+down_revision = '7f3b2a91d0c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 后台清理跨用户查找已完成的旧任务
+    op.create_index('ix_todo_completed_created_at', 'todo', ['completed', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_todo_completed_created_at', table_name='todo')
@@ -0,0 +1,65 @@
+"""Add change sequence, revisions and tombstones for delta sync
+
+Revision ID: f1c7b4e9a2d3
+Revises: d3f6a2b8c514
+Create Date: 2026-10-18 21:12:37.518264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7b4e9a2d3'
+down_revision = 'd3f6a2b8c514'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.BigInteger(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('change_floor', sa.BigInteger(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revision', sa.BigInteger(), server_default='0', nullable=False))
+        batch_op.create_index('ix_tag_user_id_revision', ['user_id', 'revision'], unique=False)
+
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('revision', sa.BigInteger(), server_default='0', nullable=False))
+        batch_op.create_index('ix_todo_user_id_revision', ['user_id', 'revision'], unique=False)
+
+    op.create_table('deleted_record',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('record_id', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.BigInteger(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('deleted_record', schema=None) as batch_op:
+        batch_op.create_index('ix_deleted_record_user_id_revision', ['user_id', 'revision'], unique=False)
+        batch_op.create_index(batch_op.f('ix_deleted_record_deleted_at'), ['deleted_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('deleted_record', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_deleted_record_deleted_at'))
+        batch_op.drop_index('ix_deleted_record_user_id_revision')
+
+    op.drop_table('deleted_record')
+    with op.batch_alter_table('todo', schema=None) as batch_op:
+        batch_op.drop_index('ix_todo_user_id_revision')
+        batch_op.drop_column('revision')
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_tag_user_id_revision')
+        batch_op.drop_column('revision')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('change_floor')
+        batch_op.drop_column('change_seq')
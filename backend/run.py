@@ -1,10 +1,8 @@
-from backend.app import create_app, db, socketio
-
-app = create_app()
-
-# 创建数据库表
-with app.app_context():
-    db.create_all()
+from backend.app import create_app, socketio
 
+# 开发环境入口，首次运行前先执行 python -m backend migrate 建表
+# 生产环境请使用 python -m backend serve
+# 应用只在直接运行时创建：进程池的子进程会重新导入本脚本，不能在导入时启动后台服务
 if __name__ == '__main__':
-    socketio.run(app, debug=True)
\ No newline at end of file
+    app = create_app()
+    socketio.run(app, debug=True)
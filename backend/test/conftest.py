@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import create_app, db
+from backend.app.config import Config
+
+
+class TestConfig(Config):
+    """
+    离线测试配置：使用临时SQLite文件数据库，不启动后台线程
+    """
+    TESTING = True
+    REMINDER_SERVICE_ENABLED = False
+    PURGE_SERVICE_ENABLED = False
+    SOCKETIO_ASYNC_MODE = 'threading'
+    TOKEN_BLOCKLIST_FLUSH_INTERVAL = 0
+    CHANGE_EVENT_WINDOW = 0
+    # 降低bcrypt开销，加快测试
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_EXECUTOR = 'thread'
+    JWT_SECRET_KEY = 'offline-test-secret-key-with-32-bytes'
+
+
+@pytest.fixture
+def app(tmp_path):
+    TestConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    """
+    注册并登录测试用户，返回带JWT的请求头
+    """
+    client.post('/api/register', json={'username': 'tester', 'password': 'Passw0rd'})
+    response = client.post('/api/login', json={'username': 'tester', 'password': 'Passw0rd'})
+    token = response.get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    统计代码块内执行的SQL语句数量
+    """
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
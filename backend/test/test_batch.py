@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from backend.app import db
+from backend.app.models.models import Todo
+
+DUE_DATE = (datetime.utcnow() + timedelta(days=2)).isoformat() + 'Z'
+
+
+def _create(client, headers, count, **data):
+    operations = [{'op': 'create', 'data': {'title': f'task {i}', 'due_date': DUE_DATE, **data}} for i in range(count)]
+    response = client.post('/api/todos/batch', json={'operations': operations}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [result['todo'] for result in response.get_json()['results']]
+
+
+def test_batch_mixed_operations(client, auth_headers):
+    tag = client.post('/api/tags', json={'name': 'home', 'color': '#00FF00'}, headers=auth_headers).get_json()
+    first, second, third = _create(client, auth_headers, 3, tags=[tag['id']])
+    assert first['tags'] == [{'id': tag['id'], 'name': 'home', 'color': '#00FF00'}]
+
+    response = client.post('/api/todos/batch', json={'operations': [
+        {'op': 'update', 'id': first['id'], 'data': {'title': 'renamed', 'tags': []}},
+        {'op': 'toggle', 'id': second['id']},
+        {'op': 'delete', 'id': third['id']},
+        {'op': 'create', 'data': {'title': 'new', 'priority': 3, 'tags': [tag['id']]}},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['status'] for result in results] == ['ok'] * 4
+    assert results[0]['todo']['title'] == 'renamed' and results[0]['todo']['tags'] == []
+    assert results[1]['todo']['completed'] is True
+    assert results[2]['id'] == third['id']
+    assert results[3]['todo']['priority'] == 3 and results[3]['todo']['tags'][0]['id'] == tag['id']
+
+    todos = client.get('/api/todos', headers=auth_headers).get_json()['todos']
+    assert sorted(todo['title'] for todo in todos) == ['new', 'renamed', 'task 1']
+
+
+def test_invalid_batch_changes_nothing(client, auth_headers):
+    (todo,) = _create(client, auth_headers, 1)
+    response = client.post('/api/todos/batch', json={'operations': [
+        {'op': 'toggle', 'id': todo['id']},
+        {'op': 'update', 'id': todo['id'], 'data': {'title': 'twice'}},
+        {'op': 'create', 'data': {'title': ''}},
+        {'op': 'delete', 'id': 999999},
+        {'op': 'archive', 'id': todo['id']},
+    ]}, headers=auth_headers)
+    assert response.status_code == 400
+    statuses = [result['status'] for result in response.get_json()['results']]
+    assert statuses == ['skipped', 'error', 'error', 'error', 'error']
+    assert db.session.get(Todo, todo['id']).completed is False
+
+    # 请求体不是JSON对象
+    for body in ('[]', 'null', '"operations"'):
+        response = client.post('/api/todos/batch', data=body, content_type='application/json', headers=auth_headers)
+        assert response.status_code == 400
+
+
+def test_batch_statement_count_is_constant(client, auth_headers, count_queries):
+    small = _create(client, auth_headers, 2)
+    large = _create(client, auth_headers, 40)
+
+    def toggle_all(todos):
+        operations = [{'op': 'toggle', 'id': todo['id']} for todo in todos]
+        with count_queries() as statements:
+            assert client.post('/api/todos/batch', json={'operations': operations},
+                               headers=auth_headers).status_code == 200
+        return len(statements)
+
+    assert toggle_all(small) == toggle_all(large)
+
+
+def test_batch_creates_are_not_reloaded_after_commit(client, auth_headers, count_queries):
+    def create(count):
+        operations = [{'op': 'create', 'data': {'title': f'new {i}', 'description': '', 'due_date': DUE_DATE, 'tags': []}}
+                      for i in range(count)]
+        with count_queries() as statements:
+            assert client.post('/api/todos/batch', json={'operations': operations},
+                               headers=auth_headers).status_code == 200
+        return [statement for statement in statements if statement.startswith('SELECT')]
+
+    create(1)
+    # 新任务的ID在提交前取得，提交后只用一次查询（及其标签）重新读取
+    assert len(create(2)) == len(create(10)) == 3
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+from backend.app import db
+from backend.app.models.models import DeletedRecord, Tag, Todo, User
+from backend.app.services import change_service
+
+DUE = (datetime.utcnow() + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _create_todo(client, headers, title, tags=()):
+    response = client.post('/api/todos', json={
+        'title': title, 'description': '', 'due_date': DUE, 'tags': list(tags)
+    }, headers=headers)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def _changes(client, headers, since=None):
+    query = '' if since is None else f'?since={since}'
+    response = client.get(f'/api/todos/changes{query}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_changes_since_cursor(client, auth_headers):
+    start = _changes(client, auth_headers)
+    assert (start['reset'], start['todos'], start['tags']) == (True, [], [])
+
+    kept = _create_todo(client, auth_headers, 'kept')
+    removed = _create_todo(client, auth_headers, 'removed')
+    client.delete(f"/api/todos/{removed['id']}", headers=auth_headers)
+
+    changes = _changes(client, auth_headers, start['cursor'])
+    assert changes['reset'] is False and changes['cursor'] == start['cursor'] + 3
+    assert [todo['title'] for todo in changes['todos']] == ['kept']
+    assert changes['deleted'] == {'todos': [removed['id']], 'tags': []}
+
+    # 没有新变更时返回空结果和相同的游标
+    idle = _changes(client, auth_headers, changes['cursor'])
+    assert (idle['cursor'], idle['todos'], idle['deleted']['todos']) == (changes['cursor'], [], [])
+
+    client.put(f"/api/todos/{kept['id']}/toggle", headers=auth_headers)
+    toggled = _changes(client, auth_headers, changes['cursor'])
+    assert [(todo['id'], todo['completed']) for todo in toggled['todos']] == [(kept['id'], True)]
+
+
+def test_tag_changes_resend_linked_todos(client, auth_headers):
+    tag = client.post('/api/tags', json={'name': 'work', 'color': '#ff0000'}, headers=auth_headers).get_json()
+    todo = _create_todo(client, auth_headers, 'tagged', [tag['id']])
+    _create_todo(client, auth_headers, 'untagged')
+    cursor = _changes(client, auth_headers)['cursor']
+
+    client.put(f"/api/tags/{tag['id']}", json={'name': 'office'}, headers=auth_headers)
+    changes = _changes(client, auth_headers, cursor)
+    assert [item['name'] for item in changes['tags']] == ['office']
+    assert [(item['id'], item['tags'][0]['name']) for item in changes['todos']] == [(todo['id'], 'office')]
+
+    client.delete(f"/api/tags/{tag['id']}", headers=auth_headers)
+    changes = _changes(client, auth_headers, changes['cursor'])
+    assert changes['deleted']['tags'] == [tag['id']]
+    assert [(item['id'], item['tags']) for item in changes['todos']] == [(todo['id'], [])]
+
+
+def test_batch_shares_one_revision(client, auth_headers):
+    first = _create_todo(client, auth_headers, 'first')
+    second = _create_todo(client, auth_headers, 'second')
+    cursor = _changes(client, auth_headers)['cursor']
+
+    response = client.post('/api/todos/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'third', 'description': '', 'due_date': DUE, 'tags': []}},
+        {'op': 'toggle', 'id': first['id']},
+        {'op': 'delete', 'id': second['id']},
+    ]}, headers=auth_headers)
+    assert response.status_code == 200
+
+    changes = _changes(client, auth_headers, cursor)
+    assert changes['cursor'] == cursor + 1
+    assert sorted(todo['title'] for todo in changes['todos']) == ['first', 'third']
+    assert changes['deleted']['todos'] == [second['id']]
+
+
+def test_stale_or_large_cursors_reset(app, client, auth_headers, monkeypatch):
+    for i in range(3):
+        _create_todo(client, auth_headers, f'todo {i}')
+    snapshot = _changes(client, auth_headers)
+    cursor = snapshot['cursor']
+    # 全量结果与游标一起返回
+    assert [todo['title'] for todo in snapshot['todos']] == ['todo 0', 'todo 1', 'todo 2']
+    assert _changes(client, auth_headers, cursor + 1)['reset'] is True
+
+    monkeypatch.setattr(change_service, 'MAX_CHANGES', 2)
+    assert _changes(client, auth_headers, 0)['reset'] is True
+    assert _changes(client, auth_headers, 1)['reset'] is False
+
+    # 清理过期的删除记录后，早于被清理序号的游标需要全量刷新
+    todo = Todo.query.filter_by(title='todo 0').one()
+    client.delete(f'/api/todos/{todo.id}', headers=auth_headers)
+    DeletedRecord.query.update({'deleted_at': datetime.utcnow() - timedelta(days=31)})
+    db.session.commit()
+    assert change_service.purge_tombstones(timedelta(days=30)) == 1
+    user = User.query.filter_by(username='tester').one()
+    db.session.refresh(user)
+    assert user.change_floor == user.change_seq
+    assert _changes(client, auth_headers, cursor)['reset'] is True
+    assert _changes(client, auth_headers, user.change_seq)['reset'] is False
+    assert Tag.query.count() == 0
@@ -0,0 +1,38 @@
+import threading
+
+from backend.cli import DrainMiddleware, detect_async_mode
+
+
+def _wsgi_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+
+def _call(app, path='/api/todos'):
+    statuses = []
+    body = app({'PATH_INFO': path}, lambda status, headers: statuses.append(status))
+    return statuses, body
+
+
+def test_drain_waits_for_in_flight_requests():
+    middleware = DrainMiddleware(_wsgi_app)
+    statuses, body = _call(middleware)
+    assert statuses == ['200 OK'] and middleware.in_flight == 1
+
+    # 响应体发送完毕（close）之前请求仍算进行中
+    assert middleware.drain(timeout=0.1) is False
+    closer = threading.Timer(0.1, body.close)
+    closer.start()
+    assert middleware.drain(timeout=5) is True
+    closer.join()
+
+    statuses, _ = _call(middleware)
+    assert statuses == ['503 Service Unavailable']
+    # Socket.IO长连接不受排空影响
+    statuses, _ = _call(middleware, '/socket.io/')
+    assert statuses == ['200 OK'] and middleware.in_flight == 0
+
+
+def test_detect_async_mode_honours_explicit_choice():
+    assert detect_async_mode('threading') == 'threading'
+    assert detect_async_mode('auto') in ('eventlet', 'gevent', 'threading')
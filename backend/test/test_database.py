@@ -0,0 +1,123 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import create_app, db
+from backend.app.config import Config
+from backend.app.database import _engine_options, read_only
+from backend.app.services import tag_service, todo_service, transfer_service
+from backend.app.services.cache_service import bump_user_version
+from backend.test.conftest import TestConfig
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """
+    配置一个只读副本；测试中副本与主库指向同一个SQLite文件，通过各自引擎上执行的语句判断路由
+    """
+    uri = f"sqlite:///{tmp_path / 'test.db'}"
+    config = type('ReplicaConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'SQLALCHEMY_REPLICA_URIS': [uri],
+        'RESPONSE_CACHE_ENABLED': False,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    # Flask-SQLAlchemy为每个bind登记一个（这里为空的）元数据，移除它以免影响后续测试的create_all
+    db.metadatas.pop('replica_0', None)
+
+
+def _create(user_id, title):
+    due_date = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+    return todo_service.create_todo(user_id, title, description='', due_date=due_date, tags=[])
+
+
+@contextmanager
+def _record(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_engine_options_follow_database_type():
+    options = Config.SQLALCHEMY_ENGINE_OPTIONS
+    assert {'pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping'} <= set(options)
+
+    memory = _engine_options('sqlite://', options, 5)
+    assert 'pool_size' not in memory and 'connect_args' not in memory
+    mysql = _engine_options('mysql+pymysql://u:p@db/app', options, 5)
+    assert mysql['pool_size'] == options['pool_size']
+    assert mysql['connect_args'] == {'connect_timeout': 5}
+
+
+def test_reads_go_to_replica(replica_app):
+    primary, replica = db.engines[None], db.engines['replica_0']
+    user_id = 1
+    # 副本上已有的数据，跳过读己之写窗口
+    _create(user_id, 'seed')
+    replica_app.extensions['db_recent_writes'].window = 0
+
+    with _record(primary) as on_primary, _record(replica) as on_replica:
+        todos = todo_service.get_todos(user_id)['todos']
+        tag_service.get_tags(user_id)
+        lines = list(transfer_service.export_user_data(user_id))
+    assert [todo['title'] for todo in todos] == ['seed']
+    assert len(lines) == 2
+    assert on_replica and not on_primary
+
+
+def test_writes_and_recent_writers_use_primary(replica_app):
+    primary, replica = db.engines[None], db.engines['replica_0']
+    user_id = 1
+
+    with _record(primary) as on_primary, _record(replica) as on_replica:
+        _create(user_id, 'fresh')
+        # 刚写入的用户读自己的数据走主库
+        assert [todo['title'] for todo in todo_service.get_todos(user_id)['todos']] == ['fresh']
+    assert on_primary and not on_replica
+
+    # 其他用户不受影响
+    with _record(replica) as on_replica:
+        todo_service.get_todos(2)
+    assert on_replica
+
+
+def test_write_window_expires(replica_app, monkeypatch):
+    recent_writes = replica_app.extensions['db_recent_writes']
+    bump_user_version(1)
+    assert recent_writes.is_recent(1)
+
+    now = recent_writes._writes[1] + recent_writes.window
+    monkeypatch.setattr('backend.app.database.time.monotonic', lambda: now)
+    assert not recent_writes.is_recent(1)
+
+
+def test_without_replicas_everything_uses_primary(app):
+    assert app.extensions['db_replicas'] == []
+    with _record(db.engines[None]) as on_primary:
+        todo_service.get_todos(1)
+    assert on_primary
+
+
+def test_nested_read_only_keeps_primary_choice(replica_app):
+    replica = db.engines['replica_0']
+    # 用户1刚写入，外层选择主库；内层为用户2的调用不应再改选副本
+    _create(1, 'seed')
+    outer = read_only(lambda user_id: todo_service.get_todos(2))
+
+    with _record(replica) as on_replica:
+        outer(1)
+    assert not on_replica
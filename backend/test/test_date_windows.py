@@ -0,0 +1,66 @@
+from datetime import date, datetime, timedelta, timezone
+
+from backend.app import db
+from backend.app.date_windows import day_window, days_window, local_date, local_today, week_window
+from backend.app.models.models import Todo, User
+from backend.app.services import todo_service
+
+
+def test_day_window_is_half_open_utc_range():
+    assert day_window(date(2026, 1, 15), 'Asia/Shanghai') == (datetime(2026, 1, 14, 16), datetime(2026, 1, 15, 16))
+    assert day_window(date(2026, 1, 15), 'UTC') == (datetime(2026, 1, 15), datetime(2026, 1, 16))
+    # 无效的时区名称按默认时区处理
+    assert day_window(date(2026, 1, 15), 'Not/AZone') == day_window(date(2026, 1, 15), 'Asia/Shanghai')
+
+
+def test_windows_follow_daylight_saving_changes():
+    # 纽约2026-03-08切换夏令时，这一天只有23小时
+    start, end = day_window(date(2026, 3, 8), 'America/New_York')
+    assert (start, end) == (datetime(2026, 3, 8, 5), datetime(2026, 3, 9, 4))
+    start, end = week_window(date(2026, 3, 11), 'America/New_York')
+    assert (start, end) == (datetime(2026, 3, 9, 4), datetime(2026, 3, 16, 4))
+    assert days_window(date(2026, 3, 7), 2, 'America/New_York') == (datetime(2026, 3, 7, 5), datetime(2026, 3, 9, 4))
+
+
+def test_local_dates():
+    now = datetime(2026, 1, 15, 20, tzinfo=timezone.utc)
+    assert local_today('Asia/Shanghai', now) == date(2026, 1, 16)
+    assert local_today('America/Los_Angeles', now) == date(2026, 1, 15)
+    assert local_date(datetime(2026, 1, 15, 20), 'Asia/Tokyo') == date(2026, 1, 16)
+
+
+def test_today_uses_user_timezone(client, auth_headers):
+    user = User.query.filter_by(username='tester').one()
+    now = datetime.utcnow()
+    # 以用户本地日期为准：一个在UTC+14的今天结束之前，一个在之后
+    tomorrow_start = day_window(local_today('Pacific/Kiritimati') + timedelta(days=1), 'Pacific/Kiritimati')[0]
+    db.session.add_all([
+        Todo(title='today', user_id=user.id, due_date=tomorrow_start - timedelta(minutes=1)),
+        Todo(title='tomorrow', user_id=user.id, due_date=tomorrow_start + timedelta(minutes=1)),
+    ])
+    db.session.commit()
+
+    response = client.patch('/api/user', json={'timezone': 'Pacific/Kiritimati'}, headers=auth_headers)
+    assert response.status_code == 200 and response.get_json()['timezone'] == 'Pacific/Kiritimati'
+    assert client.get('/api/user', headers=auth_headers).get_json()['timezone'] == 'Pacific/Kiritimati'
+
+    titles = [todo['title'] for todo in client.get('/api/todos/today', headers=auth_headers).get_json()['todos']]
+    assert 'today' in titles and 'tomorrow' not in titles
+    assert now < tomorrow_start
+
+    preview = client.get('/api/todos/preview', headers=auth_headers).get_json()
+    assert preview['stats']['today_tasks'] == 1
+    for day in preview['week_tasks']:
+        for todo in day['tasks']:
+            assert local_date(datetime.fromisoformat(todo['due_date']), 'Pacific/Kiritimati').isoformat() == day['date']
+
+    for day, todos in todo_service.get_week_todos(user.id).items():
+        for todo in todos:
+            assert local_date(todo['due_date'], 'Pacific/Kiritimati').isoformat() == day
+
+
+def test_invalid_timezone_is_rejected(client, auth_headers):
+    response = client.patch('/api/user', json={'timezone': 'Mars/Olympus'}, headers=auth_headers)
+    assert response.status_code == 400
+    response = client.post('/api/register', json={'username': 'zoned', 'password': 'Passw0rd', 'timezone': 'nope'})
+    assert response.status_code == 400
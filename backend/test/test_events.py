@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+from backend.app import socketio
+from backend.app.models.models import User
+from backend.app.services import event_service
+from backend.app.services.event_service import ChangeEventPublisher, tag_event, todo_event
+
+DUE = (datetime.utcnow() + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _received(socket_client):
+    return [message['args'][0] for message in socket_client.get_received() if message['name'] == 'changes']
+
+
+def test_mutations_are_pushed_to_user_room(app, client, auth_headers):
+    token = auth_headers['Authorization'].split()[1]
+    socket_client = socketio.test_client(app, auth={'token': token})
+    socket_client.get_received()
+
+    todo = client.post('/api/todos', json={
+        'title': 'live', 'description': '', 'due_date': DUE, 'tags': []
+    }, headers=auth_headers).get_json()
+    client.put(f"/api/todos/{todo['id']}/toggle", headers=auth_headers)
+    client.delete(f"/api/todos/{todo['id']}", headers=auth_headers)
+    tag = client.post('/api/tags', json={'name': 'home', 'color': '#00ff00'}, headers=auth_headers).get_json()
+
+    messages = _received(socket_client)
+    assert [[event['type'] for event in message['events']] for message in messages] == [
+        ['todo.created'], ['todo.updated'], ['todo.deleted'], ['tag.created']
+    ]
+    assert messages[1]['events'][0]['data']['completed'] is True
+    assert messages[2]['events'][0]['data'] == {'id': todo['id']}
+    assert messages[3]['events'][0]['data'] == tag
+    # 相邻消息的游标首尾相接
+    for previous, message in zip(messages, messages[1:]):
+        assert message['since'] == previous['cursor']
+    socket_client.disconnect()
+
+
+def test_events_are_coalesced_per_window(monkeypatch):
+    sent = []
+    monkeypatch.setattr(event_service.socketio, 'emit', lambda event, data, room: sent.append((event, data, room)))
+    publisher = ChangeEventPublisher(window=60)
+
+    publisher.publish(1, 5, [todo_event('created', {'id': 10, 'title': 'a'})])
+    publisher.publish(1, 6, [todo_event('updated', {'id': 10, 'title': 'b'})])
+    publisher.publish(1, 7, [todo_event('created', {'id': 11}), tag_event('updated', {'id': 3})])
+    publisher.publish(1, 8, [todo_event('deleted', {'id': 11})])
+    # 序号不连续时另起一条消息
+    publisher.publish(1, 10, [todo_event('updated', {'id': 10, 'title': 'c'})])
+    publisher.publish(2, 1, None)
+    assert sent == []
+
+    publisher.flush()
+    assert sent == [
+        ('changes', {'since': 4, 'cursor': 8, 'events': [
+            {'type': 'todo.created', 'data': {'id': 10, 'title': 'b'}},
+            {'type': 'tag.updated', 'data': {'id': 3}},
+        ]}, '1'),
+        ('changes', {'since': 9, 'cursor': 10, 'events': [
+            {'type': 'todo.updated', 'data': {'id': 10, 'title': 'c'}},
+        ]}, '1'),
+        ('changes', {'since': 0, 'cursor': 1, 'events': None}, '2'),
+    ]
+
+
+def test_socket_requires_token_and_joins_only_own_room(app, client, auth_headers):
+    assert not socketio.test_client(app).is_connected()
+    assert not socketio.test_client(app, auth={'token': 'not-a-token'}).is_connected()
+
+    client.post('/api/register', json={'username': 'other', 'password': 'Passw0rd'})
+    other = User.query.filter_by(username='other').one()
+    token = auth_headers['Authorization'].split()[1]
+    socket_client = socketio.test_client(app, auth={'token': token})
+    # 传入其他用户的ID也只会加入自己的房间
+    socket_client.emit('join_room', other.id)
+    socket_client.get_received()
+
+    socketio.emit('changes', {'since': 0, 'cursor': 1, 'events': None}, room=str(other.id))
+    assert _received(socket_client) == []
+    socket_client.disconnect()
@@ -0,0 +1,46 @@
+from backend.app import db
+from backend.app.models.models import User
+from backend.app.services.identity_service import UserIdentity, get_identity_cache, invalidate_identity
+
+
+def _user_queries(statements):
+    return [s for s in statements if 'user.username' in s]
+
+
+def test_authenticated_requests_skip_users_table(client, auth_headers, count_queries):
+    with count_queries() as statements:
+        assert client.get('/api/user', headers=auth_headers).get_json()['username'] == 'tester'
+        assert client.get('/api/todos', headers=auth_headers).status_code == 200
+        assert client.get('/api/tags', headers=auth_headers).status_code == 200
+    # 登录后第一次请求最多查询一次用户表，之后都命中缓存
+    assert len(_user_queries(statements)) <= 1
+
+    with count_queries() as statements:
+        client.get('/api/user', headers=auth_headers)
+        client.get('/api/todos/preview', headers=auth_headers)
+    assert _user_queries(statements) == []
+
+
+def test_invalidate_reloads_changed_user(app, client, auth_headers):
+    client.get('/api/user', headers=auth_headers)
+    user = User.query.filter_by(username='tester').one()
+    user.username = 'renamed'
+    db.session.commit()
+    assert client.get('/api/user', headers=auth_headers).get_json()['username'] == 'tester'
+
+    invalidate_identity(user.id)
+    assert client.get('/api/user', headers=auth_headers).get_json()['username'] == 'renamed'
+
+    # 用户被删除后令牌随之失效
+    invalidate_identity(user.id)
+    db.session.delete(user)
+    db.session.commit()
+    assert client.get('/api/user', headers=auth_headers).status_code == 401
+
+
+def test_cache_is_bounded(app):
+    cache = get_identity_cache()
+    cache.max_users = 2
+    for user_id in (1, 2, 3):
+        cache.set(UserIdentity(user_id, f'user{user_id}', 'UTC'))
+    assert cache.get(1) is None and cache.get(3) is not None
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.app import db
+from backend.app.models.models import Tag, Todo, User
+from backend.app.services import tag_service, todo_service
+
+# 服务查询应当命中的二级索引
+SERVICE_INDEXES = {
+    'ix_todo_user_id_completed_due_date',
+    'ix_todo_user_id_due_date',
+    'ix_todo_user_id_created_at',
+    'ix_todo_user_id_priority',
+    'ix_todo_user_id_title',
+    'ix_todo_user_id_revision',
+    'ix_todo_completed_created_at',
+    'ix_tag_user_id',
+    'ix_todo_tags_tag_id_todo_id',
+}
+
+
+@pytest.fixture
+def seeded(app):
+    user = User(username='indexed', password='x')
+    db.session.add(user)
+    db.session.flush()
+    tag = Tag(name='work', user_id=user.id)
+    db.session.add(tag)
+    now = datetime.utcnow()
+    for i in range(10):
+        todo = Todo(title=f'todo {i}', user_id=user.id, completed=i % 2 == 0, due_date=now + timedelta(hours=i - 5))
+        todo.tags.append(tag)
+        db.session.add(todo)
+    db.session.commit()
+    return user.id, tag.id
+
+
+def _capture(call):
+    """
+    执行服务函数并记录其发出的语句和参数
+    """
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def _query_plan(statement, parameters):
+    connection = db.session.connection().connection
+    rows = connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _assert_uses_indexes(call):
+    for statement, parameters in _capture(call):
+        if not statement.lstrip().upper().startswith(('SELECT', 'DELETE', 'UPDATE')):
+            continue
+        if 'WHERE' not in statement.upper():
+            continue
+        plan = _query_plan(statement, parameters)
+        # 不允许对业务表做全表扫描
+        for detail in plan:
+            assert detail.split(' ')[:2] != ['SCAN', 'todo'] or 'INDEX' in detail, (statement, plan)
+            assert detail not in ('SCAN todo_tags', 'SCAN tag'), (statement, plan)
+        # 按用户过滤的任务查询和清理查询必须命中某个复合索引
+        if ('todo.user_id = ?' in statement or 'todo.completed IS 1' in statement) and 'FROM todo' in statement:
+            assert any(name in detail for detail in plan for name in SERVICE_INDEXES), (statement, plan)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'completed': 'false'},
+    {'priority': 2},
+    {'sort_by': 'due_date'},
+    {'sort_by': 'priority', 'sort_order': 'desc'},
+    {'sort_by': 'created_at'},
+    {'sort_by': 'title'},
+    {'due_date': datetime.utcnow().strftime('%Y-%m-%d')},
+])
+def test_get_todos_uses_indexes(seeded, kwargs):
+    user_id, _ = seeded
+    _assert_uses_indexes(lambda: todo_service.get_todos(user_id, **kwargs))
+    _assert_uses_indexes(lambda: todo_service.get_todos(user_id, limit=3, **kwargs))
+
+
+def test_get_todos_by_tag_uses_indexes(seeded):
+    user_id, tag_id = seeded
+    _assert_uses_indexes(lambda: todo_service.get_todos(user_id, tag_id=tag_id))
+
+
+@pytest.mark.parametrize('name', [
+    'get_today_todos', 'get_week_todos', 'get_todos_preview', 'get_overdue_todos', 'get_upcoming_todos',
+])
+def test_todo_service_queries_use_indexes(seeded, name):
+    user_id, _ = seeded
+    _assert_uses_indexes(lambda: getattr(todo_service, name)(user_id))
+
+
+def test_purge_uses_index(seeded):
+    _assert_uses_indexes(lambda: todo_service.purge_completed_tasks(batch_size=2))
+
+
+@pytest.mark.parametrize('name', ['get_tag_todos', 'delete_tag'])
+def test_tag_service_queries_use_indexes(seeded, name):
+    user_id, tag_id = seeded
+    _assert_uses_indexes(lambda: tag_service.get_tags(user_id))
+    _assert_uses_indexes(lambda: getattr(tag_service, name)(user_id, tag_id))
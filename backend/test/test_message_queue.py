@@ -0,0 +1,98 @@
+import json
+import queue
+import time
+import uuid
+
+import pytest
+import socketio as python_socketio
+
+from backend.app import create_app, db, socketio
+from backend.app.message_queue import LocalManager, make_client_manager
+from backend.test.conftest import TestConfig
+
+
+@pytest.fixture
+def channel():
+    return f'test-{uuid.uuid4().hex}'
+
+
+@pytest.fixture
+def queued_app(tmp_path, channel):
+    config = type('QueuedConfig', (TestConfig,), {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'SOCKETIO_MESSAGE_QUEUE': 'local://',
+        'SOCKETIO_CHANNEL': channel,
+        'SOCKETIO_EMIT_FLUSH_INTERVAL': 0.01,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _other_worker(channel, flush_interval=0.01):
+    """
+    模拟另一个进程中的Socket.IO服务器（例如独立的提醒进程）
+    """
+    manager = make_client_manager('local://', channel=channel, flush_interval=flush_interval)
+    return python_socketio.Server(async_mode='threading', client_manager=manager)
+
+
+def _connect(server, room):
+    """
+    在服务器上登记一个加入room的客户端，返回发给它的数据包列表
+    """
+    sent = []
+    server._send_eio_packet = lambda eio_sid, packet: sent.append(packet)
+    if not server.manager_initialized:
+        server.manager_initialized = True
+        server.manager.initialize()
+    sid = server.manager.connect('eio-sid', '/')
+    server.manager.enter_room(sid, '/', room)
+    return sent
+
+
+def _wait_for(sent, count, timeout=2):
+    deadline = time.monotonic() + timeout
+    while len(sent) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    return [json.loads(packet.data[packet.data.index('['):]) for packet in sent]
+
+
+def test_emits_reach_clients_on_other_workers(queued_app, channel):
+    sent = _connect(socketio.server, '7')
+
+    other = _other_worker(channel)
+    for i in range(3):
+        other.emit('reminder', {'message': f'reminder {i}'}, room='7')
+    other.emit('reminder', {'message': 'someone else'}, room='8')
+
+    assert _wait_for(sent, 3) == [['reminder', {'message': f'reminder {i}'}] for i in range(3)]
+
+
+def test_emits_are_batched_per_flush(channel):
+    server = _other_worker(channel, flush_interval=60)
+    inbox = queue.Queue()
+    LocalManager._subscribers[channel].append(inbox)
+    try:
+        for i in range(5):
+            server.emit('todo', {'id': i}, room='1')
+        assert inbox.empty()
+
+        server.manager.flush()
+        batch = inbox.get_nowait()
+        assert batch['method'] == 'emit_batch'
+        assert [message['data'] for message in batch['messages']] == [[{'id': i}] for i in range(5)]
+
+        # 控制消息立即发布
+        server.close_room('1')
+        assert inbox.get_nowait()['method'] == 'close_room'
+    finally:
+        LocalManager._subscribers[channel].remove(inbox)
+
+
+def test_without_message_queue_emits_stay_local(app):
+    assert type(socketio.server.manager) is python_socketio.Manager
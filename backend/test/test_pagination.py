@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import db
+from backend.app.models.models import Tag, Todo, User
+from backend.app.services.todo_service import get_todos
+
+
+@pytest.fixture
+def user_id(app):
+    """
+    创建带有重复排序值、空截止日期和标签的任务，用于检验分页的稳定性
+    """
+    user = User(username='pager', password='x')
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(name=name, user_id=user.id) for name in ('b', 'a', 'c')]
+    db.session.add_all(tags)
+    base = datetime(2030, 1, 1)
+    for i in range(23):
+        todo = Todo(
+            title=f'task {i % 5}',
+            priority=i % 3 + 1,
+            user_id=user.id,
+            created_at=base + timedelta(hours=i % 4),
+            due_date=None if i % 6 == 0 else base + timedelta(days=i % 7),
+        )
+        todo.tags.extend(tags[:i % 3])
+        db.session.add(todo)
+    db.session.commit()
+    return user.id
+
+
+def _walk_pages(user_id, sort_by, sort_order, limit):
+    ids, cursor = [], None
+    while True:
+        page = get_todos(user_id, sort_by=sort_by, sort_order=sort_order, limit=limit, cursor=cursor)
+        ids.extend(todo['id'] for todo in page['todos'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('sort_by', [None, 'due_date', 'priority', 'created_at', 'title', 'tags'])
+@pytest.mark.parametrize('sort_order', ['asc', 'desc'])
+def test_pages_match_full_listing(user_id, sort_by, sort_order):
+    full = [todo['id'] for todo in get_todos(user_id, sort_by=sort_by, sort_order=sort_order)['todos']]
+    assert len(full) == 23
+    assert _walk_pages(user_id, sort_by, sort_order, 4) == full
+
+
+def test_cursor_must_match_sort(user_id):
+    cursor = get_todos(user_id, sort_by='title', limit=5)['next_cursor']
+    with pytest.raises(ValueError):
+        get_todos(user_id, sort_by='priority', limit=5, cursor=cursor)
+    with pytest.raises(ValueError):
+        get_todos(user_id, limit=5, cursor='not-a-cursor')
+
+
+def test_api_returns_next_cursor(client, auth_headers):
+    due_date = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+    for i in range(3):
+        client.post('/api/todos', json={'title': f'api {i}', 'description': '', 'due_date': due_date, 'tags': []},
+                    headers=auth_headers)
+    first = client.get('/api/todos?limit=2', headers=auth_headers).get_json()
+    assert len(first['todos']) == 2 and first['next_cursor']
+    second = client.get(f"/api/todos?limit=2&cursor={first['next_cursor']}", headers=auth_headers).get_json()
+    assert len(second['todos']) == 1 and second['next_cursor'] is None
+    assert client.get('/api/todos?limit=2&cursor=bad', headers=auth_headers).status_code == 400
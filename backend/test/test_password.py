@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from backend.app import db
+from backend.app.services.password_service import PasswordHasher, PasswordHasherBusy
+from backend.app.services.user_service import authenticate_user, create_user, get_user_by_username
+
+
+def test_login_rehashes_with_new_work_factor(app):
+    create_user('rehash', 'Passw0rd')
+    assert get_user_by_username('rehash').password.startswith('$2b$04$')
+
+    # 调高工作因子后，下一次成功登录会透明地重新计算哈希
+    app.extensions['password_hasher'].rounds = 5
+    assert authenticate_user('rehash', 'wrong') is None
+    assert get_user_by_username('rehash').password.startswith('$2b$04$')
+    assert authenticate_user('rehash', 'Passw0rd') is not None
+    db.session.expire_all()
+    assert get_user_by_username('rehash').password.startswith('$2b$05$')
+    assert authenticate_user('rehash', 'Passw0rd') is not None
+
+
+def test_pending_limit_rejects_excess_work():
+    hasher = PasswordHasher(rounds=4, executor='thread', workers=1, max_pending=1)
+    release = threading.Event()
+    blocker = hasher._executor.submit(release.wait)
+    try:
+        pending = threading.Thread(target=hasher.hash, args=('Passw0rd',))
+        pending.start()
+        while hasher._slots._value:
+            pass
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash('Passw0rd')
+    finally:
+        release.set()
+        pending.join()
+        blocker.result()
+        hasher.shutdown()
+
+
+def test_process_pool_hashes_are_verifiable():
+    hasher = PasswordHasher(rounds=4, executor='process', workers=1)
+    try:
+        pw_hash = hasher.hash('Passw0rd')
+        assert hasher.verify(pw_hash, 'Passw0rd') and not hasher.verify(pw_hash, 'nope')
+        assert not hasher.needs_rehash(pw_hash)
+    finally:
+        hasher.shutdown()
+
+
+def test_busy_or_slow_hasher_returns_503(app, client):
+    client.post('/api/register', json={'username': 'waiting', 'password': 'Passw0rd'})
+    hasher = app.extensions['password_hasher']
+    release = threading.Event()
+    hasher._executor.shutdown(wait=True)
+    hasher._executor = ThreadPoolExecutor(max_workers=1)
+    blocker = hasher._executor.submit(release.wait)
+    hasher.timeout = 0.01
+    try:
+        # 等待哈希计算超时
+        response = client.post('/api/login', json={'username': 'waiting', 'password': 'Passw0rd'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+        # 在途的计算数达到上限
+        hasher._slots = threading.BoundedSemaphore(1)
+        hasher._slots.acquire()
+        response = client.post('/api/register', json={'username': 'later', 'password': 'Passw0rd'})
+        assert response.status_code == 503 and response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        blocker.result()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from backend.app import db
+from backend.app.models.models import Tag, Todo, User
+from backend.app.services.maintenance_service import PurgeService
+from backend.app.services.user_service import authenticate_user, create_user
+
+
+def _seed(user_id, old_completed, recent_completed, old_pending):
+    tag = Tag(name='t', user_id=user_id)
+    db.session.add(tag)
+    old = datetime.utcnow() - timedelta(days=2)
+    for i in range(old_completed):
+        todo = Todo(title=f'old done {i}', user_id=user_id, completed=True, created_at=old)
+        todo.tags.append(tag)
+        db.session.add(todo)
+    for i in range(recent_completed):
+        db.session.add(Todo(title=f'recent done {i}', user_id=user_id, completed=True))
+    for i in range(old_pending):
+        db.session.add(Todo(title=f'old pending {i}', user_id=user_id, completed=False, created_at=old))
+    db.session.commit()
+
+
+def test_purge_runs_in_batches_across_users(app):
+    users = [User(username=f'u{i}', password='x') for i in range(2)]
+    db.session.add_all(users)
+    db.session.commit()
+    _seed(users[0].id, 3, 1, 1)
+    _seed(users[1].id, 2, 0, 1)
+
+    service = PurgeService(app, batch_size=2, pause=0)
+    assert service.purge_once() == 5
+    metrics = service.get_metrics()
+    assert metrics['runs'] == 1 and metrics['batches'] == 3 and metrics['rows_purged'] == 5
+
+    titles = sorted(title for (title,) in db.session.query(Todo.title))
+    assert titles == ['old pending 0', 'old pending 0', 'recent done 0']
+    assert db.session.execute(db.text('SELECT COUNT(*) FROM todo_tags')).scalar() == 0
+
+    assert service.purge_once() == 0
+    assert service.get_metrics()['runs'] == 2
+
+
+def test_login_does_not_purge(app):
+    user = create_user('keeper', 'Passw0rd')
+    _seed(user.id, 2, 0, 0)
+    assert authenticate_user('keeper', 'Passw0rd') is not None
+    assert Todo.query.filter_by(user_id=user.id).count() == 2
+
+
+def test_purge_skips_rows_changed_before_lock(app, monkeypatch):
+    from backend.app.services import todo_service
+
+    users = [User(username=f'u{i}', password='x') for i in range(2)]
+    db.session.add_all(users)
+    db.session.commit()
+    _seed(users[0].id, 2, 0, 0)
+    _seed(users[1].id, 1, 0, 0)
+    real_next_revision = todo_service.next_revision
+
+    def reopen_first_user(user_id):
+        # 模拟加锁前另一请求把第一个用户的已完成任务重新打开
+        if user_id == users[0].id:
+            Todo.query.filter_by(user_id=user_id).update({'completed': False})
+        return real_next_revision(user_id)
+
+    monkeypatch.setattr(todo_service, 'next_revision', reopen_first_user)
+    assert todo_service.purge_completed_tasks(batch_size=10) == 1
+    assert Todo.query.filter_by(user_id=users[0].id).count() == 2
+    assert Todo.query.filter_by(user_id=users[1].id).count() == 0
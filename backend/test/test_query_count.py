@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import db
+from backend.app.models.models import Tag, Todo, TodoStats, User
+from backend.app.services import tag_service, todo_service
+from backend.app.services.identity_service import load_identity
+
+
+@pytest.fixture
+def seeded_user(app):
+    """
+    创建一个带有多个标签和任务的用户
+    """
+    user = User(username='seeded', password='x')
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(name=f'tag{i}', user_id=user.id) for i in range(3)]
+    db.session.add_all(tags)
+    now = datetime.utcnow()
+    for i in range(40):
+        todo = Todo(title=f'todo {i}', user_id=user.id, priority=i % 3 + 1,
+                    due_date=now + timedelta(minutes=i - 20))
+        todo.tags.extend(tags[:i % 4])
+        db.session.add(todo)
+    db.session.add(TodoStats(user_id=user.id, total_tasks=40))
+    db.session.commit()
+    return user.id, tags[0].id
+
+
+def test_listing_query_count_is_constant(seeded_user, count_queries):
+    user_id, tag_id = seeded_user
+    db.session.expire_all()
+
+    listings = [
+        lambda: todo_service.get_todos(user_id),
+        lambda: todo_service.get_todos(user_id, sort_by='tags'),
+        lambda: todo_service.get_todos(user_id, tag_id=tag_id),
+        lambda: todo_service.get_overdue_todos(user_id),
+        lambda: todo_service.get_upcoming_todos(user_id, 60),
+        lambda: tag_service.get_tag_todos(user_id, tag_id),
+    ]
+    for listing in listings:
+        db.session.expire_all()
+        with count_queries() as statements:
+            result = listing()
+        assert result
+        # 一条主查询 + 一条标签批量查询（get_tag_todos 额外查询标签本身）
+        assert len(statements) <= 3, statements
+
+
+def test_preview_uses_two_round_trips(seeded_user, count_queries):
+    user_id, _ = seeded_user
+    # 请求中用户时区来自认证时已加载的身份缓存
+    load_identity(user_id)
+    db.session.expire_all()
+    with count_queries() as statements:
+        preview = todo_service.get_todos_preview(user_id)
+    assert len(statements) <= 2, statements
+
+    stats = preview['stats']
+    assert stats['total_tasks'] == 40
+    assert stats['completed_tasks'] + stats['pending_tasks'] == 40
+    # 每个任务都只出现在其北京时间到期日对应的那一天
+    listed = [task['id'] for day in preview['week_tasks'] for task in day['tasks']]
+    assert len(listed) == len(set(listed))
+    for day in preview['week_tasks']:
+        for task in day['tasks']:
+            due = task['due_date'] + timedelta(hours=8)
+            assert due.date().isoformat() == day['date']
+
+
+def test_tag_assignment_cost_is_fixed(app, count_queries):
+    user = User(username='tagger', password='x')
+    db.session.add(user)
+    db.session.flush()
+    tags = [Tag(name=f'tag{i}', user_id=user.id) for i in range(5)]
+    db.session.add_all(tags)
+    db.session.add(TodoStats(user_id=user.id))
+    db.session.commit()
+    tag_ids = [tag.id for tag in tags]
+    due_date = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+
+    def create(ids):
+        with count_queries() as statements:
+            created = todo_service.create_todo(user.id, 'tagged', '', False, due_date, 1, ids)
+        return created, len(statements)
+
+    (one, one_count), (five, five_count) = create(tag_ids[:1]), create(tag_ids)
+    assert one_count == five_count
+    assert [tag['id'] for tag in five['tags']] == tag_ids
+
+    def update(todo_id, ids):
+        with count_queries() as statements:
+            updated = todo_service.update_todo(user.id, todo_id, tags=ids)
+        return updated, statements
+
+    # 标签不变时不产生任何关联表的增删
+    _, statements = update(five['id'], tag_ids)
+    assert not any('todo_tags' in s and s.lstrip().upper().startswith(('INSERT', 'DELETE')) for s in statements)
+
+    # 替换部分标签时，删除和插入各一条语句
+    updated, statements = update(five['id'], tag_ids[2:] + [tag_ids[0]])
+    assert sorted(tag['id'] for tag in updated['tags']) == sorted(tag_ids[2:] + [tag_ids[0]])
+    writes = [s for s in statements if 'todo_tags' in s and s.lstrip().upper().startswith(('INSERT', 'DELETE'))]
+    assert len(writes) == 1
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from backend.app import db
+from backend.app.models.models import ReminderLease, ReminderWorker, Todo, User
+from backend.app.services import reminder_service as reminder_module
+from backend.app.services.lease_service import ShardLeases, shard_of
+from backend.app.services.reminder_service import ReminderService, refresh_next_reminder
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    messages = []
+    monkeypatch.setattr(reminder_module.socketio, 'emit',
+                        lambda event, data, room=None: messages.append((event, data, room)))
+    return messages
+
+
+def _expire(worker_id):
+    """
+    模拟工作进程崩溃：心跳和租约都已过期
+    """
+    past = datetime.utcnow() - timedelta(minutes=5)
+    db.session.execute(update(ReminderWorker).where(ReminderWorker.worker_id == worker_id).values(heartbeat_at=past))
+    db.session.execute(update(ReminderLease).where(ReminderLease.owner == worker_id).values(expires_at=past))
+    db.session.commit()
+
+
+def test_shards_rebalance_between_workers(app):
+    first = ShardLeases('first', shard_count=8)
+    second = ShardLeases('second', shard_count=8)
+
+    assert first.renew() == frozenset(range(8))
+    # 新进程加入时分片仍被持有，等第一个进程下次续期释放多出的一半后再接管
+    assert second.renew() == frozenset()
+    assert len(first.renew()) == 4
+    assert second.renew() == frozenset(range(8)) - first.owned_shards()
+
+    # 第一个进程崩溃，租约过期后由第二个进程接管全部分片
+    _expire('first')
+    assert second.renew() == frozenset(range(8))
+    assert db.session.get(ReminderWorker, 'first') is None
+
+    # 正常退出时立即释放
+    second.release()
+    third = ShardLeases('third', shard_count=8)
+    assert third.renew() == frozenset(range(8))
+
+
+def test_owned_shards_lapse_without_renewal(app, monkeypatch):
+    leases = ShardLeases('only', shard_count=4, ttl=30)
+    leases.renew()
+    assert leases.owned_shards() == frozenset(range(4))
+
+    lapsed = leases._valid_until
+    monkeypatch.setattr('backend.app.services.lease_service.time.monotonic', lambda: lapsed)
+    assert leases.owned_shards() == frozenset()
+
+
+def test_each_reminder_sent_by_one_worker(app, emitted):
+    due_date = datetime.utcnow() + timedelta(minutes=5, seconds=-10)
+    users = []
+    for i in range(4):
+        user = User(username=f'user{i}', password='x')
+        db.session.add(user)
+        db.session.flush()
+        todo = Todo(title=f'todo {i}', user_id=user.id, due_date=due_date)
+        refresh_next_reminder(todo)
+        db.session.add(todo)
+        users.append(user.id)
+    db.session.commit()
+
+    first = ReminderService(app, ShardLeases('first', shard_count=2))
+    second = ReminderService(app, ShardLeases('second', shard_count=2))
+    first._check_upcoming_tasks()
+    second._check_upcoming_tasks()
+    # 第一个进程最初持有全部分片；续期时释放一半给第二个进程
+    first.leases._renewed_at = second.leases._renewed_at = None
+    first._check_upcoming_tasks()
+    second._check_upcoming_tasks()
+    assert first.leases.owned_shards().isdisjoint(second.leases.owned_shards())
+    assert len(first.leases.owned_shards()) == len(second.leases.owned_shards()) == 1
+
+    # 每个用户恰好收到一次提醒
+    assert sorted(int(room) for _, _, room in emitted) == sorted(users)
+
+
+def test_worker_scans_only_owned_shards(app, emitted):
+    due_date = datetime.utcnow() + timedelta(minutes=5, seconds=-10)
+    for i in range(4):
+        user = User(username=f'user{i}', password='x')
+        db.session.add(user)
+        db.session.flush()
+        todo = Todo(title=f'todo {i}', user_id=user.id, due_date=due_date)
+        refresh_next_reminder(todo)
+        db.session.add(todo)
+    db.session.commit()
+
+    # 另一个进程持有分片0
+    other = ShardLeases('other', shard_count=2)
+    other.renew()
+    db.session.execute(update(ReminderLease).where(ReminderLease.shard == 1).values(owner=None))
+    db.session.commit()
+    other._owned = frozenset({0})
+
+    service = ReminderService(app, ShardLeases('mine', shard_count=2))
+    service._check_upcoming_tasks()
+    assert service.leases.owned_shards() == frozenset({1})
+    assert emitted and all(shard_of(int(room), 2) == 1 for _, _, room in emitted)
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import db
+from backend.app.models.models import Todo, User
+from backend.app.services import reminder_service as reminder_module
+from backend.app.services import todo_service
+from backend.app.services.reminder_service import ReminderService, refresh_next_reminder
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    """
+    记录通过WebSocket发送的提醒
+    """
+    messages = []
+    monkeypatch.setattr(reminder_module.socketio, 'emit',
+                        lambda event, data, room=None: messages.append((event, data, room)))
+    return messages
+
+
+@pytest.fixture
+def service(app, monkeypatch):
+    service = ReminderService(app)
+    monkeypatch.setattr(reminder_module, 'reminder_service', service)
+    return service
+
+
+def test_scheduler_fires_due_reminders_once(app, service, emitted):
+    user = User(username='reminded', password='x')
+    db.session.add(user)
+    db.session.flush()
+    now = datetime.utcnow()
+    due_soon = Todo(title='soon', user_id=user.id, due_date=now + timedelta(minutes=5, seconds=-10))
+    far_away = Todo(title='far', user_id=user.id, due_date=now + timedelta(days=3))
+    done = Todo(title='done', user_id=user.id, completed=True, due_date=now + timedelta(minutes=5, seconds=-10))
+    for todo in (due_soon, far_away, done):
+        refresh_next_reminder(todo)
+    db.session.add_all([due_soon, far_away, done])
+    db.session.commit()
+
+    service._check_upcoming_tasks()
+    assert len(emitted) == 1
+    event, data, room = emitted[0]
+    assert event == 'reminder' and room == str(user.id)
+    assert [(task['id'], task['reminder_time']) for task in data['tasks']] == [(due_soon.id, '5m')]
+    # 窗口外和已完成的任务不会进入内存
+    assert far_away.id not in service._scheduled and done.id not in service._scheduled
+
+    # 提醒状态写回数据库：5分钟提醒已发送，之后没有待发送的提醒
+    db.session.refresh(due_soon)
+    assert due_soon.reminder_mask == 4 and due_soon.next_reminder_at is None
+    assert db.session.get(Todo, far_away.id).next_reminder_at == far_away.due_date - timedelta(hours=1)
+
+    service._check_upcoming_tasks()
+    assert len(emitted) == 1
+
+
+def test_scheduler_follows_todo_changes(app, service, emitted):
+    user = User(username='editor', password='x')
+    db.session.add(user)
+    db.session.commit()
+    service._check_upcoming_tasks()
+
+    due_date = (datetime.utcnow() + timedelta(minutes=15, seconds=-5)).isoformat() + 'Z'
+    created = todo_service.create_todo(user.id, 'new', '', False, due_date, 1, [])
+    # 新任务的15分钟提醒已到期，5分钟提醒在堆中等待
+    service._check_upcoming_tasks()
+    assert [task['reminder_time'] for event, data, _ in emitted if event == 'reminder' for task in data['tasks']] == ['15m']
+    todo = db.session.get(Todo, created['id'])
+    assert service._scheduled[todo.id] == todo.due_date - timedelta(minutes=5)
+
+    todo_service.delete_todo(user.id, created['id'])
+    assert created['id'] not in service._scheduled
+
+
+def test_scheduler_skips_reminders_claimed_elsewhere(app, service, emitted, monkeypatch):
+    user = User(username='raced', password='x')
+    db.session.add(user)
+    db.session.flush()
+    due_date = datetime.utcnow() + timedelta(minutes=5, seconds=-10)
+    todos = [Todo(title=f'due {i}', user_id=user.id, due_date=due_date) for i in range(2)]
+    for todo in todos:
+        refresh_next_reminder(todo)
+    db.session.add_all(todos)
+    db.session.commit()
+    claim = service._claim_reminders
+
+    def claimed_elsewhere(updates):
+        # 读取之后、更新之前，另一个进程已发送第一个任务的提醒
+        with db.engine.begin() as connection:
+            connection.execute(Todo.__table__.update().where(Todo.id == todos[0].id).values(
+                reminder_mask=4, next_reminder_at=None
+            ))
+        return claim(updates)
+
+    monkeypatch.setattr(service, '_claim_reminders', claimed_elsewhere)
+    service._check_upcoming_tasks()
+    assert [task['id'] for _, data, _ in emitted for task in data['tasks']] == [todos[1].id]
+    assert todos[0].id not in service._scheduled
+    assert db.session.get(Todo, todos[1].id).reminder_mask == 4
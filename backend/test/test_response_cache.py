@@ -0,0 +1,65 @@
+import time
+
+from backend.app.services.cache_service import ResponseCache
+
+
+def test_cached_reads_are_invalidated_by_writes(client, auth_headers):
+    first = client.get('/api/tags', headers=auth_headers)
+    second = client.get('/api/tags', headers=auth_headers)
+    assert first.headers['X-Cache'] == 'MISS' and second.headers['X-Cache'] == 'HIT'
+    assert first.get_data() == second.get_data()
+
+    client.post('/api/tags', json={'name': 'work', 'color': '#FF0000'}, headers=auth_headers)
+    third = client.get('/api/tags', headers=auth_headers)
+    assert third.headers['X-Cache'] == 'MISS'
+    assert [tag['name'] for tag in third.get_json()['tags']] == ['work']
+
+
+def test_query_params_are_normalized(client, auth_headers):
+    client.get('/api/todos?sort_by=title&sort_order=desc', headers=auth_headers)
+    response = client.get('/api/todos?sort_order=desc&sort_by=title', headers=auth_headers)
+    assert response.headers['X-Cache'] == 'HIT'
+    response = client.get('/api/todos?sort_order=asc&sort_by=title', headers=auth_headers)
+    assert response.headers['X-Cache'] == 'MISS'
+
+
+def test_errors_are_not_cached(client, auth_headers):
+    client.get('/api/todos?limit=2&cursor=bad', headers=auth_headers)
+    response = client.get('/api/todos?limit=2&cursor=bad', headers=auth_headers)
+    assert response.status_code == 400 and response.headers.get('X-Cache') != 'HIT'
+
+
+def test_lru_eviction_respects_memory_cap():
+    cache = ResponseCache(max_bytes=800, ttl=60)
+    for i in range(10):
+        cache.set(i, b'x' * 100)
+    cache.get(2)
+    cache.set(10, b'x' * 100)
+    assert cache._size <= 800
+    assert cache.get(2) is not None
+    assert cache.get(0) is None and cache.get(3) is None
+
+
+def test_entries_expire_after_ttl():
+    cache = ResponseCache(ttl=0.01)
+    cache.set('key', b'body')
+    time.sleep(0.02)
+    assert cache.get('key') is None
+
+
+def test_writes_from_other_processes_invalidate_entries(client, auth_headers):
+    from backend.app import db
+    from backend.app.models.models import Tag, User
+    from backend.app.services.change_service import next_revision
+
+    client.get('/api/tags', headers=auth_headers)
+    assert client.get('/api/tags', headers=auth_headers).headers['X-Cache'] == 'HIT'
+
+    # 另一个进程提交的写入：只推进数据库中的change_seq，不经过本进程的缓存
+    with client.application.app_context():
+        user = User.query.one()
+        db.session.add(Tag(name='remote', user_id=user.id, revision=next_revision(user.id)))
+        db.session.commit()
+    response = client.get('/api/tags', headers=auth_headers)
+    assert response.headers['X-Cache'] == 'MISS'
+    assert [tag['name'] for tag in response.get_json()['tags']] == ['remote']
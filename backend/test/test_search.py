@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import current_app
+
+from backend.app import db
+from backend.app.models.models import Todo, User
+from backend.app.services import todo_service
+from backend.app.services.search_service import LikeSearchBackend, NgramSearchBackend
+
+TEXTS = [
+    ('准备季度报告', '整理销售数据并撰写报告'),
+    ('买牛奶', '下班路上去超市'),
+    ('Quarterly report review', 'Check the REPORT numbers'),
+    ('报告', None),
+    ('写代码', '完成搜索功能的开发'),
+    ('Team meeting', '讨论季度目标'),
+]
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(username='searcher', password='x')
+    db.session.add(user)
+    db.session.flush()
+    for title, description in TEXTS:
+        db.session.add(Todo(title=title, description=description, user_id=user.id))
+    db.session.commit()
+    return user.id
+
+
+def _ids(user_id, term, backend):
+    app_backend = NgramSearchBackend() if backend == 'ngram' else LikeSearchBackend()
+    current_app.extensions['search_backend'] = app_backend
+    return [todo['id'] for todo in todo_service.get_todos(user_id, search=term)['todos']]
+
+
+@pytest.mark.parametrize('term', ['报告', '季度', '报', 'report', 'REPORT', '牛奶超市', '代码', 'x', 'meeting 讨论'])
+def test_ngram_results_match_like(user_id, term):
+    assert sorted(_ids(user_id, term, 'ngram')) == sorted(_ids(user_id, term, 'like'))
+
+
+def test_ngram_ranks_title_matches_first(user_id):
+    titles = {todo.id: todo.title for todo in Todo.query.all()}
+    ranked = [titles[todo_id] for todo_id in _ids(user_id, '报告', 'ngram')]
+    # 标题以搜索词开头的任务最相关
+    assert ranked == ['报告', '准备季度报告']
+
+
+def test_ngram_index_follows_writes(user_id):
+    backend = NgramSearchBackend()
+    current_app.extensions['search_backend'] = backend
+    assert todo_service.get_todos(user_id, search='周报')['todos'] == []
+
+    due_date = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+    created = todo_service.create_todo(user_id, '写周报', '', False, due_date, 1, [])
+    assert [todo['id'] for todo in todo_service.get_todos(user_id, search='周报')['todos']] == [created['id']]
+
+    todo_service.update_todo(user_id, created['id'], title='写月报')
+    assert todo_service.get_todos(user_id, search='周报')['todos'] == []
+    assert len(todo_service.get_todos(user_id, search='月报')['todos']) == 1
+
+    todo_service.delete_todo(user_id, created['id'])
+    assert todo_service.get_todos(user_id, search='月报')['todos'] == []
+
+
+def test_relevance_order_paginates(user_id):
+    current_app.extensions['search_backend'] = NgramSearchBackend()
+    full = [todo['id'] for todo in todo_service.get_todos(user_id, search='报')['todos']]
+    page = todo_service.get_todos(user_id, search='报', limit=1)
+    ids = [todo['id'] for todo in page['todos']]
+    while page['next_cursor']:
+        page = todo_service.get_todos(user_id, search='报', limit=1, cursor=page['next_cursor'])
+        ids.extend(todo['id'] for todo in page['todos'])
+    assert ids == full
+
+
+def test_ngram_index_catches_up_with_other_processes(user_id):
+    backend = NgramSearchBackend()
+    current_app.extensions['search_backend'] = backend
+    renamed = Todo.query.filter_by(title='买牛奶').one().id
+    assert [todo['id'] for todo in todo_service.get_todos(user_id, search='牛奶')['todos']] == [renamed]
+
+    # 另一个进程的写入不会同步到本进程的索引
+    current_app.extensions['search_backend'] = LikeSearchBackend()
+    due_date = (datetime.utcnow() + timedelta(days=1)).isoformat() + 'Z'
+    created = todo_service.create_todo(user_id, '买酸奶', '', False, due_date, 1, [])
+    todo_service.update_todo(user_id, renamed, title='买面包', description='')
+    deleted = Todo.query.filter_by(title='写代码').one().id
+    todo_service.delete_todo(user_id, deleted)
+
+    current_app.extensions['search_backend'] = backend
+    assert [todo['id'] for todo in todo_service.get_todos(user_id, search='奶')['todos']] == [created['id']]
+    assert todo_service.get_todos(user_id, search='牛奶')['todos'] == []
+    assert todo_service.get_todos(user_id, search='代码')['todos'] == []
+
+
+def test_like_fallback_keeps_cursor_valid(user_id):
+    current_app.extensions['search_backend'] = NgramSearchBackend()
+    page = todo_service.get_todos(user_id, search='报', limit=1)
+    # 候选过多回退为ILIKE扫描后，排序键不变，之前的游标仍然可用
+    current_app.extensions['search_backend'] = NgramSearchBackend(max_candidates=1)
+    rest = todo_service.get_todos(user_id, search='报', cursor=page['next_cursor'])
+    current_app.extensions['search_backend'] = LikeSearchBackend()
+    full = todo_service.get_todos(user_id, search='报')
+    assert [todo['id'] for todo in page['todos'] + rest['todos']] == [todo['id'] for todo in full['todos']]
+
+
+def test_ngram_indexes_are_bounded_by_memory(user_id):
+    expected = sorted(_ids(user_id, '报告', 'like'))
+    backend = NgramSearchBackend(max_bytes=1)
+    current_app.extensions['search_backend'] = backend
+    # 单个用户的索引超过上限时不缓存，直接使用ILIKE扫描
+    assert sorted(todo['id'] for todo in todo_service.get_todos(user_id, search='报告')['todos']) == expected
+    assert backend._indexes == {user_id: None} and backend._size == 0
+
+    backend = NgramSearchBackend()
+    current_app.extensions['search_backend'] = backend
+    todo_service.get_todos(user_id, search='报告')
+    size = backend._size
+    assert size == backend._indexes[user_id].size > 0
+    todo_service.delete_todo(user_id, Todo.query.filter_by(title='报告').one().id)
+    assert 0 < backend._size < size
+
+
+@pytest.mark.parametrize('backend', ['like', 'ngram'])
+def test_wildcards_match_literally(user_id, backend):
+    for title in ('完成100%', '1000个', 'a_b', 'axb', 'c:\\temp', 'c:temp'):
+        db.session.add(Todo(title=title, user_id=user_id))
+    db.session.commit()
+    titles = {todo.id: todo.title for todo in Todo.query.all()}
+    for term, expected in (('100%', ['完成100%']), ('a_b', ['a_b']), ('c:\\', ['c:\\temp']), ('%', ['完成100%'])):
+        assert [titles[todo_id] for todo_id in _ids(user_id, term, backend)] == expected
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import create_app, db
+from backend.app.json_provider import OrjsonProvider, TodoJSONProvider, orjson
+from backend.test.conftest import TestConfig
+
+DUE_DATE = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+
+
+@pytest.fixture(params=['json', 'orjson'])
+def provider_client(request, tmp_path):
+    if request.param == 'orjson' and orjson is None:
+        pytest.skip('orjson is not installed')
+
+    class ProviderConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "provider.db"}'
+        JSON_PROVIDER = request.param
+
+    app = create_app(ProviderConfig)
+    with app.app_context():
+        db.create_all()
+        yield app, app.test_client()
+        db.session.remove()
+
+
+def test_providers_encode_datetimes_as_iso_8601(provider_client):
+    app, client = provider_client
+    assert isinstance(app.json, OrjsonProvider if app.config['JSON_PROVIDER'] == 'orjson' else TodoJSONProvider)
+    client.post('/api/register', json={'username': 'tester', 'password': 'Passw0rd'})
+    token = client.post('/api/login', json={'username': 'tester', 'password': 'Passw0rd'}).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    tag = client.post('/api/tags', json={'name': 'work', 'color': '#FF0000'}, headers=headers).get_json()
+    created = client.post('/api/todos', json={'title': 'a', 'description': '', 'due_date': DUE_DATE.isoformat() + 'Z',
+                                              'tags': [tag['id']]}, headers=headers).get_json()
+    assert created['due_date'] == DUE_DATE.isoformat()
+    datetime.fromisoformat(created['created_at'])
+
+    # 预览接口与其他接口使用同一份字段布局
+    preview = client.get('/api/todos/preview', headers=headers).get_json()
+    listed = next(task for day in preview['week_tasks'] for task in day['tasks'])
+    assert listed == created
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from backend.app import db
+from backend.app.models.models import Todo, TodoStats, User
+from backend.app.services import todo_service
+from backend.app.services.identity_service import load_identity
+from backend.app.services.stats_service import get_todo_stats, rebuild_todo_stats
+
+DUE = (datetime.utcnow() + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _actual(user_id):
+    todos = Todo.query.filter_by(user_id=user_id).all()
+    return len(todos), sum(todo.completed for todo in todos)
+
+
+def test_counters_follow_every_write_path(client, auth_headers):
+    user = User.query.filter_by(username='tester').one()
+    assert get_todo_stats(user.id) == (0, 0)
+
+    ids = [client.post('/api/todos', json={
+        'title': f'todo {i}', 'description': '', 'due_date': DUE, 'tags': [], 'completed': i == 0
+    }, headers=auth_headers).get_json()['id'] for i in range(4)]
+    assert get_todo_stats(user.id) == _actual(user.id) == (4, 1)
+
+    client.put(f'/api/todos/{ids[1]}/toggle', headers=auth_headers)
+    client.put(f'/api/todos/{ids[2]}', json={'completed': True}, headers=auth_headers)
+    client.put(f'/api/todos/{ids[0]}', json={'title': 'renamed'}, headers=auth_headers)
+    assert get_todo_stats(user.id) == _actual(user.id) == (4, 3)
+
+    client.delete(f'/api/todos/{ids[2]}', headers=auth_headers)
+    client.post('/api/todos/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': 'batch', 'description': '', 'due_date': DUE, 'tags': [], 'completed': True}},
+        {'op': 'toggle', 'id': ids[0]},
+        {'op': 'delete', 'id': ids[1]},
+    ]}, headers=auth_headers)
+    assert get_todo_stats(user.id) == _actual(user.id) == (3, 1)
+
+    # 清理24小时前完成的任务
+    Todo.query.filter_by(user_id=user.id, completed=True).update({'created_at': datetime.utcnow() - timedelta(days=2)})
+    db.session.commit()
+    assert todo_service.purge_completed_tasks() == 1
+    assert get_todo_stats(user.id) == _actual(user.id) == (2, 0)
+
+
+def test_preview_reads_stats_by_primary_key(client, auth_headers, count_queries):
+    user_id = User.query.filter_by(username='tester').one().id
+    client.post('/api/todos', json={'title': 'today', 'description': '', 'due_date': DUE, 'tags': []}, headers=auth_headers)
+    load_identity(user_id)
+    db.session.expire_all()
+
+    with count_queries() as statements:
+        stats = todo_service.get_todos_preview(user_id)['stats']
+    assert len(statements) == 2
+    assert 'FROM todo_stats' in statements[0] and 'todo_stats.user_id = ?' in statements[0]
+    assert (stats['total_tasks'], stats['completed_tasks'], stats['pending_tasks']) == (1, 0, 1)
+
+
+def test_reconcile_rebuilds_counters(app, auth_headers):
+    user = User.query.filter_by(username='tester').one()
+    db.session.add_all([Todo(title='direct', user_id=user.id, completed=True), Todo(title='other', user_id=user.id)])
+    TodoStats.query.filter_by(user_id=user.id).update({'total_tasks': 99})
+    db.session.commit()
+    assert get_todo_stats(user.id) == (99, 0)
+
+    assert rebuild_todo_stats() == User.query.count()
+    assert get_todo_stats(user.id) == (2, 1)
+
+
+def test_deletes_rebuild_missing_counters_after_removing_rows(client, auth_headers):
+    user_id = User.query.filter_by(username='tester').one().id
+    ids = [client.post('/api/todos', json={
+        'title': f'todo {i}', 'description': '', 'due_date': DUE, 'tags': [], 'completed': True
+    }, headers=auth_headers).get_json()['id'] for i in range(3)]
+
+    # 计数行缺失时按删除之后的数据重新统计
+    TodoStats.query.filter_by(user_id=user_id).delete()
+    db.session.commit()
+    client.delete(f'/api/todos/{ids[0]}', headers=auth_headers)
+    assert get_todo_stats(user_id) == _actual(user_id) == (2, 2)
+
+    TodoStats.query.filter_by(user_id=user_id).delete()
+    Todo.query.filter(Todo.id == ids[1]).update({'created_at': datetime.utcnow() - timedelta(days=2)})
+    db.session.commit()
+    assert todo_service.purge_completed_tasks() == 1
+    assert get_todo_stats(user_id) == _actual(user_id) == (1, 1)
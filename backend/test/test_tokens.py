@@ -0,0 +1,78 @@
+from unittest import mock
+
+from backend.app.models.models import RefreshTokenFamily, RevokedToken
+from backend.app.services import user_service
+from backend.app.services.token_service import TokenBlocklist
+
+
+def _login(client):
+    client.post('/api/register', json={'username': 'rotator', 'password': 'Passw0rd'})
+    response = client.post('/api/login', json={'username': 'rotator', 'password': 'Passw0rd'})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def _bearer(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_refresh_rotates_without_password_check(client):
+    tokens = _login(client)
+    assert tokens['refresh_token'] and tokens['access_token']
+
+    with mock.patch.object(user_service, 'verify_password') as verify:
+        response = client.post('/api/token/refresh', headers=_bearer(tokens['refresh_token']))
+    assert response.status_code == 200
+    verify.assert_not_called()
+    rotated = response.get_json()
+    assert rotated['user_id'] == tokens['user_id']
+    assert client.get('/api/user', headers=_bearer(rotated['access_token'])).status_code == 200
+
+    # 旧的刷新令牌只能使用一次
+    assert client.post('/api/token/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+    assert client.post('/api/token/refresh', headers=_bearer(rotated['refresh_token'])).status_code == 200
+    # 访问令牌不能用来续期
+    assert client.post('/api/token/refresh', headers=_bearer(rotated['access_token'])).status_code == 422
+
+
+def test_logout_revokes_tokens(client):
+    tokens = _login(client)
+    response = client.post('/api/logout', json={'refresh_token': tokens['refresh_token']},
+                           headers=_bearer(tokens['access_token']))
+    assert response.status_code == 200
+    assert client.get('/api/user', headers=_bearer(tokens['access_token'])).status_code == 401
+    assert client.post('/api/token/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+
+
+def test_blocklist_is_persisted_and_reloaded(app, client):
+    tokens = _login(client)
+    client.post('/api/logout', headers=_bearer(tokens['access_token']))
+    blocklist = app.extensions['token_blocklist']
+    assert RevokedToken.query.count() == 0
+
+    blocklist.flush()
+    assert RevokedToken.query.one().token_type == 'access'
+
+    # 模拟进程重启：新的吊销列表从数据库加载
+    blocklist.__init__(flush_interval=0)
+    assert client.get('/api/user', headers=_bearer(tokens['access_token'])).status_code == 401
+    assert client.get('/api/user', headers=_bearer(_login(client)['access_token'])).status_code == 200
+
+
+def test_rotation_is_shared_across_workers_without_blocklist_entries(app, client):
+    tokens = _login(client)
+    rotated = client.post('/api/token/refresh', headers=_bearer(tokens['refresh_token'])).get_json()
+    # 轮换只推进数据库中令牌链的代数，不向吊销列表写入jti
+    assert app.extensions['token_blocklist']._revoked == {}
+    assert RefreshTokenFamily.query.one().generation == 1
+
+    # 另一个进程的吊销列表不知道任何吊销，旧令牌仍然立即失效
+    app.extensions['token_blocklist'] = TokenBlocklist(flush_interval=0)
+    assert client.post('/api/token/refresh', headers=_bearer(tokens['refresh_token'])).status_code == 401
+    rotated = client.post('/api/token/refresh', headers=_bearer(rotated['refresh_token'])).get_json()
+
+    client.post('/api/logout', json={'refresh_token': rotated['refresh_token']},
+                headers=_bearer(rotated['access_token']))
+    assert RefreshTokenFamily.query.one().revoked_at is not None
+    assert client.post('/api/token/refresh', headers=_bearer(rotated['refresh_token'])).status_code == 401
+
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+
+from backend.app.models.models import Tag, Todo
+from backend.app.services import transfer_service
+
+DUE_DATE = (datetime.utcnow() + timedelta(days=2)).isoformat() + 'Z'
+
+
+def _ndjson(records):
+    return '\n'.join(json.dumps(record, ensure_ascii=False) for record in records) + '\n'
+
+
+def _login(client, username):
+    client.post('/api/register', json={'username': username, 'password': 'Passw0rd'})
+    token = client.post('/api/login', json={'username': username, 'password': 'Passw0rd'}).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_export_import_round_trip(client, auth_headers):
+    tag = client.post('/api/tags', json={'name': '工作', 'color': '#FF0000'}, headers=auth_headers).get_json()
+    client.post('/api/todos', json={'title': '写报告', 'description': '', 'due_date': DUE_DATE, 'tags': [tag['id']]},
+                headers=auth_headers)
+    client.post('/api/todos', json={'title': 'plain', 'description': 'x', 'due_date': DUE_DATE, 'tags': []},
+                headers=auth_headers)
+
+    response = client.get('/api/export', headers=auth_headers)
+    assert response.status_code == 200 and response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [record['type'] for record in records] == ['meta', 'tag', 'todo', 'todo']
+    assert records[2]['title'] == '写报告' and records[2]['tags'] == ['工作']
+
+    other = _login(client, 'importer')
+    response = client.post('/api/import', data=response.get_data(), headers=other)
+    assert response.get_json() == {'imported_tags': 1, 'imported_todos': 2}
+    todos = client.get('/api/todos', headers=other).get_json()['todos']
+    assert sorted(todo['title'] for todo in todos) == ['plain', '写报告']
+    imported = next(todo for todo in todos if todo['title'] == '写报告')
+    assert [(t['name'], t['color']) for t in imported['tags']] == [('工作', '#FF0000')]
+
+
+def test_import_batches_and_maps_tags_by_name(app, client, auth_headers, count_queries, monkeypatch):
+    existing = client.post('/api/tags', json={'name': 'home', 'color': '#00FF00'}, headers=auth_headers).get_json()
+    monkeypatch.setattr(transfer_service, 'IMPORT_BATCH_SIZE', 10)
+    records = [{'type': 'todo', 'title': f'old {i}', 'due_date': '2020-01-01T00:00:00', 'completed': True,
+                'tags': ['home', 'new'] if i % 2 else []} for i in range(25)]
+
+    with count_queries() as statements:
+        response = client.post('/api/import', data=_ndjson(records), headers=auth_headers)
+    assert response.get_json() == {'imported_tags': 1, 'imported_todos': 25}
+    # 25个任务分3批，每批的任务和标签关联各用一条语句插入，按变更序号查询一次ID，提交后只重新读取一次任务
+    assert len([s for s in statements if s.startswith('INSERT INTO todo_tags')]) == 3
+    assert len([s for s in statements if s.startswith('INSERT INTO todo ')]) == 3
+    assert len([s for s in statements if s.startswith('SELECT todo.id \nFROM')]) == 3
+    assert len([s for s in statements if s.startswith('SELECT todo.id AS')]) == 3
+    assert len([s for s in statements if s.startswith('SELECT tag.')]) == 2
+    assert Tag.query.filter_by(name='home').count() == 1
+    home = Tag.query.filter_by(name='home').one()
+    assert home.id == existing['id'] and home.todos.count() == 12
+    assert Todo.query.filter_by(title='old 3').one().due_date == datetime(2020, 1, 1)
+
+
+def test_invalid_line_rejects_its_batch(client, auth_headers):
+    records = [{'type': 'todo', 'title': 'ok'}, {'type': 'todo', 'title': ''}]
+    response = client.post('/api/import', data=_ndjson(records), headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith('Line 2:')
+    assert Todo.query.count() == 0
+
+    response = client.post('/api/import', data='not json\n', headers=auth_headers)
+    assert response.status_code == 400
+
+    # 版本号不是整数时返回400而不是500
+    response = client.post('/api/import', data=_ndjson([{'type': 'meta', 'version': '2'}]), headers=auth_headers)
+    assert response.status_code == 400
+    assert response.get_json()['message'].startswith('Line 1: version must be an integer')
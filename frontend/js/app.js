@@ -11,6 +11,7 @@ let editSelectedTags = [];
 let currentEditingTodo = null;
 let currentView = 'add-task';
 let currentTagId = null;
+let changesCursor = null; // 增量同步游标，为null时需要全量加载
 
 // 消息提醒相关变量
 let reminderMessages = []; // 存储所有提醒消息
@@ -27,6 +28,67 @@ function showMessage(message, type) {
     }, 3000);
 }
 
+// 刷新令牌的请求，多个请求同时遇到401时共用同一次刷新
+let refreshPromise = null;
+
+// 清除本标签页保存的登录状态
+function clearSession() {
+    sessionStorage.removeItem('access_token');
+    sessionStorage.removeItem('refresh_token');
+    sessionStorage.removeItem('user_id');
+}
+
+// 用刷新令牌换一对新令牌（旧的刷新令牌随即作废），成功时返回true
+function refreshTokens() {
+    if (!refreshPromise) {
+        refreshPromise = (async () => {
+            const refreshToken = sessionStorage.getItem('refresh_token');
+            if (!refreshToken) return false;
+            try {
+                const response = await fetch(`${API_BASE_URL}/token/refresh`, {
+                    method: 'POST',
+                    headers: {
+                        'Authorization': `Bearer ${refreshToken}`
+                    }
+                });
+                if (!response.ok) return false;
+                const data = await response.json();
+                sessionStorage.setItem('access_token', data.access_token);
+                sessionStorage.setItem('refresh_token', data.refresh_token);
+                return true;
+            } catch (error) {
+                console.error('刷新令牌失败:', error);
+                return false;
+            }
+        })().finally(() => {
+            refreshPromise = null;
+        });
+    }
+    return refreshPromise;
+}
+
+// 携带当前访问令牌发送请求；返回401时刷新一次令牌并重发，仍为401时回到登录页
+async function authFetch(url, options = {}) {
+    const send = () => fetch(url, {
+        ...options,
+        headers: {
+            ...options.headers,
+            'Authorization': `Bearer ${sessionStorage.getItem('access_token')}`
+        }
+    });
+    let response = await send();
+    if (response.status === 401) {
+        if (await refreshTokens()) {
+            response = await send();
+        }
+        if (response.status === 401) {
+            clearSession();
+            window.location.href = 'index.html';
+        }
+    }
+    return response;
+}
+
 // 页面加载完成后执行
 document.addEventListener('DOMContentLoaded', async function() {
     await checkAuth();
@@ -69,7 +131,7 @@ function setupMessagePanelEventListeners() {
     }
 
     try {
-        const response = await fetch(`${API_BASE_URL}/user`, {
+        const response = await authFetch(`${API_BASE_URL}/user`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -94,40 +156,73 @@ function setupMessagePanelEventListeners() {
         } else {
             console.log(`Token验证失败，响应状态码: ${response.status}`);
 
-            sessionStorage.removeItem('access_token');
+            clearSession();
 
             window.location.href = 'index.html';
         }
     } catch (error) {
         console.error('认证检查过程中发生异常:', error);
-        sessionStorage.removeItem('access_token');
+        clearSession();
 
         window.location.href = 'index.html';
     }
 }
 
-// 加载所有任务
+// 加载所有任务：已有游标时只拉取变化的任务和标签，游标失效时服务端返回全部任务和标签
 async function loadTodos() {
     const token = sessionStorage.getItem('access_token');
     try {
-        const response = await fetch(`${API_BASE_URL}/todos`, {
+        const query = changesCursor === null ? '' : `?since=${changesCursor}`;
+        const response = await authFetch(`${API_BASE_URL}/todos/changes${query}`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
         });
-
-        if (response.ok) {
-            const data = await response.json();
-            allTodos = data.todos;
-            await updateViews();
-        } else {
+        if (!response.ok) {
             console.error('加载任务失败');
+            return;
+        }
+        const changes = await response.json();
+        if (!changes.reset) {
+            applyChanges(changes);
+            await updateViews();
+            return;
         }
+
+        // 全量数据与游标来自服务端的同一次读取，直接替换本地数据
+        allTodos = changes.todos;
+        allTags = changes.tags;
+        changesCursor = changes.cursor;
+        renderTagList();
+        renderTagSelector();
+        renderFilterTags();
+        await updateViews();
     } catch (error) {
         console.error('加载任务时出错:', error);
     }
 }
 
+// 把增量同步结果合并到本地的任务和标签列表
+function applyChanges(changes) {
+    const deletedTodos = new Set(changes.deleted.todos);
+    const changedTodos = new Map(changes.todos.map(todo => [todo.id, todo]));
+    allTodos = allTodos
+        .filter(todo => !deletedTodos.has(todo.id) && !changedTodos.has(todo.id))
+        .concat(changes.todos);
+
+    const deletedTags = new Set(changes.deleted.tags);
+    const changedTags = new Map(changes.tags.map(tag => [tag.id, tag]));
+    if (deletedTags.size || changedTags.size) {
+        allTags = allTags
+            .filter(tag => !deletedTags.has(tag.id) && !changedTags.has(tag.id))
+            .concat(changes.tags);
+        renderTagList();
+        renderTagSelector();
+        renderFilterTags();
+    }
+    changesCursor = changes.cursor;
+}
+
 
 
 // 渲染标签列表
@@ -294,7 +389,7 @@ function renderFilterTags() {
 
 // 创建自定义标签
 async function createCustomTag() {
-    const token = localStorage.getItem('access_token');
+    const token = sessionStorage.getItem('access_token');
     const tagNameInput = document.getElementById('custom-tag-name');
     const tagColorInput = document.getElementById('custom-tag-color');
     
@@ -313,7 +408,7 @@ async function createCustomTag() {
     }
 
     try {
-        const response = await fetch(`${API_BASE_URL}/tags`, {
+        const response = await authFetch(`${API_BASE_URL}/tags`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -454,9 +549,21 @@ function setupEventListeners() {
     });
 }
 
-// 退出登录
-function logout() {
-    localStorage.removeItem('access_token');
+// 退出登录：吊销访问令牌和刷新令牌所在的令牌链，再清除本地保存的令牌
+async function logout() {
+    const refreshToken = sessionStorage.getItem('refresh_token');
+    try {
+        await authFetch(`${API_BASE_URL}/logout`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(refreshToken ? { refresh_token: refreshToken } : {})
+        });
+    } catch (error) {
+        console.error('退出登录请求失败:', error);
+    }
+    clearSession();
     window.location.href = 'index.html';
 }
 
@@ -467,9 +574,9 @@ async function getOrCreateOtherTag() {
     
     if (!otherTag) {
         // 创建"其他"标签
-        const token = localStorage.getItem('access_token');
+        const token = sessionStorage.getItem('access_token');
         try {
-            const response = await fetch(`${API_BASE_URL}/tags`, {
+            const response = await authFetch(`${API_BASE_URL}/tags`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -493,7 +600,7 @@ async function getOrCreateOtherTag() {
 // 处理任务提交
 async function handleTaskSubmit(e) {
     e.preventDefault();
-    const token = localStorage.getItem('access_token');
+    const token = sessionStorage.getItem('access_token');
     
     // 前端表单验证
     const title = document.getElementById('task-title').value;
@@ -538,7 +645,7 @@ async function handleTaskSubmit(e) {
     };
 
     try {
-        const response = await fetch(`${API_BASE_URL}/todos`, {
+        const response = await authFetch(`${API_BASE_URL}/todos`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -679,8 +786,8 @@ async function updateViews() {
 // 渲染今天的任务
 async function renderTodayTasks() {
     try {
-        const token = localStorage.getItem('access_token');
-        const response = await fetch(`${API_BASE_URL}/todos/today`, {
+        const token = sessionStorage.getItem('access_token');
+        const response = await authFetch(`${API_BASE_URL}/todos/today`, {
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -703,7 +810,7 @@ async function renderTodayTasks() {
 // 渲染预览（任务日历）
 async function renderPreview(startDate = null) {
     try {
-        const token = localStorage.getItem('access_token');
+        const token = sessionStorage.getItem('access_token');
         let url = `${API_BASE_URL}/todos/week`;
         
         // 如果提供了起始日期，添加到URL参数
@@ -711,7 +818,7 @@ async function renderPreview(startDate = null) {
             url += `?start_date=${startDate}`;
         }
         
-        const response = await fetch(url, {
+        const response = await authFetch(url, {
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -815,19 +922,19 @@ function renderWeekCalendar(week_tasks) {
 async function handleSearch() {
     const searchTerm = document.getElementById('search-input').value;
     try {
-        const token = localStorage.getItem('access_token');
+        const token = sessionStorage.getItem('access_token');
         let response;
         
         // 如果搜索框为空，获取所有任务，否则执行搜索
         if (searchTerm.trim() === '') {
-            response = await fetch(`${API_BASE_URL}/todos`, {
+            response = await authFetch(`${API_BASE_URL}/todos`, {
                 headers: {
                     'Authorization': `Bearer ${token}`,
                     'Content-Type': 'application/json'
                 }
             });
         } else {
-            response = await fetch(`${API_BASE_URL}/todos?search=${encodeURIComponent(searchTerm)}`, {
+            response = await authFetch(`${API_BASE_URL}/todos?search=${encodeURIComponent(searchTerm)}`, {
                 headers: {
                     'Authorization': `Bearer ${token}`,
                     'Content-Type': 'application/json'
@@ -865,9 +972,9 @@ async function handleFilterChange() {
     if (sortOrder && sortOrder.trim() !== '') params.append('sort_order', sortOrder);
 
     try {
-        const token = localStorage.getItem('access_token');
+        const token = sessionStorage.getItem('access_token');
         
-        const response = await fetch(`${API_BASE_URL}/todos?${params.toString()}`, {
+        const response = await authFetch(`${API_BASE_URL}/todos?${params.toString()}`, {
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -1030,9 +1137,9 @@ function editTodo(todo) {
 
 // 完成任务
 async function completeTodo(todoId, taskElement) {
-    const token = localStorage.getItem('access_token');
+    const token = sessionStorage.getItem('access_token');
     try {
-        const response = await fetch(`${API_BASE_URL}/todos/${todoId}/toggle`, {
+        const response = await authFetch(`${API_BASE_URL}/todos/${todoId}/toggle`, {
             method: 'PUT',
             headers: {
                 'Authorization': `Bearer ${token}`
@@ -1060,9 +1167,9 @@ async function completeTodo(todoId, taskElement) {
 
 // 删除任务
 async function deleteTodo(todoId, taskElement) {
-    const token = localStorage.getItem('access_token');
+    const token = sessionStorage.getItem('access_token');
     try {
-        const response = await fetch(`${API_BASE_URL}/todos/${todoId}`, {
+        const response = await authFetch(`${API_BASE_URL}/todos/${todoId}`, {
             method: 'DELETE',
             headers: {
                 'Authorization': `Bearer ${token}`
@@ -1092,7 +1199,7 @@ async function deleteTodo(todoId, taskElement) {
 async function loadTags() {
     const token = sessionStorage.getItem('access_token');
     try {
-        const response = await fetch(`${API_BASE_URL}/tags`, {
+        const response = await authFetch(`${API_BASE_URL}/tags`, {
             headers: {
                 'Authorization': `Bearer ${token}`
             }
@@ -1127,13 +1234,21 @@ function initWebSocket() {
     const wsUrl = `${protocol}//${window.location.hostname}:5001`;
     
     try {
-        // 创建WebSocket连接
-        socket = io(wsUrl);
+        // 创建WebSocket连接，每次（重新）连接时携带当前的访问令牌，服务端据此加入用户房间
+        socket = io(wsUrl, {
+            auth: (callback) => callback({ token: sessionStorage.getItem('access_token') })
+        });
         
-        // 连接成功后加入用户房间
         socket.on('connect', () => {
             console.log('WebSocket连接成功');
-            socket.emit('join_room', userId);
+        });
+
+        // 服务端因访问令牌过期拒绝连接时不会自动重连，刷新令牌后用新令牌重新连接
+        const currentSocket = socket;
+        currentSocket.on('connect_error', async () => {
+            if (!currentSocket.active && await refreshTokens()) {
+                currentSocket.connect();
+            }
         });
         
         // 接收提醒消息
@@ -1141,6 +1256,11 @@ function initWebSocket() {
             addReminderMessages(data.tasks);
         });
         
+        // 接收其他页面或设备对任务和标签的修改
+        socket.on('changes', (data) => {
+            applyChangeEvents(data);
+        });
+        
         // 连接断开时重连
         socket.on('disconnect', () => {
             console.log('WebSocket连接断开，尝试重连...');
@@ -1154,6 +1274,41 @@ function initWebSocket() {
     }
 }
 
+// 应用服务器推送的变更事件：游标衔接时直接修补本地状态，否则用增量同步补齐
+async function applyChangeEvents(message) {
+    if (changesCursor === null || message.cursor <= changesCursor) {
+        return;
+    }
+    if (message.since !== changesCursor || message.events === null) {
+        await loadTodos();
+        return;
+    }
+
+    const changes = {cursor: message.cursor, todos: [], tags: [], deleted: {todos: [], tags: []}};
+    message.events.forEach(event => {
+        const [kind, action] = event.type.split('.');
+        const target = kind === 'todo' ? changes.todos : changes.tags;
+        if (action === 'deleted') {
+            changes.deleted[`${kind}s`].push(event.data.id);
+        } else {
+            target.push(event.data);
+        }
+    });
+
+    // 标签改名、换色或删除时修补任务中引用的标签
+    const changedTags = new Map(changes.tags.map(tag => [tag.id, tag]));
+    const deletedTags = new Set(changes.deleted.tags);
+    if (changedTags.size || deletedTags.size) {
+        allTodos.forEach(todo => {
+            todo.tags = todo.tags
+                .filter(tag => !deletedTags.has(tag.id))
+                .map(tag => changedTags.get(tag.id) || tag);
+        });
+    }
+    applyChanges(changes);
+    await updateViews();
+}
+
 // 添加提醒消息到消息列表
 function addReminderMessages(tasks) {
     tasks.forEach(task => {
@@ -1440,10 +1595,10 @@ async function handleEditTaskSubmit(event) {
         tags: editSelectedTags
     };
     
-    const token = localStorage.getItem('access_token');
+    const token = sessionStorage.getItem('access_token');
     
     try {
-        const response = await fetch(`${API_BASE_URL}/todos/${taskId}`, {
+        const response = await authFetch(`${API_BASE_URL}/todos/${taskId}`, {
             method: 'PUT',
             headers: {
                 'Authorization': `Bearer ${token}`,